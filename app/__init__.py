@@ -1,57 +1,71 @@
 # app/__init__.py
-import os
 from flask import Flask
-from flask_bcrypt import Bcrypt
-from flask_mail import Mail
-from itsdangerous import URLSafeTimedSerializer
 
+from app.config import from_env
 
-def env_bool(name: str, default: str = "false") -> bool:
-    return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
 
+def create_app(config=None):
+    """Build the Flask app: settings from the environment, then ``config`` on top.
 
-app = Flask(__name__)
+    Route modules are blueprints (auth, users, tickets, api and pages) and are
+    only imported here; Flask-Mail is set up on first send (see
+    ``app.mail_queue.get_mail``), so importing the package stays cheap.
+    """
+    app = Flask(__name__)
+    app.config.update(from_env())
+    app.config.update(config or {})
 
-# -------- Core config --------
-# Booleans from env
-use_ssl = env_bool("MAIL_USE_SSL", "false")
-use_tls = env_bool("MAIL_USE_TLS", "true")
+    # Do not actually send emails during tests
+    if app.config["TESTING"]:
+        app.config["MAIL_SUPPRESS_SEND"] = True
+        app.config["MAIL_QUEUE_WORKER"] = False
 
-# Avoid enabling both SSL and TLS
-if use_ssl:
-    use_tls = False
+    # Keep app.secret_key in sync
+    app.secret_key = app.config["SECRET_KEY"]
 
-# Sender (fall back to username, then a dummy address)
-sender_email = os.getenv("MAIL_DEFAULT_EMAIL") or os.getenv("MAIL_USERNAME") or "no-reply@example.com"
-sender_name = os.getenv("MAIL_DEFAULT_NAME", "Apprentice Helpdesk")
+    # Behind a reverse proxy, take the client address from X-Forwarded-For (rate limits key on it)
+    if app.config.get("TRUSTED_PROXIES"):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXIES"])
 
-app.config.update(
-    # Flask
-    SECRET_KEY=os.getenv("SECRET_KEY", "dev-change-me"),
-    TESTING=env_bool("TESTING", "false"),
+    from app import (assets, changes, compression, db, importer, json_provider, mail_queue, metrics, principals,
+                     ratelimit, slow_queries, stats, ticket_cache, writer)
 
-    # Mail
-    MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
-    MAIL_PORT=int(os.getenv("MAIL_PORT", "465" if use_ssl else "587")),
-    MAIL_USE_TLS=use_tls,
-    MAIL_USE_SSL=use_ssl,
-    MAIL_USERNAME=os.getenv("MAIL_USERNAME", ""),
-    MAIL_PASSWORD=os.getenv("MAIL_PASSWORD", ""),
-    MAIL_DEFAULT_SENDER=(sender_name, sender_email),
-    MAIL_SUPPRESS_SEND=env_bool("MAIL_SUPPRESS_SEND", "false"),
-)
+    db.init_app(app)
+    writer.init_app(app)
+    json_provider.init_app(app)
+    metrics.init_app(app)
+    compression.init_app(app)  # registered after metrics, so it runs first and is timed
+    assets.init_app(app)
+    ratelimit.init_app(app)  # before any route work; off while TESTING
+    slow_queries.init_app(app)
+    principals.init_app(app)
+    ticket_cache.init_app(app)
+    stats.init_app(app)
+    importer.init_app(app)
+    changes.init_app(app)
+    mail_queue.init_app(app)
 
-# Do not actually send emails during tests
-if app.config["TESTING"]:
-    app.config["MAIL_SUPPRESS_SEND"] = True
+    from app import api, auth, pages, tickets, users
 
-# Keep app.secret_key in sync
-app.secret_key = app.config["SECRET_KEY"]
+    for module in (pages, auth, users, tickets, api):
+        app.register_blueprint(module.bp)
+    return app
 
-# -------- Extensions --------
-bcrypt = Bcrypt(app)
-mail = Mail(app)
-ts = URLSafeTimedSerializer(app.config["SECRET_KEY"])
 
-# -------- Import routes AFTER config & extensions --------
-from app import auth, users, tickets, api  # noqa: E402,F401
+_default = {}
+
+
+def __getattr__(name):
+    # ``from app import app`` (main.py, scripts, older tests) gets one default
+    # instance, built on first access rather than at import.
+    if name == "app":
+        if "app" not in _default:
+            _default["app"] = create_app()
+        return _default["app"]
+    if name == "bcrypt":
+        if "bcrypt" not in _default:
+            from flask_bcrypt import Bcrypt
+            _default["bcrypt"] = Bcrypt(__getattr__("app"))
+        return _default["bcrypt"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,255 @@
-from flask import jsonify
-from app import app
-from app.db import get_db_connection
+import secrets
 
+from flask import Blueprint, Response, current_app, jsonify, request, session, stream_with_context, url_for
+from werkzeug.exceptions import ServiceUnavailable
 
-@app.route('/api/tickets', methods=['GET'])
+from app import changes
+from app.db import database_path, get_read_connection, get_user_id
+from app.etags import conditional
+from app.json_provider import json_object_sql
+from app.pagination import query_args
+from app.stats import read_stats
+from app.search import MATCH_END, MATCH_START, SNIPPET_SQL, fts_query, highlight, username_ids
+
+bp = Blueprint('api', __name__)
+
+# Columns clients may ask for with ?fields=; `id` is always returned (it is the cursor).
+TICKET_FIELDS = ('id', 'user_id', 'title', 'description', 'priority', 'status', 'created_at')
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def parse_fields(raw):
+    """Turn ?fields=a,b into a validated column list, or None if a field is unknown."""
+    if not raw:
+        return list(TICKET_FIELDS)
+    fields = ['id']
+    for name in raw.split(','):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in TICKET_FIELDS:
+            return None
+        fields.append(name)
+    return fields
+
+
+def parse_page_args(args):
+    """Return (after, limit) from the query string, or raise ValueError."""
+    after = args.get('after', '0').strip() or '0'
+    if not after.isdigit():
+        raise ValueError('after must be a non-negative integer ticket id')
+
+    max_size = current_app.config['API_MAX_PAGE_SIZE']
+    limit = args.get('limit', '').strip()
+    if not limit:
+        limit = current_app.config['API_PAGE_SIZE']
+    elif limit.isdigit() and int(limit) > 0:
+        limit = int(limit)
+    else:
+        raise ValueError('limit must be a positive integer')
+    return int(after), min(limit, max_size)
+
+
+def search_tickets(conn, fields, search, limit, user_id=None):
+    """Best `limit` full-text matches, each with an HTML `snippet`; only ``user_id``'s tickets if given."""
+    columns = ', '.join(f'tickets.{name}' for name in fields)
+    query = f'''
+        SELECT {columns}, {SNIPPET_SQL} AS snippet
+        FROM tickets_fts
+        JOIN tickets ON tickets.id = tickets_fts.rowid
+        WHERE tickets_fts MATCH ?
+    '''
+    params = [MATCH_START, MATCH_END, search]
+    if user_id is not None:
+        query += ' AND tickets.user_id = ?'
+        params.append(user_id)
+    query += ' ORDER BY tickets_fts.rank LIMIT ?'
+    params.append(limit)
+
+    rows = conn.execute(query, params).fetchall()
+    return [{**dict(row), 'snippet': str(highlight(row['snippet']))} for row in rows]
+
+
+def sync_tickets(conn, fields, limit, user_id=None):
+    """``?since=<seq>``: only tickets changed or deleted after ``seq``, plus the new high-water mark."""
+    since = request.args.get('since', '').strip()
+    if not since.isdigit():
+        return jsonify({'error': 'since must be a non-negative integer sequence'}), 400
+    if 'after' in request.args or request.args.get('q'):
+        return jsonify({'error': 'since cannot be combined with after or q'}), 400
+
+    tickets, deleted, high_water, has_more = changes.sync_since(conn, int(since), fields, user_id, limit)
+    response = jsonify({'tickets': tickets, 'deleted': deleted, 'high_water': high_water, 'has_more': has_more})
+    if has_more:
+        next_args = query_args()
+        next_args.update(since=high_water, limit=limit)
+        response.headers['Link'] = f'<{url_for("api.api_tickets", **next_args)}>; rel="next"'
+    return response
+
+
+@bp.route('/api/tickets', methods=['GET'])
+@conditional('tickets')
 def api_tickets():
-    conn = get_db_connection()
-    tickets = conn.execute('SELECT * FROM tickets').fetchall()
-    conn.close()
-    return jsonify([dict(ticket) for ticket in tickets])
+    fields = parse_fields(request.args.get('fields'))
+    if fields is None:
+        return jsonify({'error': f"fields must be a subset of: {', '.join(TICKET_FIELDS)}"}), 400
+    try:
+        after, limit = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Like /tickets: sign-in required, and non-admins only ever see their own tickets
+    user_id = None
+    if session.get('role') != 'admin':
+        user_id = get_user_id(session.get('username'))
+        if user_id is None:
+            return jsonify({'error': 'login required'}), 401
+
+    conn = get_read_connection()
+    if 'since' in request.args:
+        return sync_tickets(conn, fields, limit, user_id)
+    search = fts_query(request.args.get('q'))
+    if search:
+        return jsonify(search_tickets(conn, fields, search, limit, user_id))
+
+    # Keyset pagination: seek straight to the cursor on the primary key (or on
+    # (user_id, id) for an apprentice), fetch one extra row to learn whether another page exists.
+    # SQLite encodes each ticket itself, so no dict is built per row (app/json_provider.py).
+    query, params = f'SELECT id, {json_object_sql(fields)} AS doc FROM tickets WHERE id > ?', [after]
+    if user_id is not None:
+        query += ' AND user_id = ?'
+        params.append(user_id)
+    rows = conn.execute(query + ' ORDER BY id LIMIT ?', params + [limit + 1]).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    response = current_app.json.json_rows_response([row['doc'] for row in rows])
+
+    if has_more:
+        next_cursor = rows[-1]['id']
+        next_args = query_args()
+        next_args.update(after=next_cursor, limit=limit)
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{url_for("api.api_tickets", **next_args)}>; rel="next"'
+    return response
+
+
+@bp.route('/api/stats', methods=['GET'])
+@conditional('tickets', 'users')
+def api_stats():
+    """Ticket counts for the admin dashboard, read from the incremental counters only."""
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'admin access required'}), 403
+    return jsonify(read_stats(get_read_connection()))
+
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+@bp.route('/api/users/autocomplete', methods=['GET'])
+@conditional('users')
+def api_users_autocomplete():
+    """Usernames containing ?q= for the admin apprentice filter, prefix matches first."""
+    if session.get('role') != 'admin':
+        return jsonify({'error': 'admin access required'}), 403
+    text = (request.args.get('q') or '').strip()
+    if not text:
+        return jsonify([])
+    limit = request.args.get('limit', '')
+    limit = min(int(limit), AUTOCOMPLETE_MAX_LIMIT) if limit.isdigit() and int(limit) > 0 else AUTOCOMPLETE_LIMIT
+
+    id_sql, params = username_ids(text)
+    rows = get_read_connection().execute(f'''
+        SELECT id, username, role FROM users
+        WHERE id IN ({id_sql})
+        ORDER BY instr(lower(username), lower(?)) != 1, length(username), username COLLATE NOCASE
+        LIMIT ?
+    ''', (*params, text, limit)).fetchall()
+    return jsonify(rows)
+
+
+def export_allowed():
+    """Admins, or a caller holding EXPORT_TOKEN (``Authorization: Bearer <token>``, e.g. the nightly job)."""
+    if session.get('role') == 'admin':
+        return True
+    token = current_app.config['EXPORT_TOKEN']
+    return bool(token) and secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+@bp.route('/api/tickets/export', methods=['GET'])
+def api_tickets_export():
+    if not export_allowed():
+        return jsonify({'error': 'admin access or export token required'}), 401
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    fields = parse_fields(request.args.get('fields'))
+    if fields is None:
+        return jsonify({'error': f"fields must be a subset of: {', '.join(TICKET_FIELDS)}"}), 400
+
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    dumps = current_app.json.dumps
+    cursor = get_read_connection().execute(f"SELECT {', '.join(fields)} FROM tickets ORDER BY id")
+
+    def generate():
+        # Only one batch of rows is ever held in memory.
+        first = True
+        if fmt == 'json':
+            yield '['
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if fmt == 'ndjson':
+                yield ''.join(dumps(row, sort_keys=False) + '\n' for row in rows)
+            else:
+                chunk = ','.join(dumps(row, sort_keys=False) for row in rows)
+                yield chunk if first else ',' + chunk
+            first = False
+        if fmt == 'json':
+            yield ']'
+        cursor.close()
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=tickets.{fmt}'
+    return response
+
+
+@bp.route('/api/tickets/stream', methods=['GET'])
+def api_tickets_stream():
+    """Server-Sent Events for ticket changes; see app.changes."""
+    if 'username' not in session:
+        return jsonify({'error': 'login required'}), 401
+    raw = (request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or '').strip()
+    if raw and not raw.isdigit():
+        return jsonify({'error': 'Last-Event-ID must be a non-negative integer'}), 400
+
+    user_id = None
+    if session.get('role') != 'admin':
+        # None would mean "every ticket" to changes.stream; a session whose user is gone gets nothing
+        user_id = get_user_id(session['username'])
+        if user_id is None:
+            return jsonify({'error': 'login required'}), 401
+    config = current_app.config
+    release = changes.open_slot(config['STREAM_MAX_CONNECTIONS'])
+    if release is None:
+        raise ServiceUnavailable('Too many open change streams, please try again later.',
+                                 retry_after=int(config['STREAM_MAX_DURATION']) // 10 or 1)
+    events = changes.stream(
+        database_path(),
+        int(raw) if raw else None,
+        user_id,
+        poll_interval=config['STREAM_POLL_INTERVAL'],
+        keepalive=config['STREAM_KEEPALIVE'],
+        max_duration=config['STREAM_MAX_DURATION'],
+    )
+    response = Response(changes.releasing(events, release), mimetype='text/event-stream')
+    response.call_on_close(release)  # also covers a stream that was never started
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: pass events through as they are written
+    return response
@@ -0,0 +1,106 @@
+"""Fingerprinted static files, served from memory with far-future caching.
+
+At startup every file under ``app/static`` is read once and hashed. The app's
+own ``url_for('static', filename='styles.css')`` then yields
+``/static/styles.<hash>.css``. The name changes whenever the content does, so
+these URLs can be cached forever: they are sent with
+``Cache-Control: public, max-age=31536000, immutable`` and browsers stop
+revalidating them on each navigation.
+
+Files up to ASSETS_MAX_INLINE bytes are kept in memory along with a gzip -9
+copy of the compressible ones. A request is answered without touching the disk
+and without compressing anything. Under gunicorn's ``preload_app`` this happens
+once in the master and the workers share the pages. Plain ``/static/<name>``
+URLs still work as before.
+
+Config:
+    ASSETS_FINGERPRINT  build the manifest and rewrite static URLs (default: on unless debugging)
+    ASSETS_MAX_INLINE   largest file, in bytes, kept in memory; bigger ones are read from disk
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from collections import namedtuple
+
+from flask import request, send_from_directory
+
+MAX_AGE = 365 * 24 * 3600
+CACHE_CONTROL = f'public, max-age={MAX_AGE}, immutable'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+Asset = namedtuple('Asset', 'filename digest data gzipped')
+
+
+def fingerprinted_name(filename, digest):
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{digest}{ext}'
+
+
+class AssetManifest:
+    def __init__(self, folder, max_inline=1024 * 1024):
+        self.folder = folder
+        self.max_inline = max_inline
+        self.urls = {}    # 'styles.css' -> 'styles.<hash>.css'
+        self.assets = {}  # 'styles.<hash>.css' -> Asset
+
+    def build(self):
+        urls, assets = {}, {}
+        for directory, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.join(directory, name)
+                filename = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                gzipped = None
+                if filename.endswith(COMPRESSIBLE):
+                    gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+                    if len(gzipped) >= len(data):
+                        gzipped = None
+                if len(data) > self.max_inline:
+                    data = gzipped = None  # served from disk
+                urls[filename] = fingerprinted_name(filename, digest)
+                assets[urls[filename]] = Asset(filename, digest, data, gzipped)
+        self.urls, self.assets = urls, assets
+        return self
+
+    def response(self, app, asset):
+        if asset.data is None:
+            response = send_from_directory(self.folder, asset.filename, max_age=MAX_AGE)
+        else:
+            body, encoding = asset.data, None
+            if asset.gzipped is not None and request.accept_encodings['gzip'] > 0:
+                body, encoding = asset.gzipped, 'gzip'
+            mimetype = mimetypes.guess_type(asset.filename)[0] or 'application/octet-stream'
+            response = app.response_class(body, mimetype=mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            if asset.gzipped is not None:
+                response.vary.add('Accept-Encoding')
+        response.set_etag(asset.digest, weak=asset.gzipped is not None)
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        return response.make_conditional(request)
+
+
+def init_app(app):
+    app.config.setdefault('ASSETS_FINGERPRINT', not app.debug)
+    app.config.setdefault('ASSETS_MAX_INLINE', 1024 * 1024)
+    if not app.config['ASSETS_FINGERPRINT'] or not app.static_folder:
+        return
+
+    manifest = AssetManifest(app.static_folder, app.config['ASSETS_MAX_INLINE']).build()
+    app.extensions['assets'] = manifest
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = manifest.urls.get(values['filename'], values['filename'])
+
+    def static(filename):
+        asset = manifest.assets.get(filename)
+        if asset is None:
+            return app.send_static_file(filename)
+        return manifest.response(app, asset)
+
+    app.view_functions['static'] = static
@@ -1,65 +1,73 @@
-from flask import render_template, request, redirect, url_for, session, flash
-from app import app, bcrypt
-from app.db import get_db_connection
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from app.db import get_read_connection
+from app.hashing import check_password, hash_password, needs_rehash
+from app.principals import invalidate
+from app.writer import write
 
+bp = Blueprint('auth', __name__)
 
-@app.route('/login', methods=['GET', 'POST'])
+
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
 
-        conn = get_db_connection()
+        conn = get_read_connection()
         user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
 
-        if user and bcrypt.check_password_hash(user['password'], password):
+        if user and check_password(user['password'], password):
+            # Upgrade hashes made with an older cost factor while we have the plain password
+            if needs_rehash(user['password']):
+                new_hash = hash_password(password)
+                write(lambda conn: conn.execute('UPDATE users SET password = ? WHERE id = ?',
+                                                (new_hash, user['id'])).rowcount)
+
             session['username'] = user['username']
             session['role'] = user['role']
             flash('Login successful!', 'success')
-            return redirect(url_for('home'))
+            return redirect(url_for('pages.home'))
 
         flash('Invalid credentials. Please try again.', 'error')
     return render_template('login.html')
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
         email = request.form['email']
         password = request.form['password']
 
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-
-        conn = get_db_connection()
+        conn = get_read_connection()
         existing_user = conn.execute('SELECT * FROM users WHERE email = ? OR username = ?',
                                      (email, username)).fetchone()
 
         if existing_user:
             flash('Email or username is already registered. Please log in.', 'error')
-            conn.close()
-            return redirect(url_for('register'))
+            return redirect(url_for('auth.register'))
+
+        # Hash only once we know the account will actually be created
+        hashed_password = hash_password(password)
 
-        conn.execute('INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)',
-                     (username, email, hashed_password, 'apprentice'))
-        conn.commit()
+        write(lambda conn: conn.execute('INSERT INTO users (username, email, password, role) VALUES (?, ?, ?, ?)',
+                                        (username, email, hashed_password, 'apprentice')).lastrowid)
+        invalidate(username=username)
 
         new_user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
 
         session['username'] = new_user['username']
         session['role'] = new_user['role']
 
         flash('Registration successful! You are now logged in.', 'success')
-        return redirect(url_for('home'))
+        return redirect(url_for('pages.home'))
 
     return render_template('login.html')
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.pop('username', None)
     session.pop('role', None)
     flash('You have been logged out.', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('auth.login'))
@@ -0,0 +1,208 @@
+"""Server-Sent Events stream of ticket changes (``GET /api/tickets/stream``).
+
+Triggers append one ``ticket_changes`` row per ticket insert, update and delete
+(migration 0011). A stream remembers the last ``seq`` it has handled. Each tick
+(STREAM_POLL_INTERVAL seconds) it asks for ``MAX(seq)``, which is one seek to
+the end of the primary key. Only when that has moved does it read the new rows:
+all of them for admins, the owner's only for apprentices. Each change goes out as
+
+    id: <seq>
+    event: ticket
+    data: {"seq": ..., "op": "update", "ticket_id": ..., "changed_at": ..., "ticket": {...}}
+
+``ticket`` is the row as it is now (null once deleted). Browsers reconnect on
+their own and send ``Last-Event-ID``, so nothing is missed across reconnects.
+A stream ends after STREAM_MAX_DURATION seconds so it does not hold a worker
+forever. If a client resumes from before the oldest row still kept (see
+``prune``), it gets a ``reset`` event and should reload instead.
+
+Each open stream holds a server thread, so at most STREAM_MAX_CONNECTIONS are
+served per process. Past that, new ones get a 503 with ``Retry-After`` and the
+browser tries again later. The tickets page only subscribes in its opt-in
+live view (``/tickets?live=1``).
+
+Config:
+    STREAM_MAX_CONNECTIONS  open streams allowed per process
+    STREAM_POLL_INTERVAL    seconds between sequence checks
+    STREAM_KEEPALIVE        seconds of silence before a comment line is sent
+    STREAM_MAX_DURATION     seconds before the server ends a stream (the client reconnects)
+"""
+import json
+import threading
+import time
+
+import click
+
+from app import db
+
+BATCH_SIZE = 500
+
+_open_lock = threading.Lock()
+_open_streams = 0
+
+CHANGES_SQL = '''
+    SELECT ticket_changes.seq, ticket_changes.op, ticket_changes.ticket_id, ticket_changes.changed_at,
+           tickets.title, tickets.status, tickets.priority, tickets.user_id
+    FROM ticket_changes
+    LEFT JOIN tickets ON tickets.id = ticket_changes.ticket_id
+    WHERE ticket_changes.seq > ? AND ticket_changes.seq <= ?
+'''
+
+
+def latest_seq(conn):
+    return conn.execute('SELECT MAX(seq) FROM ticket_changes').fetchone()[0] or 0
+
+
+def oldest_seq(conn):
+    return conn.execute('SELECT MIN(seq) FROM ticket_changes').fetchone()[0]
+
+
+def changes_between(conn, after, upto, user_id=None, limit=BATCH_SIZE):
+    """Changes with ``after < seq <= upto``, oldest first; only ``user_id``'s tickets if given."""
+    query, params = CHANGES_SQL, [after, upto]
+    if user_id is not None:
+        query += ' AND ticket_changes.user_id = ?'
+        params.append(user_id)
+    query += ' ORDER BY ticket_changes.seq LIMIT ?'
+    params.append(limit)
+    return conn.execute(query, params).fetchall()
+
+
+def to_event(row):
+    ticket = None
+    if row['op'] != 'delete' and row['title'] is not None:
+        ticket = {'id': row['ticket_id'], 'title': row['title'], 'status': row['status'],
+                  'priority': row['priority'], 'user_id': row['user_id']}
+    data = {'seq': row['seq'], 'op': row['op'], 'ticket_id': row['ticket_id'],
+            'changed_at': row['changed_at'], 'ticket': ticket}
+    return f"id: {row['seq']}\nevent: ticket\ndata: {json.dumps(data)}\n\n"
+
+
+def open_slot(limit):
+    """Reserve one of ``limit`` stream slots for this process.
+
+    Returns a function that gives the slot back (calling it again does nothing),
+    or None when all slots are taken.
+    """
+    global _open_streams
+    with _open_lock:
+        if _open_streams >= limit:
+            return None
+        _open_streams += 1
+    released = []
+
+    def release():
+        global _open_streams
+        with _open_lock:
+            if not released:
+                released.append(True)
+                _open_streams -= 1
+    return release
+
+
+def releasing(events, release):
+    """Pass ``events`` through, giving the slot back once they run out or the client goes away."""
+    try:
+        yield from events
+    finally:
+        release()
+
+
+def stream(path, after, user_id=None, poll_interval=1.0, keepalive=15.0, max_duration=300.0):
+    """Yield SSE text for changes after ``after`` (None: only changes from now on).
+
+    Opens its own read-only connection: the generator outlives the request that started it.
+    """
+    conn = db.connect(path, readonly=True)
+    try:
+        yield f'retry: {int(poll_interval * 1000) + 1000}\n\n'
+        if after is None:
+            after = latest_seq(conn)
+        else:
+            oldest = oldest_seq(conn)
+            if oldest is not None and after < oldest - 1:
+                yield 'event: reset\ndata: {}\n\n'
+                after = latest_seq(conn)
+
+        started = last_sent = time.monotonic()
+        while True:
+            latest = latest_seq(conn)
+            while latest > after:
+                rows = changes_between(conn, after, latest, user_id)
+                for row in rows:
+                    yield to_event(row)
+                    last_sent = time.monotonic()
+                after = rows[-1]['seq'] if len(rows) == BATCH_SIZE else latest
+
+            now = time.monotonic()
+            if now - started >= max_duration:
+                return
+            if now - last_sent >= keepalive:
+                yield ': keepalive\n\n'
+                last_sent = now
+            time.sleep(poll_interval)
+    finally:
+        conn.really_close()
+
+
+def sync_high_water(conn):
+    """Highest modification sequence of any ticket (0 for an empty database)."""
+    return conn.execute('SELECT MAX(seq) FROM ticket_sync').fetchone()[0] or 0
+
+
+def sync_since(conn, since, fields, user_id=None, limit=BATCH_SIZE):
+    """Delta sync: tickets changed after ``since`` and the ids of those deleted since.
+
+    Returns ``(tickets, deleted, high_water, has_more)``. Each ticket dict carries
+    its ``seq``. Pass ``high_water`` back as the next ``since``. While
+    ``has_more`` is true it is only the end of this page.
+    """
+    # Fix the upper bound first: a commit landing between the two reads gets a
+    # higher seq, so it is picked up by the next sync instead of being skipped.
+    upto = sync_high_water(conn)
+    columns = ', '.join(f'tickets.{name}' for name in fields)
+    query = f'''
+        SELECT ticket_sync.seq AS seq, ticket_sync.ticket_id AS ticket_id, ticket_sync.deleted AS deleted, {columns}
+        FROM ticket_sync
+        LEFT JOIN tickets ON tickets.id = ticket_sync.ticket_id
+        WHERE ticket_sync.seq > ? AND ticket_sync.seq <= ?
+    '''
+    params = [since, upto]
+    if user_id is not None:
+        query += ' AND ticket_sync.user_id = ?'
+        params.append(user_id)
+    query += ' ORDER BY ticket_sync.seq LIMIT ?'
+    params.append(limit + 1)
+    rows = conn.execute(query, params).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    tickets, deleted = [], []
+    for row in rows:
+        if row['deleted']:
+            deleted.append(row['ticket_id'])
+        else:
+            tickets.append({'seq': row['seq'], **{name: row[name] for name in fields}})
+    high_water = rows[-1]['seq'] if has_more else max(upto, since)
+    return tickets, deleted, high_water, has_more
+
+
+def prune(conn, keep_days):
+    """Delete log rows older than ``keep_days``. Returns how many were removed."""
+    with conn:
+        return conn.execute("DELETE FROM ticket_changes WHERE changed_at < datetime('now', ?)",
+                            (f'-{keep_days} days',)).rowcount
+
+
+def init_app(app):
+    app.config.setdefault('STREAM_MAX_CONNECTIONS', 4)
+    app.config.setdefault('STREAM_POLL_INTERVAL', 1.0)
+    app.config.setdefault('STREAM_KEEPALIVE', 15.0)
+    app.config.setdefault('STREAM_MAX_DURATION', 300.0)
+
+    @app.cli.command('prune-ticket-changes')
+    @click.option('--keep-days', type=int, default=30, show_default=True)
+    def prune_ticket_changes_command(keep_days):
+        """Delete ticket change log rows older than --keep-days."""
+        removed = prune(db.get_db_connection(), keep_days)
+        click.echo(f'{removed} change(s) removed.')
@@ -0,0 +1,59 @@
+"""gzip for JSON and HTML responses when the client accepts it.
+
+Responses are compressed after the view has run, and only when all of these hold:
+
+* the client sends ``Accept-Encoding: gzip`` (and not ``gzip;q=0``);
+* the body is at least COMPRESS_MIN_SIZE bytes (tiny bodies grow or barely shrink);
+* the mimetype is one of COMPRESS_MIMETYPES;
+* the response is complete. Streamed responses are left alone (the
+  ``text/event-stream`` change feed and the export), because compressing them
+  would buffer every event.
+
+A strong ETag becomes weak, since the bytes now depend on the encoding.
+``If-None-Match`` is compared weakly (see app/etags.py), so revalidation still
+gives a 304. ``Vary: Accept-Encoding`` is set on every compressible response,
+so shared caches keep the two encodings apart.
+"""
+import gzip
+
+from flask import request
+
+COMPRESS_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+
+def should_compress(response, min_size, mimetypes):
+    if response.mimetype not in mimetypes:
+        return False
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    return response.content_length is not None and response.content_length >= min_size
+
+
+def compress_response(response, level):
+    response.set_data(gzip.compress(response.get_data(), compresslevel=level, mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_LEVEL', 1)
+    app.config.setdefault('COMPRESS_MIMETYPES', COMPRESS_MIMETYPES)
+
+    @app.after_request
+    def gzip_response(response):
+        mimetypes = app.config['COMPRESS_MIMETYPES']
+        if response.mimetype in mimetypes and not response.is_streamed:
+            response.vary.add('Accept-Encoding')
+        if request.accept_encodings['gzip'] <= 0:
+            return response
+        if not should_compress(response, app.config['COMPRESS_MIN_SIZE'], mimetypes):
+            return response
+        return compress_response(response, app.config['COMPRESS_LEVEL'])
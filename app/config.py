@@ -0,0 +1,122 @@
+"""Configuration read from the environment.
+
+``create_app`` starts from ``from_env()`` and applies the mapping it is given
+on top, so tests and scripts can override single keys.
+"""
+import os
+
+
+def env_bool(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def from_env():
+    # Booleans from env
+    use_ssl = env_bool("MAIL_USE_SSL", "false")
+    use_tls = env_bool("MAIL_USE_TLS", "true")
+
+    # Avoid enabling both SSL and TLS
+    if use_ssl:
+        use_tls = False
+
+    # Sender (fall back to username, then a dummy address)
+    sender_email = os.getenv("MAIL_DEFAULT_EMAIL") or os.getenv("MAIL_USERNAME") or "no-reply@example.com"
+    sender_name = os.getenv("MAIL_DEFAULT_NAME", "Apprentice Helpdesk")
+
+    return dict(
+        # Flask
+        SECRET_KEY=os.getenv("SECRET_KEY", "dev-change-me"),
+        TESTING=env_bool("TESTING", "false"),
+
+        # Password hashing (see app/hashing.py)
+        BCRYPT_LOG_ROUNDS=int(os.getenv("BCRYPT_LOG_ROUNDS", "12")),
+        BCRYPT_POOL_SIZE=int(os.getenv("BCRYPT_POOL_SIZE", str(os.cpu_count() or 1))),
+        BCRYPT_MAX_PENDING=int(os.getenv("BCRYPT_MAX_PENDING", str(2 * (os.cpu_count() or 1)))),
+        BCRYPT_TIMEOUT=float(os.getenv("BCRYPT_TIMEOUT", "10")),
+
+        # Token buckets for routes that hash a password or send mail, shared by all workers (see app/ratelimit.py).
+        # Each limit is "<n>/<second|minute|hour|day>"; an empty value turns that bucket off.
+        TRUSTED_PROXIES=int(os.getenv("TRUSTED_PROXIES", "0")),  # proxies in front that set X-Forwarded-For
+        RATELIMIT_ENABLED=env_bool("RATELIMIT_ENABLED", "true"),
+        RATELIMIT_DATABASE=os.getenv("RATELIMIT_DATABASE") or None,
+        RATELIMITS={
+            "auth.login": {"ip": os.getenv("RATELIMIT_LOGIN_IP", "30/minute"),
+                           "username": os.getenv("RATELIMIT_LOGIN_USERNAME", "10/minute")},
+            "auth.register": {"ip": os.getenv("RATELIMIT_REGISTER_IP", "10/hour")},
+            "users.forgot_password": {"ip": os.getenv("RATELIMIT_FORGOT_IP", "10/hour"),
+                                      "email": os.getenv("RATELIMIT_FORGOT_EMAIL", "3/hour")},
+            "users.reset_password": {"ip": os.getenv("RATELIMIT_RESET_IP", "20/hour")},
+        },
+
+        # Database
+        DATABASE=os.getenv("DATABASE", "helpdesk.db"),
+        DATABASE_AUTO_MIGRATE=env_bool("DATABASE_AUTO_MIGRATE", "true"),
+
+        # Route writes go through one writer thread that group-commits them (see app/writer.py)
+        WRITE_GROUP_WINDOW_MS=float(os.getenv("WRITE_GROUP_WINDOW_MS", "2")),
+        WRITE_GROUP_MAX=int(os.getenv("WRITE_GROUP_MAX", "100")),
+        WRITE_TIMEOUT=float(os.getenv("WRITE_TIMEOUT", "10")),
+        WRITE_IDLE_TIMEOUT=float(os.getenv("WRITE_IDLE_TIMEOUT", "60")),
+
+        # Cached username -> (id, role, email) lookups (see app/principals.py)
+        PRINCIPAL_CACHE_SIZE=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+        PRINCIPAL_CACHE_TTL=float(os.getenv("PRINCIPAL_CACHE_TTL", "30")),
+
+        # Ticket rows by id, checked against PRAGMA data_version on every lookup (see app/ticket_cache.py)
+        TICKET_CACHE_SIZE=int(os.getenv("TICKET_CACHE_SIZE", "1024")),
+
+        # Prometheus metrics (see app/metrics.py)
+        METRICS_DIR=os.getenv("METRICS_DIR") or None,
+        METRICS_FLUSH_INTERVAL=float(os.getenv("METRICS_FLUSH_INTERVAL", "5")),
+        METRICS_TOKEN=os.getenv("METRICS_TOKEN") or None,
+
+        # Statements slower than this are logged with their query plan (see app/slow_queries.py); 0 turns it off
+        SLOW_QUERY_MS=float(os.getenv("SLOW_QUERY_MS", "200")),
+        SLOW_QUERY_BUFFER=int(os.getenv("SLOW_QUERY_BUFFER", "1000")),
+
+        # HTML listings (keyset pages, see app/pagination.py); ?per_page= may ask for up to MAX_PAGE_SIZE
+        TICKETS_PAGE_SIZE=int(os.getenv("TICKETS_PAGE_SIZE", "50")),
+        USERS_PAGE_SIZE=int(os.getenv("USERS_PAGE_SIZE", "50")),
+        MAX_PAGE_SIZE=int(os.getenv("MAX_PAGE_SIZE", "200")),
+
+        # API
+        API_PAGE_SIZE=int(os.getenv("API_PAGE_SIZE", "100")),
+        API_MAX_PAGE_SIZE=int(os.getenv("API_MAX_PAGE_SIZE", "500")),
+        EXPORT_BATCH_SIZE=int(os.getenv("EXPORT_BATCH_SIZE", "500")),
+        EXPORT_TOKEN=os.getenv("EXPORT_TOKEN") or None,  # lets a non-browser job export without an admin session
+
+        # Responses: orjson when installed (see app/json_provider.py); gzip above a size (see app/compression.py)
+        JSON_ACCELERATED=env_bool("JSON_ACCELERATED", "true"),
+        COMPRESS_MIN_SIZE=int(os.getenv("COMPRESS_MIN_SIZE", "500")),
+        COMPRESS_LEVEL=int(os.getenv("COMPRESS_LEVEL", "1")),
+
+        # Static files: fingerprinted URLs served from memory (see app/assets.py); default off when debugging
+        ASSETS_FINGERPRINT=env_bool("ASSETS_FINGERPRINT", "false" if env_bool("FLASK_DEBUG") else "true"),
+        ASSETS_MAX_INLINE=int(os.getenv("ASSETS_MAX_INLINE", str(1024 * 1024))),
+
+        # /api/tickets/stream (see app/changes.py)
+        STREAM_MAX_CONNECTIONS=int(os.getenv("STREAM_MAX_CONNECTIONS", "4")),  # per process; each holds a thread
+        STREAM_POLL_INTERVAL=float(os.getenv("STREAM_POLL_INTERVAL", "1")),
+        STREAM_KEEPALIVE=float(os.getenv("STREAM_KEEPALIVE", "15")),
+        STREAM_MAX_DURATION=float(os.getenv("STREAM_MAX_DURATION", "300")),
+
+        # Mail
+        MAIL_SERVER=os.getenv("MAIL_SERVER", "smtp.gmail.com"),
+        MAIL_PORT=int(os.getenv("MAIL_PORT", "465" if use_ssl else "587")),
+        MAIL_USE_TLS=use_tls,
+        MAIL_USE_SSL=use_ssl,
+        MAIL_USERNAME=os.getenv("MAIL_USERNAME", ""),
+        MAIL_PASSWORD=os.getenv("MAIL_PASSWORD", ""),
+        MAIL_DEFAULT_SENDER=(sender_name, sender_email),
+        MAIL_SUPPRESS_SEND=env_bool("MAIL_SUPPRESS_SEND", "false"),
+
+        # Outbound mail queue (see app/mail_queue.py)
+        MAIL_QUEUE_WORKER=env_bool("MAIL_QUEUE_WORKER", "true"),  # drain from a thread in each app process
+        MAIL_QUEUE_BATCH_SIZE=int(os.getenv("MAIL_QUEUE_BATCH_SIZE", "50")),
+        MAIL_QUEUE_POLL_INTERVAL=float(os.getenv("MAIL_QUEUE_POLL_INTERVAL", "5")),
+        MAIL_QUEUE_IDLE_TIMEOUT=float(os.getenv("MAIL_QUEUE_IDLE_TIMEOUT", "60")),
+        MAIL_QUEUE_LEASE=float(os.getenv("MAIL_QUEUE_LEASE", "300")),
+        MAIL_QUEUE_MAX_ATTEMPTS=int(os.getenv("MAIL_QUEUE_MAX_ATTEMPTS", "5")),
+        MAIL_QUEUE_RETRY_BASE=float(os.getenv("MAIL_QUEUE_RETRY_BASE", "30")),
+        MAIL_QUEUE_RETRY_MAX=float(os.getenv("MAIL_QUEUE_RETRY_MAX", "3600")),
+    )
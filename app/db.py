@@ -1,21 +1,235 @@
+import logging
+import os
 import sqlite3
+import threading
+import time
 
+from flask import current_app, g, has_app_context
 
-def get_db_connection():
-    conn = sqlite3.connect('helpdesk.db')
+from app import migrations, principals, ticket_cache
+
+DEFAULT_DATABASE = 'helpdesk.db'
+
+# Applied once per physical connection, right after connecting.
+PRAGMAS = (
+    ('journal_mode', 'WAL'),          # readers don't block the writer (and vice versa)
+    ('synchronous', 'NORMAL'),        # safe with WAL, one fsync per checkpoint instead of per commit
+    ('busy_timeout', 5000),           # wait up to 5s for a lock instead of failing straight away
+    ('mmap_size', 64 * 1024 * 1024),  # 64 MiB memory-mapped reads
+    ('cache_size', -16000),           # negative = KiB, so ~16 MiB page cache
+)
+
+# One physical connection per database path per thread (gunicorn worker thread).
+_local = threading.local()
+
+# Connections a forked child inherited from its parent; see _forget_inherited_connections
+_inherited = []
+
+# Called as listener(conn, sql, params, seconds) once per finished statement
+_query_listeners = []
+
+logger = logging.getLogger(__name__)
+
+
+def add_query_listener(listener):
+    """Have ``listener(conn, sql, params, seconds)`` called for every statement run on a pooled connection.
+
+    ``seconds`` covers ``execute()`` and every fetch from the cursor, so it
+    includes the rows SQLite produces lazily while they are read. ``params`` is
+    None for ``executemany``.
+    """
+    if listener not in _query_listeners:
+        _query_listeners.append(listener)
+
+
+def remove_query_listener(listener):
+    if listener in _query_listeners:
+        _query_listeners.remove(listener)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times a statement from ``execute()`` through its last fetch.
+
+    The statement is reported to the query listeners when the cursor runs its
+    next statement, is closed or is garbage collected, which for the usual
+    ``conn.execute(...).fetchall()`` is straight after the fetch.
+    """
+    _sql = None
+    _params = None
+    _seconds = 0.0
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            for listener in _query_listeners:
+                try:
+                    listener(self.connection, sql, self._params, self._seconds)
+                except Exception:
+                    logger.exception('Query listener %r failed', listener)
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._seconds += time.perf_counter() - started
+
+    def _start(self, sql, params):
+        self._finish()
+        self._sql, self._params, self._seconds = sql, params, 0.0
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class PooledConnection(sqlite3.Connection):
+    """A connection that is handed back to the thread pool instead of being closed.
+
+    Existing callers still call ``close()``; for a pooled connection that only
+    discards an unfinished transaction so the next request starts clean.
+
+    While any query listener is registered, statements run on ``TimedCursor``.
+    """
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = TimedCursor if _query_listeners else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if not _query_listeners:
+            return super().execute(sql, parameters)
+        return self.cursor(TimedCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _query_listeners:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor(TimedCursor).executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+
+def database_path():
+    if has_app_context():
+        return current_app.config.get('DATABASE', DEFAULT_DATABASE)
+    return DEFAULT_DATABASE
+
+
+def connect(path, readonly=False):
+    conn = sqlite3.connect(path, factory=PooledConnection)
     conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    if readonly:
+        conn.execute('PRAGMA query_only = ON')
+    return conn
+
+
+def _thread_connection(path, readonly=False):
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = (path, readonly)
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = connect(path, readonly)
     return conn
 
 
+def get_db_connection():
+    """Return the connection for the current request (or thread, outside a request)."""
+    if not has_app_context():
+        return _thread_connection(database_path())
+    if 'db' not in g:
+        g.db = _thread_connection(database_path())
+    return g.db
+
+
+def get_read_connection():
+    """Like get_db_connection, but the connection refuses writes (``PRAGMA query_only``).
+
+    Routes read through it and write through ``app.writer.write``, so a request
+    never holds the write lock while it renders, and reads never queue behind it.
+    """
+    if not has_app_context():
+        return _thread_connection(database_path(), readonly=True)
+    if 'read_db' not in g:
+        g.read_db = _thread_connection(database_path(), readonly=True)
+    return g.read_db
+
+
+def close_db(exc=None):
+    for name in ('db', 'read_db'):
+        conn = g.pop(name, None)
+        if conn is not None:
+            conn.close()
+
+
+def close_thread_connections():
+    """Really close every pooled connection owned by the calling thread."""
+    connections = getattr(_local, 'connections', None) or {}
+    while connections:
+        _, conn = connections.popitem()
+        conn.really_close()
+
+
+def _forget_inherited_connections():
+    """After fork (gunicorn --preload), give the child its own connections.
+
+    SQLite handles must not be used across a fork, and closing the inherited
+    ones would release the parent's locks, so they are only set aside, never
+    closed or finalized. The next get_db_connection() in the child reconnects.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections:
+        _inherited.extend(connections.values())
+        _local.connections = {}
+
+
+os.register_at_fork(after_in_child=_forget_inherited_connections)
+
+
+def init_app(app):
+    app.config.setdefault('DATABASE', DEFAULT_DATABASE)
+    app.config.setdefault('DATABASE_AUTO_MIGRATE', True)
+    app.teardown_appcontext(close_db)
+    if app.config['DATABASE_AUTO_MIGRATE']:
+        migrations.upgrade(app.config['DATABASE'])
+
+
 def get_ticket_by_id(ticket_id):
-    conn = get_db_connection()
-    ticket = conn.execute('SELECT * FROM tickets WHERE id = ?', (ticket_id,)).fetchone()
-    conn.close()
-    return ticket
+    return ticket_cache.get_ticket(ticket_id, get_read_connection())
 
 
 def get_user_id(username):
-    conn = get_db_connection()
-    user = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
-    conn.close()
-    return user['id'] if user else None
+    principal = principals.get_principal(username, get_read_connection())
+    return principal.id if principal else None
@@ -0,0 +1,65 @@
+"""Conditional GET for listings, keyed on table data versions.
+
+``data_versions`` holds a counter per table that triggers bump on every row
+change. A listing's ETag is a hash of those counters, the request's filters and
+who is asking, so ``If-None-Match`` can be answered with a 304 before the
+listing query runs or its template renders.
+"""
+import hashlib
+from functools import wraps
+
+from flask import make_response, request, session
+
+from app.db import get_read_connection
+
+
+def data_version(conn, tables):
+    names = ('epoch', *tables)
+    placeholders = ', '.join('?' for _ in names)
+    rows = conn.execute(
+        f'SELECT name, version FROM data_versions WHERE name IN ({placeholders}) ORDER BY name',
+        names,
+    ).fetchall()
+    return ';'.join(f"{row['name']}={row['version']}" for row in rows)
+
+
+def listing_etag(tables):
+    """ETag for the current request over ``tables``.
+
+    The versions are read *before* the listing query, so a concurrent write can
+    at worst pair newer rows with an older tag, which only costs the client one
+    extra full response later, never a stale page.
+    """
+    parts = [
+        data_version(get_read_connection(), tables),
+        request.path,
+        '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True))),
+        session.get('username') or '',
+        session.get('role') or '',
+    ]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def conditional(*tables):
+    """Answer If-None-Match with 304 while none of ``tables`` has changed."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Pending flash messages are part of the page, so always render them
+            if request.method != 'GET' or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            etag = listing_etag(tables)
+            if request.if_none_match.contains_weak(etag):  # weak once gzipped (app/compression.py)
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Let browsers keep the copy but always revalidate it
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,85 @@
+"""Password hashing off the request thread.
+
+bcrypt is deliberately slow, so ``hash_password`` and ``check_password`` run
+it on a per-process ``ProcessPoolExecutor`` sized to the machine's cores. Its
+workers come from a forkserver, never a fork of the web process: forking a
+multithreaded process (gthread workers, the writer and mail threads) can copy a
+lock some other thread was holding and hang the child. The
+number of hashes in flight is bounded; when the pool is saturated new work is
+refused straight away with a 503 instead of piling up behind the workers.
+
+Config:
+    BCRYPT_LOG_ROUNDS   cost factor for new hashes (also read by Flask-Bcrypt)
+    BCRYPT_POOL_SIZE    worker processes; 0 hashes inline on the request thread
+    BCRYPT_MAX_PENDING  hashes allowed in flight (running + queued) per process
+    BCRYPT_TIMEOUT      seconds to wait for a result before giving up
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import bcrypt as _bcrypt
+from flask import current_app
+from werkzeug.exceptions import ServiceUnavailable
+
+_lock = threading.Lock()
+_pool = None
+_slots = None
+_owner_pid = None
+
+
+def _hashpw(password, rounds):
+    return _bcrypt.hashpw(password.encode('utf-8'), _bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(pw_hash, password):
+    try:
+        return _bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+    except ValueError:
+        # Not a bcrypt hash (e.g. a legacy or corrupted row)
+        return False
+
+
+def _state():
+    """Return (pool, slots) for this process, creating them after every fork."""
+    global _pool, _slots, _owner_pid
+    with _lock:
+        if _owner_pid != os.getpid():
+            config = current_app.config
+            size = config['BCRYPT_POOL_SIZE']
+            _pool = None
+            if size > 0:
+                _pool = ProcessPoolExecutor(max_workers=size, mp_context=multiprocessing.get_context('forkserver'))
+            _slots = threading.BoundedSemaphore(config['BCRYPT_MAX_PENDING'])
+            _owner_pid = os.getpid()
+        return _pool, _slots
+
+
+def _run(fn, *args):
+    pool, slots = _state()
+    if not slots.acquire(blocking=False):
+        raise ServiceUnavailable('The server is busy, please try again in a moment.', retry_after=1)
+    try:
+        if pool is None:
+            return fn(*args)
+        try:
+            return pool.submit(fn, *args).result(timeout=current_app.config['BCRYPT_TIMEOUT'])
+        except TimeoutError:
+            raise ServiceUnavailable('The server is busy, please try again in a moment.', retry_after=1)
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    return _run(_hashpw, password, current_app.config['BCRYPT_LOG_ROUNDS'])
+
+
+def check_password(pw_hash, password):
+    return _run(_checkpw, pw_hash, password)
+
+
+def needs_rehash(pw_hash):
+    """True if ``pw_hash`` was made with a different cost than BCRYPT_LOG_ROUNDS."""
+    parts = pw_hash.split('$')  # '', '2b', '12', salt+digest
+    return len(parts) != 4 or not parts[2].isdigit() or int(parts[2]) != current_app.config['BCRYPT_LOG_ROUNDS']
@@ -0,0 +1,196 @@
+"""Bulk ticket import from CSV or NDJSON.
+
+Records are read from the file as a stream, validated against the tickets
+table's constraints and inserted with ``executemany``, one writer job
+(``app.writer``) per chunk. A bad row is reported with its line number and skipped; it never
+aborts the rest of the import.
+
+Each record needs ``title``, ``description``, ``priority`` and either
+``user_id`` or ``username``; ``status`` defaults to ``open`` and
+``created_at`` (kept from the legacy system) is optional.
+"""
+import codecs
+import csv
+import json
+import sqlite3
+from collections import namedtuple
+
+import click
+
+from app.db import get_read_connection
+from app.writer import write
+
+PRIORITIES = ('High', 'Medium', 'Low')
+STATUSES = ('open', 'in_progress', 'closed')
+FORMATS = ('csv', 'ndjson')
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+INSERT_SQL = '''
+    INSERT INTO tickets (user_id, title, description, priority, status, created_at)
+    VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+'''
+
+ImportResult = namedtuple('ImportResult', 'inserted failed errors')
+
+
+def format_for(filename, default='csv'):
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def iter_records(stream, fmt):
+    """Yield ``(line_number, record_or_None, error_or_None)`` from a binary stream."""
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'expected a JSON object'
+            continue
+        yield line_number, record, None
+
+
+def validate(record, user_ids, usernames):
+    """Return ``(row_tuple, None)`` ready for INSERT_SQL, or ``(None, error)``."""
+    def text(name):
+        value = record.get(name)
+        return value.strip() if isinstance(value, str) else value
+
+    user_id = text('user_id')
+    if user_id not in (None, ''):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None, f'user_id must be an integer, got {user_id!r}'
+        if user_id not in user_ids:
+            return None, f'unknown user_id {user_id}'
+    else:
+        username = text('username')
+        if not username:
+            return None, 'user_id or username is required'
+        user_id = usernames.get(username)
+        if user_id is None:
+            return None, f'unknown username {username!r}'
+
+    title, description = text('title'), text('description')
+    if not title:
+        return None, 'title is required'
+    if not description:
+        return None, 'description is required'
+
+    priority = text('priority')
+    if priority not in PRIORITIES:
+        return None, f"priority must be one of {', '.join(PRIORITIES)}, got {priority!r}"
+    status = text('status') or 'open'
+    if status not in STATUSES:
+        return None, f"status must be one of {', '.join(STATUSES)}, got {status!r}"
+
+    return (user_id, title, description, priority, status, text('created_at') or None), None
+
+
+def _insert_rows(conn, chunk):
+    """Insert rows one at a time, each in its own savepoint. Returns ``(line_number, error)`` for the failures."""
+    failures = []
+    for line_number, row in chunk:
+        conn.execute('SAVEPOINT import_row')
+        try:
+            conn.execute(INSERT_SQL, row)
+        except sqlite3.IntegrityError as e:
+            conn.execute('ROLLBACK TO import_row')
+            failures.append((line_number, str(e)))
+        conn.execute('RELEASE import_row')
+    return failures
+
+
+def _insert_chunk(chunk, report, path=None):
+    """Insert one chunk in a single writer job; isolate bad rows if the batch fails."""
+    rows = [row for _, row in chunk]
+    try:
+        write(lambda conn: conn.executemany(INSERT_SQL, rows).rowcount, path)
+        return len(chunk), 0
+    except sqlite3.IntegrityError:
+        pass
+    # Something in the chunk violates a constraint we don't pre-check; retry row by row.
+    failures = write(lambda conn: _insert_rows(conn, chunk), path)
+    for line_number, message in failures:
+        report(line_number, message)
+    return len(chunk) - len(failures), len(failures)
+
+
+def import_tickets(conn, stream, fmt, chunk_size=DEFAULT_CHUNK_SIZE, path=None):
+    """Import tickets from ``stream``. Returns an ImportResult.
+
+    ``conn`` is only read from (to resolve users); rows are written through the
+    writer for ``path`` (default: the app's database).
+
+    ``errors`` holds ``(line_number, message)`` for at most MAX_REPORTED_ERRORS
+    rows; ``failed`` is the full count.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+    users = conn.execute('SELECT id, username FROM users').fetchall()
+    user_ids = {row['id'] for row in users}
+    usernames = {row['username']: row['id'] for row in users}
+
+    inserted = failed = 0
+    errors = []
+    chunk = []
+
+    def report(line_number, message):
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append((line_number, message))
+
+    try:
+        for line_number, record, error in iter_records(stream, fmt):
+            row = None
+            if error is None:
+                row, error = validate(record, user_ids, usernames)
+            if error is not None:
+                failed += 1
+                report(line_number, error)
+                continue
+            chunk.append((line_number, row))
+            if len(chunk) >= chunk_size:
+                done, bad = _insert_chunk(chunk, report, path)
+                inserted, failed, chunk = inserted + done, failed + bad, []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # The rest of the file can't be read; keep what was valid so far
+        failed += 1
+        report(None, f'could not read file: {e}')
+    if chunk:
+        done, bad = _insert_chunk(chunk, report, path)
+        inserted, failed = inserted + done, failed + bad
+
+    return ImportResult(inserted, failed, errors)
+
+
+def init_app(app):
+    @app.cli.command('import-tickets')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+    @click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True,
+                  help='Rows per transaction.')
+    def import_tickets_command(path, fmt, chunk_size):
+        """Bulk-import tickets from a CSV or NDJSON file."""
+        with open(path, 'rb') as stream:
+            result = import_tickets(get_read_connection(), stream, fmt or format_for(path), chunk_size)
+        for line_number, message in result.errors:
+            click.echo(f'line {line_number}: {message}', err=True)
+        click.echo(f'Imported {result.inserted} ticket(s), {result.failed} row(s) failed.')
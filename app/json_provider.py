@@ -0,0 +1,71 @@
+"""JSON provider that accepts ``sqlite3.Row`` values.
+
+Routes can hand rows straight to ``jsonify``; each row is still turned into a
+dict for the encoder (``row_default``). When `orjson <https://github.com/ijl/orjson>`_
+is installed (it is optional, like any accelerator) it does the encoding and
+builds the response body as bytes. It only falls back to this class for types
+it does not know. The output matches the standard-library path: keys are sorted
+as Flask sorts them, and datetimes are HTTP dates.
+
+For the largest responses no Python object per row is needed at all:
+``json_object_sql`` has SQLite encode each row, and ``json_rows_response`` joins
+the encoded rows into the body.
+
+Config:
+    JSON_ACCELERATED  use orjson when it is importable (default true)
+"""
+import sqlite3
+
+from flask.json.provider import DefaultJSONProvider, _default
+
+try:
+    import orjson
+except ImportError:  # optional accelerator
+    orjson = None
+
+
+def json_object_sql(fields, table=None):
+    """SQL for ``json_object(...)`` over ``fields``, keys in the order Flask sorts them."""
+    prefix = f'{table}.' if table else ''
+    return 'json_object(' + ', '.join(f"'{name}', {prefix}{name}" for name in sorted(fields)) + ')'
+
+
+def row_default(o):
+    if isinstance(o, sqlite3.Row):
+        return dict(zip(o.keys(), o))
+    return _default(o)
+
+
+class RowJSONProvider(DefaultJSONProvider):
+    default = staticmethod(row_default)
+    accelerated = orjson is not None
+
+    def _orjson_options(self, sort_keys):
+        # Leave datetimes to Flask's default so they stay HTTP dates, as with the stdlib encoder
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        return options | orjson.OPT_SORT_KEYS if sort_keys else options
+
+    def _dumps_bytes(self, obj, sort_keys):
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options(sort_keys))
+
+    def dumps(self, obj, **kwargs):
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        if self.accelerated and not kwargs:
+            return self._dumps_bytes(obj, sort_keys).decode('utf-8')
+        return super().dumps(obj, sort_keys=sort_keys, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Pretty-printed debug output keeps the stdlib path; otherwise skip the str round trip.
+        if not self.accelerated or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj, self.sort_keys) + b'\n', mimetype=self.mimetype)
+
+    def json_rows_response(self, documents):
+        """A JSON array response from objects SQLite already encoded (see ``json_object_sql``)."""
+        return self._app.response_class(f"[{','.join(documents)}]\n", mimetype=self.mimetype)
+
+
+def init_app(app):
+    app.json = RowJSONProvider(app)
+    app.json.accelerated = orjson is not None and app.config.setdefault('JSON_ACCELERATED', True)
@@ -0,0 +1,223 @@
+"""Durable outbound mail queue.
+
+Request handlers hand ``enqueue(msg, conn)`` to the writer (``app.writer``),
+which only inserts a row into ``mail_outbox``, then ``wake()`` the worker. A ``MailQueueWorker`` thread claims due rows in batches and
+sends them over one SMTP connection that is kept open between batches, with
+exponential backoff for failures. Claims are atomic, so every gunicorn worker
+(or a separate ``python -m app.mail_queue`` process) can drain the same table.
+
+With MAIL_QUEUE_WORKER on, each process starts its worker as soon as it runs (the
+gunicorn ``post_fork`` hook, or the first request under any other server), so rows
+left in the outbox by a previous run are delivered without waiting for new mail.
+"""
+import json
+import smtplib
+import threading
+import time
+
+from flask import current_app
+
+from app.db import connect
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_mail(app):
+    """The app's Flask-Mail state, set up on first use so flask_mail is only imported by processes that send."""
+    if 'mail' not in app.extensions:
+        from flask_mail import Mail
+
+        Mail(app)
+    return app.extensions['mail']
+
+
+def message(**kwargs):
+    """A Flask-Mail ``Message``; Flask-Mail reads defaults from the current app's mail state."""
+    get_mail(current_app._get_current_object())
+    from flask_mail import Message
+
+    return Message(**kwargs)
+
+
+def enqueue(msg, conn):
+    """Store ``msg`` for background delivery in ``conn``'s transaction and return its outbox id.
+
+    Meant to run as a writer job: ``write(lambda conn: enqueue(msg, conn))``. It does not commit.
+    """
+    cursor = conn.execute(
+        '''INSERT INTO mail_outbox (subject, sender, recipients, body, html, next_attempt_at)
+           VALUES (?, ?, ?, ?, ?, ?)''',
+        (msg.subject, json.dumps(msg.sender), json.dumps(list(msg.recipients)),
+         msg.body, msg.html, time.time()),
+    )
+    return cursor.lastrowid
+
+
+def wake():
+    """Have this process's worker look for mail now that an ``enqueue`` has been committed."""
+    if current_app.config['MAIL_QUEUE_WORKER']:
+        ensure_worker(current_app._get_current_object()).wake()
+
+
+def to_message(row):
+    sender = json.loads(row['sender']) if row['sender'] else None
+    return message(
+        subject=row['subject'],
+        sender=tuple(sender) if isinstance(sender, list) else sender,
+        recipients=json.loads(row['recipients']),
+        body=row['body'],
+        html=row['html'],
+    )
+
+
+def claim_batch(conn, limit, lease):
+    """Atomically mark up to ``limit`` due messages as 'sending' and return them.
+
+    Rows stuck in 'sending' longer than ``lease`` seconds (a worker died mid-send)
+    are claimed again.
+    """
+    now = time.time()
+    rows = conn.execute(
+        '''UPDATE mail_outbox SET status = 'sending', claimed_at = ?
+           WHERE id IN (
+               SELECT id FROM mail_outbox
+               WHERE (status = 'pending' AND next_attempt_at <= ?)
+                  OR (status = 'sending' AND claimed_at < ?)
+               ORDER BY id LIMIT ?
+           )
+           RETURNING *''',
+        (now, now, now - lease, limit),
+    ).fetchall()
+    conn.commit()
+    return sorted(rows, key=lambda row: row['id'])
+
+
+def mark_sent(conn, outbox_id):
+    conn.execute(
+        "UPDATE mail_outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE id = ?",
+        (outbox_id,),
+    )
+
+
+def mark_failed(conn, row, error, max_attempts, retry_base, retry_max):
+    """Reschedule with exponential backoff, or give up after ``max_attempts``."""
+    attempts = row['attempts'] + 1
+    if attempts >= max_attempts:
+        conn.execute(
+            "UPDATE mail_outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+            (attempts, str(error), row['id']),
+        )
+        return False
+    delay = min(retry_base * 2 ** (attempts - 1), retry_max)
+    conn.execute(
+        "UPDATE mail_outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+        (attempts, time.time() + delay, str(error), row['id']),
+    )
+    return True
+
+
+class MailQueueWorker(threading.Thread):
+    """Drains ``mail_outbox`` over a persistent SMTP connection.
+
+    ``connect_mail`` defaults to the app's Flask-Mail ``connect`` (see ``get_mail``); it must return
+    a Flask-Mail ``Connection`` (a context manager with ``send()``).
+    """
+
+    def __init__(self, app, connect_mail=None):
+        super().__init__(name='mail-queue', daemon=True)
+        self.app = app
+        mail = get_mail(app)  # messages are rendered with the app's mail settings even with a custom connect_mail
+        self.connect_mail = connect_mail or mail.connect
+        self.config = app.config
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._smtp = None
+        self._smtp_used_at = 0.0
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    # -------- SMTP connection reuse --------
+    def smtp(self):
+        if self._smtp is None:
+            self._smtp = self.connect_mail().__enter__()
+        self._smtp_used_at = time.monotonic()
+        return self._smtp
+
+    def close_smtp(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass  # already gone; nothing to tidy up
+            self._smtp = None
+
+    def close_idle_smtp(self):
+        if self._smtp is not None and time.monotonic() - self._smtp_used_at > self.config['MAIL_QUEUE_IDLE_TIMEOUT']:
+            self.close_smtp()
+
+    # -------- Draining --------
+    def drain_once(self, conn):
+        """Claim and send one batch. Returns the number of messages claimed."""
+        batch = claim_batch(conn, self.config['MAIL_QUEUE_BATCH_SIZE'], self.config['MAIL_QUEUE_LEASE'])
+        for row in batch:
+            try:
+                self.smtp().send(to_message(row))
+            except Exception as e:
+                if isinstance(e, (smtplib.SMTPServerDisconnected, OSError)):
+                    self.close_smtp()  # reconnect for the next message
+                retrying = mark_failed(conn, row, e, self.config['MAIL_QUEUE_MAX_ATTEMPTS'],
+                                       self.config['MAIL_QUEUE_RETRY_BASE'], self.config['MAIL_QUEUE_RETRY_MAX'])
+                log = self.app.logger.info if retrying else self.app.logger.error
+                log('Mail %s to %s failed (attempt %d): %s', row['id'], row['recipients'], row['attempts'] + 1, e)
+            else:
+                mark_sent(conn, row['id'])
+            conn.commit()
+        return len(batch)
+
+    def run(self):
+        with self.app.app_context():
+            conn = connect(self.config['DATABASE'])
+            try:
+                while not self._stopping.is_set():
+                    try:
+                        if self.drain_once(conn):
+                            continue  # keep going while there is a backlog
+                    except Exception:
+                        self.app.logger.exception('Mail queue worker error')
+                    self.close_idle_smtp()
+                    self._wake.wait(self.config['MAIL_QUEUE_POLL_INTERVAL'])
+                    self._wake.clear()
+            finally:
+                self.close_smtp()
+                conn.really_close()
+
+
+def ensure_worker(app):
+    """Start this process's background worker on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = MailQueueWorker(app)
+            _worker.start()
+        return _worker
+
+
+
+def init_app(app):
+    @app.before_request
+    def start_mail_worker():
+        if app.config['MAIL_QUEUE_WORKER'] and not app.testing and (_worker is None or not _worker.is_alive()):
+            ensure_worker(app)
+
+
+if __name__ == '__main__':
+    from main import app as flask_app
+
+    worker = MailQueueWorker(flask_app)
+    worker.run()
@@ -0,0 +1,281 @@
+"""Request and SQL metrics in Prometheus text format at ``/metrics``.
+
+Each process keeps its own counters and histograms in memory: per-endpoint
+latency, status codes and how many SQL statements (and how much SQL time) each
+request needed. Statements a request hands to the writer thread (``app.writer``)
+count towards that request too; only the BEGIN and COMMIT a group of jobs
+shares are not counted.
+
+With METRICS_DIR set, every process also writes a snapshot to
+``<METRICS_DIR>/<pid>-<token>.json`` at most every METRICS_FLUSH_INTERVAL
+seconds, and ``/metrics`` sums all snapshots, so a scrape of any gunicorn worker
+reports the whole server. Snapshots of exited workers are kept so counters never
+go backwards until the server restarts: gunicorn.conf.py gives METRICS_DIR a
+default and empties it (``clear_snapshots``) when the master starts.
+
+``/metrics`` is served to admins, and to scrapers holding METRICS_TOKEN.
+
+Config:
+    METRICS_DIR             shared directory for per-process snapshots (unset: this process only)
+    METRICS_FLUSH_INTERVAL  seconds between snapshot writes
+    METRICS_TOKEN           lets scrapers in with ``Authorization: Bearer <token>``
+"""
+import glob
+import json
+import os
+import secrets
+import threading
+import time
+
+from flask import Response, abort, g, has_request_context, request, session
+
+from app import db, writer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'helpdesk_http_requests_total': (
+        'counter', 'HTTP requests handled, by endpoint, method and status.', None),
+    'helpdesk_http_request_duration_seconds': (
+        'histogram', 'Time to produce a response, by endpoint.', LATENCY_BUCKETS),
+    'helpdesk_sql_queries_total': (
+        'counter', 'SQL statements run while handling requests, by endpoint.', None),
+    'helpdesk_sql_duration_seconds_total': (
+        'counter', 'Time spent in SQL statements (execute and fetch) while handling requests, by endpoint.', None),
+    'helpdesk_sql_queries_per_request': (
+        'histogram', 'SQL statements run per request, by endpoint.', QUERY_COUNT_BUCKETS),
+}
+
+
+class Registry:
+    """Counters and histograms for one process.
+
+    Samples are keyed by ``(name, labels)`` where labels is a sorted tuple of
+    ``(label, value)`` pairs. A histogram sample is ``[bucket counts..., sum, count]``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.values = {}
+        self.pid = os.getpid()
+        self.token = secrets.token_hex(4)
+
+    def _for_this_process(self):
+        # A forked worker (gunicorn --preload) starts from zero, not the parent's numbers
+        if self.pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._for_this_process()
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._for_this_process()
+            sample = self.values.get(key)
+            if sample is None:
+                sample = self.values[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    sample[i] += 1
+            sample[-2] += value
+            sample[-1] += 1
+
+    def snapshot(self):
+        """JSON-friendly copy: ``[[name, [[label, value], ...], value_or_sample], ...]``."""
+        with self._lock:
+            self._for_this_process()
+            return [[name, [list(pair) for pair in labels], list(value) if isinstance(value, list) else value]
+                    for (name, labels), value in self.values.items()]
+
+
+registry = Registry()
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+_local = threading.local()  # .request_metrics is set on the writer thread while it runs a request's job
+
+
+def merge(snapshots):
+    """Sum several snapshots into ``{(name, labels): value_or_sample}``."""
+    totals = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot:
+            if name not in METRICS:
+                continue  # written by an older version of this module
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if isinstance(value, list):
+                current = totals.get(key)
+                if current is None or len(current) != len(value):
+                    totals[key] = list(value)
+                else:
+                    totals[key] = [a + b for a, b in zip(current, value)]
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs, extra=()):
+    pairs = (*pairs, *extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(totals):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (sample_name, labels), value in sorted(totals.items()):
+            if sample_name != name:
+                continue
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            for bound, count in zip((*buckets, '+Inf'), (*value[:len(buckets)], value[-1])):
+                le = bound if bound == '+Inf' else _number(float(bound))
+                lines.append(f'{name}_bucket{_labels(labels, [("le", le)])} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(float(value[-2]))}')
+            lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, f'{registry.pid}-{registry.token}.json')
+
+
+def flush(directory):
+    """Write this process's snapshot atomically."""
+    snapshot = registry.snapshot()
+    path = snapshot_path(directory)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def clear_snapshots(directory):
+    """Remove every snapshot in ``directory``: the processes that wrote them are gone."""
+    for path in glob.glob(os.path.join(directory, '*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # already removed
+
+
+def collect(directory=None):
+    """Totals for this process, or for every process sharing ``directory``."""
+    if not directory:
+        return merge([registry.snapshot()])
+    snapshots = [registry.snapshot()]
+    own = snapshot_path(directory)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        if path == own:
+            continue  # the live numbers are newer than the file
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # being replaced right now, or removed
+    return merge(snapshots)
+
+
+def _record_query(conn, sql, params, seconds):
+    target = getattr(_local, 'request_metrics', None)
+    if target is None and has_request_context():
+        target = g.get('_metrics')
+    if target is not None:
+        target[1] += 1
+        target[2] += seconds
+
+
+def _attribute_to_request(fn):
+    """Writer job wrapper: count the job's statements towards the request that queued it."""
+    if not has_request_context() or '_metrics' not in g:
+        return fn
+    target = g._metrics
+
+    def job(conn):
+        _local.request_metrics = target
+        try:
+            return fn(conn)
+        finally:
+            _local.request_metrics = None
+    return job
+
+
+def init_app(app):
+    app.config.setdefault('METRICS_DIR', None)
+    app.config.setdefault('METRICS_FLUSH_INTERVAL', 5.0)
+    app.config.setdefault('METRICS_TOKEN', None)
+    if app.config['METRICS_DIR']:
+        os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+
+    db.add_query_listener(_record_query)
+    writer.add_job_wrapper(_attribute_to_request)
+
+    @app.before_request
+    def start_request_metrics():
+        g._metrics = [time.perf_counter(), 0, 0.0]  # started, SQL statements, SQL seconds
+
+    @app.after_request
+    def record_request_metrics(response):
+        started, queries, sql_seconds = g.pop('_metrics', (None, 0, 0.0))
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'  # keep 404 paths out of the label values
+        registry.inc('helpdesk_http_requests_total',
+                     {'endpoint': endpoint, 'method': request.method, 'status': str(response.status_code)})
+        registry.observe('helpdesk_http_request_duration_seconds', {'endpoint': endpoint},
+                         time.perf_counter() - started)
+        registry.inc('helpdesk_sql_queries_total', {'endpoint': endpoint}, queries)
+        registry.inc('helpdesk_sql_duration_seconds_total', {'endpoint': endpoint}, sql_seconds)
+        registry.observe('helpdesk_sql_queries_per_request', {'endpoint': endpoint}, queries)
+        _maybe_flush(app.config)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        scraper = bool(token) and secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+        if not scraper and session.get('role') != 'admin':
+            abort(401)
+        directory = app.config['METRICS_DIR']
+        if directory:
+            flush(directory)
+        return Response(render(collect(directory)), mimetype='text/plain; version=0.0.4')
+
+
+def _maybe_flush(config):
+    global _last_flush
+    directory = config['METRICS_DIR']
+    if not directory:
+        return
+    now = time.monotonic()
+    if now - _last_flush < config['METRICS_FLUSH_INTERVAL'] or not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = now
+        flush(directory)
+    except OSError:
+        pass  # metrics must never fail a request; the next flush will try again
+    finally:
+        _flush_lock.release()
@@ -0,0 +1,19 @@
+-- Tables as originally created by create_tables.py; a no-op on existing databases.
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    email TEXT,
+    role TEXT NOT NULL CHECK(role IN ('apprentice', 'admin'))
+);
+
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    priority TEXT CHECK(priority IN ('High', 'Medium', 'Low')),
+    status TEXT CHECK(status IN ('open', 'in_progress', 'closed')),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
@@ -0,0 +1,13 @@
+-- Indexes for the filter shapes built by tickets.build_tickets_query().
+-- Each equality prefix is followed by the implicit rowid, so ORDER BY tickets.id DESC
+-- is served by walking the index backwards when every indexed column is pinned.
+
+-- Apprentices: always restricted to their own tickets.
+CREATE INDEX IF NOT EXISTS idx_tickets_user_status_priority ON tickets (user_id, status, priority);
+CREATE INDEX IF NOT EXISTS idx_tickets_user_status ON tickets (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_tickets_user_priority ON tickets (user_id, priority);
+
+-- Admins: status and/or priority across everyone's tickets.
+CREATE INDEX IF NOT EXISTS idx_tickets_status_priority ON tickets (status, priority);
+CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status);
+CREATE INDEX IF NOT EXISTS idx_tickets_priority ON tickets (priority);
@@ -0,0 +1,2 @@
+-- forgot_password and reset_password look users up with LOWER(email) = ?.
+CREATE INDEX IF NOT EXISTS idx_users_lower_email ON users (LOWER(email));
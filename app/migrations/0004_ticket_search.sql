@@ -0,0 +1,27 @@
+-- Full-text index over ticket title and description. It is an external-content
+-- table, so the text lives only in `tickets` and triggers keep the index in sync.
+CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+    title,
+    description,
+    content='tickets',
+    content_rowid='id',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS tickets_fts_after_insert AFTER INSERT ON tickets BEGIN
+    INSERT INTO tickets_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tickets_fts_after_delete AFTER DELETE ON tickets BEGIN
+    INSERT INTO tickets_fts (tickets_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tickets_fts_after_update AFTER UPDATE OF title, description ON tickets BEGIN
+    INSERT INTO tickets_fts (tickets_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+    INSERT INTO tickets_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+
+-- Index the tickets that already exist.
+INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild');
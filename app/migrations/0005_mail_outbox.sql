@@ -0,0 +1,19 @@
+-- Durable queue of outbound email. Requests only INSERT here; app.mail_queue
+-- drains it in the background over a reused SMTP connection.
+CREATE TABLE IF NOT EXISTS mail_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subject TEXT NOT NULL,
+    sender TEXT,                -- JSON: "addr" or ["Name", "addr"]
+    recipients TEXT NOT NULL,   -- JSON list of addresses
+    body TEXT,
+    html TEXT,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'sending', 'sent', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,  -- unix time
+    claimed_at REAL,                -- unix time a worker took the row, for lease expiry
+    last_error TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME
+);
+
+CREATE INDEX IF NOT EXISTS idx_mail_outbox_due ON mail_outbox (status, next_attempt_at);
@@ -0,0 +1,29 @@
+-- Monotonic per-table change counters, bumped by triggers on every row change.
+-- Conditional GETs (app/etags.py) derive ETags from them without running the real query.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+-- 'epoch' is random per database file, so a recreated helpdesk.db never reuses old ETags.
+INSERT OR IGNORE INTO data_versions (name, version) VALUES ('epoch', abs(random())), ('tickets', 0), ('users', 0);
+
+CREATE TRIGGER IF NOT EXISTS tickets_version_after_insert AFTER INSERT ON tickets BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'tickets';
+END;
+CREATE TRIGGER IF NOT EXISTS tickets_version_after_update AFTER UPDATE ON tickets BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'tickets';
+END;
+CREATE TRIGGER IF NOT EXISTS tickets_version_after_delete AFTER DELETE ON tickets BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'tickets';
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_version_after_insert AFTER INSERT ON users BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'users';
+END;
+CREATE TRIGGER IF NOT EXISTS users_version_after_update AFTER UPDATE ON users BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'users';
+END;
+CREATE TRIGGER IF NOT EXISTS users_version_after_delete AFTER DELETE ON users BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE name = 'users';
+END;
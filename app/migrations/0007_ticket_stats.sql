@@ -0,0 +1,50 @@
+-- Ticket counts by status, priority and apprentice, maintained incrementally so
+-- the admin dashboard and /api/stats never run GROUP BY over tickets.
+-- dimension is 'total' (key ''), 'status', 'priority' or 'user' (key = user id).
+CREATE TABLE IF NOT EXISTS ticket_stats (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS ticket_stats_after_insert AFTER INSERT ON tickets BEGIN
+    INSERT INTO ticket_stats (dimension, key, count) VALUES
+        ('total', '', 1),
+        ('status', COALESCE(new.status, ''), 1),
+        ('priority', COALESCE(new.priority, ''), 1),
+        ('user', new.user_id, 1)
+    ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS ticket_stats_after_delete AFTER DELETE ON tickets BEGIN
+    INSERT INTO ticket_stats (dimension, key, count) VALUES
+        ('total', '', -1),
+        ('status', COALESCE(old.status, ''), -1),
+        ('priority', COALESCE(old.priority, ''), -1),
+        ('user', old.user_id, -1)
+    ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS ticket_stats_after_update AFTER UPDATE OF status, priority, user_id ON tickets BEGIN
+    INSERT INTO ticket_stats (dimension, key, count) VALUES
+        ('status', COALESCE(old.status, ''), -1),
+        ('priority', COALESCE(old.priority, ''), -1),
+        ('user', old.user_id, -1)
+    ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO ticket_stats (dimension, key, count) VALUES
+        ('status', COALESCE(new.status, ''), 1),
+        ('priority', COALESCE(new.priority, ''), 1),
+        ('user', new.user_id, 1)
+    ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+-- Backfill from the tickets that already exist.
+DELETE FROM ticket_stats;
+INSERT INTO ticket_stats (dimension, key, count) SELECT 'total', '', COUNT(*) FROM tickets;
+INSERT INTO ticket_stats (dimension, key, count)
+    SELECT 'status', COALESCE(status, ''), COUNT(*) FROM tickets GROUP BY COALESCE(status, '');
+INSERT INTO ticket_stats (dimension, key, count)
+    SELECT 'priority', COALESCE(priority, ''), COUNT(*) FROM tickets GROUP BY COALESCE(priority, '');
+INSERT INTO ticket_stats (dimension, key, count)
+    SELECT 'user', user_id, COUNT(*) FROM tickets GROUP BY user_id;
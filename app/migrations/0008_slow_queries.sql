@@ -0,0 +1,17 @@
+-- Statements slower than SLOW_QUERY_MS, aggregated per query shape and route
+-- by app.slow_queries. fingerprint is a hash of (route, normalized sql).
+CREATE TABLE IF NOT EXISTS slow_queries (
+    fingerprint TEXT PRIMARY KEY,
+    route TEXT NOT NULL,
+    sql TEXT NOT NULL,          -- literals replaced by ?, whitespace collapsed
+    param_types TEXT NOT NULL,  -- e.g. "int, str, null"
+    count INTEGER NOT NULL DEFAULT 0,
+    total_ms REAL NOT NULL DEFAULT 0,
+    max_ms REAL NOT NULL DEFAULT 0,
+    last_ms REAL NOT NULL DEFAULT 0,
+    plan TEXT NOT NULL DEFAULT '',  -- EXPLAIN QUERY PLAN from the most recent occurrence
+    first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_slow_queries_total_ms ON slow_queries (total_ms);
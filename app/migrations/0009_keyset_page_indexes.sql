@@ -0,0 +1,5 @@
+-- Keyset pages (app.pagination) seek to the cursor and read rows already in
+-- order. (user_id) is (user_id, rowid), so an apprentice's unfiltered ticket
+-- list needs no sort. (role) does the same for /admin_users?role=.
+CREATE INDEX IF NOT EXISTS idx_tickets_user ON tickets (user_id);
+CREATE INDEX IF NOT EXISTS idx_users_role ON users (role);
@@ -0,0 +1,24 @@
+-- Trigram index over usernames for the admin apprentice_name filter and the
+-- autocomplete endpoint. Any substring of 3+ characters is an index lookup
+-- (case-insensitive) instead of LOWER(username) LIKE '%x%' over every row.
+CREATE VIRTUAL TABLE IF NOT EXISTS users_trigram USING fts5(
+    username,
+    content='users',
+    content_rowid='id',
+    tokenize='trigram case_sensitive 0'
+);
+
+CREATE TRIGGER IF NOT EXISTS users_trigram_after_insert AFTER INSERT ON users BEGIN
+    INSERT INTO users_trigram (rowid, username) VALUES (new.id, new.username);
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_trigram_after_delete AFTER DELETE ON users BEGIN
+    INSERT INTO users_trigram (users_trigram, rowid, username) VALUES ('delete', old.id, old.username);
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_trigram_after_update AFTER UPDATE OF username ON users BEGIN
+    INSERT INTO users_trigram (users_trigram, rowid, username) VALUES ('delete', old.id, old.username);
+    INSERT INTO users_trigram (rowid, username) VALUES (new.id, new.username);
+END;
+
+INSERT INTO users_trigram (users_trigram) VALUES ('rebuild');
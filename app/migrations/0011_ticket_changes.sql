@@ -0,0 +1,25 @@
+-- Append-only log of ticket inserts, updates and deletes, written by triggers.
+-- /api/tickets/stream (app/changes.py) follows it by seq. user_id is the ticket's owner, so an
+-- apprentice's stream reads only its own rows through idx_ticket_changes_user_seq.
+-- AUTOINCREMENT: a seq is never reused, even after old rows are pruned, so Last-Event-ID stays valid.
+CREATE TABLE IF NOT EXISTS ticket_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id INTEGER NOT NULL,
+    user_id INTEGER,
+    op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_ticket_changes_user_seq ON ticket_changes (user_id, seq);
+
+CREATE TRIGGER IF NOT EXISTS ticket_changes_after_insert AFTER INSERT ON tickets BEGIN
+    INSERT INTO ticket_changes (ticket_id, user_id, op) VALUES (new.id, new.user_id, 'insert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS ticket_changes_after_update AFTER UPDATE ON tickets BEGIN
+    INSERT INTO ticket_changes (ticket_id, user_id, op) VALUES (new.id, new.user_id, 'update');
+END;
+
+CREATE TRIGGER IF NOT EXISTS ticket_changes_after_delete AFTER DELETE ON tickets BEGIN
+    INSERT INTO ticket_changes (ticket_id, user_id, op) VALUES (old.id, old.user_id, 'delete');
+END;
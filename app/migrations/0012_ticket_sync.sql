@@ -0,0 +1,30 @@
+-- Latest change per ticket, for delta sync (GET /api/tickets?since=<seq>, see app/changes.py).
+-- seq is the ticket's modification sequence: the ticket_changes seq of its last insert, update
+-- or delete. A deleted ticket keeps its row with deleted = 1 as a tombstone. Unlike
+-- ticket_changes this table is never pruned, so a client can sync from any old high-water mark,
+-- and each changed ticket is read once however many times it changed.
+CREATE TABLE IF NOT EXISTS ticket_sync (
+    ticket_id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    seq INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_ticket_sync_seq ON ticket_sync (seq);
+CREATE INDEX IF NOT EXISTS idx_ticket_sync_user_seq ON ticket_sync (user_id, seq);
+
+-- Tickets untouched since 0011 have no log row yet; give them one so every ticket has a seq.
+INSERT INTO ticket_changes (ticket_id, user_id, op)
+SELECT id, user_id, 'insert' FROM tickets
+WHERE id NOT IN (SELECT ticket_id FROM ticket_changes);
+
+INSERT OR REPLACE INTO ticket_sync (ticket_id, user_id, seq, deleted)
+SELECT ticket_id, user_id, seq, op = 'delete' FROM ticket_changes
+WHERE seq IN (SELECT MAX(seq) FROM ticket_changes GROUP BY ticket_id);
+
+CREATE TRIGGER IF NOT EXISTS ticket_sync_after_change AFTER INSERT ON ticket_changes BEGIN
+    INSERT INTO ticket_sync (ticket_id, user_id, seq, deleted)
+    VALUES (new.ticket_id, new.user_id, new.seq, new.op = 'delete')
+    ON CONFLICT (ticket_id) DO UPDATE SET
+        user_id = excluded.user_id, seq = excluded.seq, deleted = excluded.deleted;
+END;
@@ -0,0 +1,85 @@
+"""Versioned schema migrations.
+
+Each ``NNNN_name.sql`` file in this directory is one migration. The schema
+version of a database is kept in ``PRAGMA user_version``; ``upgrade()`` applies
+every migration above it in order, each in its own transaction, so existing
+``helpdesk.db`` files are upgraded in place without losing data.
+"""
+import os
+import re
+import sqlite3
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+_FILENAME = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+
+def available_migrations():
+    """Return ``[(version, name, path), ...]`` sorted by version."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+
+def latest_version():
+    migrations = available_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def split_statements(script):
+    """Split a SQL script into single statements (trigger bodies stay intact)."""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ''
+    leftover = [line for line in statement.splitlines() if line.strip() and not line.strip().startswith('--')]
+    if leftover:
+        raise ValueError(f'Incomplete SQL statement: {statement.strip()!r}')
+
+
+def apply_migration(conn, version, path):
+    """Apply one migration unless another process beat us to it. Returns True if applied."""
+    with open(path, encoding='utf-8') as f:
+        statements = list(split_statements(f.read()))
+
+    # BEGIN IMMEDIATE takes the write lock up front, so concurrently starting
+    # workers serialize here and re-check the version once they hold it.
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if current_version(conn) >= version:
+            conn.execute('ROLLBACK')
+            return False
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {version:d}')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return True
+
+
+def upgrade(path, target=None):
+    """Bring the database at ``path`` up to ``target`` (default: latest). Returns applied versions."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA busy_timeout = 5000')
+    applied = []
+    try:
+        for version, name, migration_path in available_migrations():
+            if target is not None and version > target:
+                break
+            if version <= current_version(conn):
+                continue
+            if apply_migration(conn, version, migration_path):
+                applied.append(version)
+    finally:
+        conn.close()
+    return applied
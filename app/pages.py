@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from flask import Blueprint, session, render_template, redirect, url_for
+
+from app.db import get_read_connection
+from app.stats import read_stats
+
+bp = Blueprint('pages', __name__)
+
+
+@bp.route('/')
+def home():
+    # Not logged in? go to login
+    if 'username' not in session:
+        return redirect(url_for('auth.login'))
+
+    role = session.get('role')
+
+    # Any data you normally pass to the home page
+    announcements = []  # replace with get_announcements() if you have it
+    current_year = datetime.now().year
+
+    # Pick the right template per role
+    if role == 'admin':
+        # Counters are kept up to date by triggers, so this is a handful of primary-key reads
+        stats = read_stats(get_read_connection())
+        return render_template('admin_home.html', announcements=announcements, current_year=current_year,
+                               stats=stats)
+    return render_template('index.html', announcements=announcements, current_year=current_year)
+
+
+@bp.route("/faq")
+def faq():
+    return render_template("faq.html")
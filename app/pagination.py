@@ -0,0 +1,80 @@
+"""Keyset pagination for the HTML listings.
+
+Pages are addressed by the key of a neighbouring row rather than an offset:
+``after=<id>`` is the page that follows that row in the listing's order and
+``before=<id>`` the page that precedes it. Each page is one index seek plus
+``per_page + 1`` rows, where the extra row only tells us whether there is more;
+no ``COUNT(*)`` is needed.
+"""
+from collections import namedtuple
+
+from flask import request, url_for
+
+Page = namedtuple('Page', 'rows per_page next_after prev_before is_first')
+
+
+def parse_page_args(args, default_size, max_size):
+    """Return ``(after, before, per_page)``. Bad values fall back to the first page."""
+    def number(name):
+        raw = (args.get(name) or '').strip()
+        return int(raw) if raw.isdigit() else None
+
+    after, before = number('after'), number('before')
+    if after is not None:
+        before = None
+    per_page = number('per_page') or default_size
+    return after, before, max(1, min(per_page, max_size))
+
+
+def keyset(column, descending, after=None, before=None):
+    """SQL for one page: ``(condition, params, order_by, backwards)``.
+
+    ``condition`` is '' or ``' AND <column> <op> ?'``. When paging backwards the
+    rows come back in reverse order; ``make_page`` puts them right.
+    """
+    backwards = after is None and before is not None
+    if after is not None:
+        condition, params = f' AND {column} {"<" if descending else ">"} ?', [after]
+    elif before is not None:
+        condition, params = f' AND {column} {">" if descending else "<"} ?', [before]
+    else:
+        condition, params = '', []
+    ascending = descending == backwards
+    return condition, params, f' ORDER BY {column} {"ASC" if ascending else "DESC"}', backwards
+
+
+def make_page(rows, per_page, key, after=None, before=None):
+    """Build a Page from rows fetched with ``LIMIT per_page + 1``."""
+    backwards = after is None and before is not None
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return Page(rows, per_page, None, None, after is None and before is None)
+
+    has_next = True if backwards else more
+    has_prev = more if backwards else after is not None
+    return Page(
+        rows,
+        per_page,
+        rows[-1][key] if has_next else None,
+        rows[0][key] if has_prev else None,
+        not has_prev,
+    )
+
+
+def query_args(*exclude):
+    """The current query string as a dict for ``url_for``, minus ``exclude``.
+
+    Keys starting with ``_`` are dropped: ``url_for`` would take them as its own
+    options (``_method``, ``_external``, ...) rather than as query parameters.
+    """
+    return {k: v for k, v in request.args.items() if not k.startswith('_') and k not in exclude}
+
+
+def page_url(**cursor):
+    """URL of the current listing with the same filters and the given cursor."""
+    args = query_args('after', 'before')
+    args.update({k: v for k, v in cursor.items() if v is not None})
+    return url_for(request.endpoint, **request.view_args, **args)
@@ -0,0 +1,85 @@
+"""Per-process cache of who a username is (id, role, email).
+
+``admin_required`` and the ticket routes resolve ``session['username']`` on
+every request; this keeps those lookups off the database. Entries expire after
+PRINCIPAL_CACHE_TTL seconds and the least recently used entry is evicted once
+PRINCIPAL_CACHE_SIZE is reached. Routes that change users call ``invalidate``
+so this process sees the change immediately; other gunicorn workers pick it up
+when their entry expires.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+Principal = namedtuple('Principal', 'id username role email')
+
+PRINCIPAL_QUERY = 'SELECT id, username, role, email FROM users WHERE username = ?'
+
+
+class PrincipalCache:
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # username -> (expires_at, Principal)
+        self._lock = threading.Lock()
+
+    def get(self, username, conn):
+        """Return the Principal for ``username`` (or None), loading it with ``conn`` on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        row = conn.execute(PRINCIPAL_QUERY, (username,)).fetchone()
+        if row is None:
+            return None  # unknown users aren't cached, so a later registration is seen at once
+        principal = Principal(row['id'], row['username'], row['role'], row['email'])
+
+        with self._lock:
+            self._entries[username] = (now + self.ttl, principal)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, username=None, user_id=None):
+        """Drop the entry for ``username`` and/or whichever entry has ``user_id``."""
+        with self._lock:
+            if username is not None:
+                self._entries.pop(username, None)
+            if user_id is not None:
+                for name, (_, principal) in list(self._entries.items()):
+                    if principal.id == user_id:
+                        del self._entries[name]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                    'maxsize': self.maxsize, 'ttl': self.ttl}
+
+
+cache = PrincipalCache()
+
+
+def init_app(app):
+    cache.maxsize = app.config.setdefault('PRINCIPAL_CACHE_SIZE', 1024)
+    cache.ttl = app.config.setdefault('PRINCIPAL_CACHE_TTL', 30.0)
+
+
+def get_principal(username, conn):
+    return cache.get(username, conn)
+
+
+def invalidate(username=None, user_id=None):
+    cache.invalidate(username=username, user_id=user_id)
@@ -0,0 +1,152 @@
+"""EXPLAIN QUERY PLAN for every query the routes run.
+
+Run ``python -m app.query_plans [path/to/helpdesk.db]`` to print the plans (for
+a migrated copy of that database; the file itself is left alone). The
+exit status is non-zero if a query that should be served by an index has
+regressed to a full table scan (or a paged listing to a sort), so this doubles as
+a CI check.
+"""
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+
+from app import changes, migrations
+from app.search import username_ids
+from app.tickets import build_tickets_query
+
+
+def route_queries():
+    """Yield ``(label, sql, params, allowed_scans, seek)`` for each query shape the routes run.
+
+    ``allowed_scans`` may include 'ORDER BY' for a paged shape that has to sort.
+    ``seek`` names a tickets column the plan must search on (or is None).
+    """
+    for is_admin in (False, True):
+        who = 'admin' if is_admin else 'apprentice'
+        for status, priority in itertools.product(('', 'open'), ('', 'High')):
+            id_filters = (None, 2) if is_admin else (None,)
+            for apprentice_id in id_filters:
+                # Second page onwards: seek past the cursor, one page plus the look-ahead row
+                sql, params = build_tickets_query(is_admin, user_id=1, status=status, priority=priority,
+                                                  apprentice_id=apprentice_id, after=100, limit=51)
+                label = f'/tickets {who} status={status or "*"} priority={priority or "*"}'
+                if apprentice_id is not None:
+                    label += ' apprentice_id'
+                # An admin with no filters is listing everything; a scan is the right plan.
+                unfiltered = is_admin and not (status or priority or apprentice_id)
+                # Apprentices must seek on user_id; status/priority alone walks everyone's tickets.
+                yield label, sql, params, {'tickets'} if unfiltered else set(), None if is_admin else 'user_id'
+
+    for is_admin in (False, True):
+        sql, params = build_tickets_query(is_admin, user_id=1, search='"printer"')
+        yield f'/tickets {"admin" if is_admin else "apprentice"} q', sql, params, {'tickets_fts'}, None
+
+    # Usernames resolve to ids through the trigram index (or scan users for 1-2 characters), never tickets.
+    # Only the matching users' tickets are then sorted into one page.
+    sql, params = build_tickets_query(True, apprentice_name='alex', after=100, limit=51)
+    yield '/tickets admin apprentice_name', sql, params, {'users_trigram', 'ORDER BY'}, None
+    sql, params = build_tickets_query(True, apprentice_name='al', after=100, limit=51)
+    yield '/tickets admin apprentice_name (short)', sql, params, {'users', 'ORDER BY'}, None
+    id_sql, id_params = username_ids('alex')
+    yield ('/api/users/autocomplete', f'SELECT id, username FROM users WHERE id IN ({id_sql}) LIMIT 10',
+           id_params, {'users_trigram'}, None)
+
+    yield 'get_user_id', 'SELECT id FROM users WHERE username = ?', ['alex'], set(), None
+    yield 'get_ticket_by_id', 'SELECT * FROM tickets WHERE id = ?', [1], set(), None
+    yield '/login', 'SELECT * FROM users WHERE username = ?', ['alex'], set(), None
+    yield '/forgot-password', 'SELECT id, username, email FROM users WHERE LOWER(email) = ?', ['a@b.c'], set(), None
+    yield '/reset-password', 'UPDATE users SET password = ? WHERE LOWER(email) = ?', ['x', 'a@b.c'], set(), None
+    yield ('/admin_users', 'SELECT * FROM users WHERE 1=1 AND id > ? ORDER BY id ASC LIMIT ?',
+           [100, 51], set(), None)
+    yield ('/admin_users role', 'SELECT * FROM users WHERE 1=1 AND role = ? AND id > ? ORDER BY id ASC LIMIT ?',
+           ['admin', 100, 51], set(), None)
+    yield '/api/tickets', 'SELECT * FROM tickets WHERE id > ? ORDER BY id LIMIT ?', [0, 100], set(), None
+    yield ('/api/tickets apprentice', 'SELECT * FROM tickets WHERE id > ? AND user_id = ? ORDER BY id LIMIT ?',
+           [0, 2, 100], set(), 'user_id')
+
+    # The stream's per-tick check, and the rows it reads once that has moved
+    yield '/api/tickets/stream tick', 'SELECT MAX(seq) FROM ticket_changes', [], set(), None
+    for user_id in (None, 2):
+        query, params = changes.CHANGES_SQL, [100, 200]
+        if user_id is not None:
+            query += ' AND ticket_changes.user_id = ?'
+            params.append(user_id)
+        yield (f'/api/tickets/stream {"apprentice" if user_id else "admin"}',
+               query + ' ORDER BY ticket_changes.seq LIMIT ?', params + [changes.BATCH_SIZE], set(), None)
+
+    # Delta sync reads only the tickets changed after ?since=, in seq order
+    yield '/api/tickets?since high water', 'SELECT MAX(seq) FROM ticket_sync', [], set(), None
+    for user_id in (None, 2):
+        query = ('SELECT ticket_sync.seq, tickets.* FROM ticket_sync '
+                 'LEFT JOIN tickets ON tickets.id = ticket_sync.ticket_id '
+                 'WHERE ticket_sync.seq > ? AND ticket_sync.seq <= ?')
+        params = [100, 200]
+        if user_id is not None:
+            query += ' AND ticket_sync.user_id = ?'
+            params.append(user_id)
+        yield (f'/api/tickets?since {"apprentice" if user_id else "admin"}',
+               query + ' ORDER BY ticket_sync.seq LIMIT ?', params + [101], set(), None)
+
+
+def explain(conn, sql, params):
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def check(conn, out=None):
+    """Explain every route query; return a list of ``(label, plan)`` that scan or sort unexpectedly."""
+    failures = []
+    for label, sql, params, allowed_scans, seek in route_queries():
+        plan = explain(conn, sql, params)
+        scanned = {detail.split()[1] for detail in plan if detail.startswith('SCAN ')}
+        # A keyset page must come off an index in order; sorting means reading every match first
+        if ' LIMIT ' in sql and 'tickets_fts' not in sql and any('TEMP B-TREE FOR ORDER BY' in d for d in plan):
+            scanned.add('ORDER BY')
+        unexpected = scanned - allowed_scans
+        if seek and not any(d.startswith('SEARCH tickets') and f'{seek}=' in d for d in plan):
+            unexpected.add('tickets')
+        if unexpected:
+            failures.append((label, plan))
+        if out is not None:
+            status = 'FAIL' if unexpected else 'ok'
+            print(f'[{status}] {label}', file=out)
+            for detail in plan:
+                print(f'        {detail}', file=out)
+    return failures
+
+
+def migrated_copy(path, directory):
+    """Copy the database at ``path`` into ``directory`` and bring the copy up to the current schema.
+
+    The plans are checked against the schema the code expects, without touching ``path`` itself.
+    """
+    copy = os.path.join(directory, 'plans.db')
+    source = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    target = sqlite3.connect(copy)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    migrations.upgrade(copy)
+    return copy
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else 'helpdesk.db'
+    with tempfile.TemporaryDirectory() as directory:
+        conn = sqlite3.connect(migrated_copy(path, directory))
+        try:
+            failures = check(conn, out=sys.stdout)
+        finally:
+            conn.close()
+    if failures:
+        print(f'\n{len(failures)} query shape(s) fell back to a full table scan or a sort.')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Token-bucket rate limits for the routes that cost a bcrypt hash or an email.
+
+Each limit in RATELIMITS is ``<capacity>/<period>``, e.g. ``10/minute``. A
+bucket holds up to ``capacity`` tokens and refills at ``capacity / period``
+per second. Every POST to a limited route takes one token from each of its
+buckets: one per client IP, and one per submitted username or email where
+configured. An empty bucket answers ``429 Too Many Requests`` with
+``Retry-After``. The check runs in ``before_request``, so a refused request
+never reaches the users table, bcrypt or the mail queue.
+
+Buckets live in their own small SQLite file (RATELIMIT_DATABASE, by default
+``<DATABASE stem>-ratelimit.db``) so every gunicorn worker sees the same
+counts. That file never contends with the main database's write lock. A take
+is a single ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING``, so it is atomic
+across processes. Rows idle long enough to have refilled completely are the
+same as missing ones and are pruned now and then.
+
+Config:
+    RATELIMIT_ENABLED   turn limiting on (it is always off while TESTING, like mail)
+    RATELIMIT_DATABASE  path of the bucket file
+    RATELIMITS          {endpoint: {'ip' | 'username' | 'email': '<n>/<period>'}}
+"""
+import math
+import os
+import threading
+import time
+
+from flask import request
+from werkzeug.exceptions import TooManyRequests
+
+from app import db
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+PRUNE_EVERY = 1000  # takes per process between prunes
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS rate_buckets (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL,
+        allowed INTEGER NOT NULL
+    ) WITHOUT ROWID
+'''
+
+# All SET expressions see the row as it was, so the refilled level is computed from the old values.
+TAKE_SQL = '''
+    INSERT INTO rate_buckets (key, tokens, updated, allowed) VALUES (:key, :capacity - 1, :now, 1)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = MIN(:capacity, tokens + (:now - updated) * :rate)
+                 - (MIN(:capacity, tokens + (:now - updated) * :rate) >= 1),
+        allowed = MIN(:capacity, tokens + (:now - updated) * :rate) >= 1,
+        updated = :now
+    RETURNING allowed, tokens
+'''
+
+_local = threading.local()
+
+
+def parse_limit(text):
+    """``'10/minute'`` -> ``(10, 60)``. Raises ValueError for anything else."""
+    count, _, period = text.partition('/')
+    if not count.strip().isdigit() or int(count) < 1 or period.strip() not in PERIODS:
+        raise ValueError(f'rate limit must look like 10/minute, got {text!r}')
+    return int(count), PERIODS[period.strip()]
+
+
+def _connection(path):
+    """This thread's connection to the bucket file, reopened after a fork (never shared with the parent)."""
+    if getattr(_local, 'pid', None) != os.getpid() or _local.path != path:
+        if getattr(_local, 'pid', None) == os.getpid():
+            _local.conn.really_close()
+        conn = db.connect(path)
+        conn.execute('PRAGMA synchronous = OFF')  # losing a few takes in a crash is harmless
+        conn.execute(SCHEMA)
+        _local.conn, _local.path, _local.pid, _local.takes = conn, path, os.getpid(), 0
+    return _local.conn
+
+
+def take(path, key, capacity, period, now=None):
+    """Take a token from bucket ``key``. Returns 0 if allowed, else seconds until one is available."""
+    now = time.time() if now is None else now
+    rate = capacity / period
+    conn = _connection(path)
+    allowed, tokens = conn.execute(TAKE_SQL, {'key': key, 'capacity': capacity, 'now': now, 'rate': rate}).fetchone()
+    _local.takes += 1
+    if _local.takes % PRUNE_EVERY == 0:
+        # A bucket idle for a day is full again (no period is longer), exactly like a missing row
+        conn.execute('DELETE FROM rate_buckets WHERE updated < ?', (now - max(PERIODS.values()),))
+    conn.commit()
+    return 0 if allowed else (1 - tokens) / rate
+
+
+def bucket_path(config):
+    if config['RATELIMIT_DATABASE']:
+        return config['RATELIMIT_DATABASE']
+    return os.path.splitext(config['DATABASE'])[0] + '-ratelimit.db'
+
+
+def request_key(scope):
+    """The client's value for ``scope`` in the current request, or '' if it has none."""
+    if scope == 'ip':
+        return request.remote_addr or ''
+    return (request.form.get(scope) or '').strip().lower()
+
+
+def init_app(app):
+    app.config.setdefault('RATELIMIT_ENABLED', True)
+    app.config.setdefault('RATELIMIT_DATABASE', None)
+    app.config.setdefault('RATELIMITS', {})
+    for endpoint, limits in app.config['RATELIMITS'].items():
+        for spec in limits.values():
+            if spec:
+                parse_limit(spec)  # fail at startup, not on the first login
+
+    @app.before_request
+    def enforce_rate_limits():
+        config = app.config
+        if request.method != 'POST' or not config['RATELIMIT_ENABLED'] or app.testing:
+            return None
+        limits = config['RATELIMITS'].get(request.endpoint)
+        if not limits:
+            return None
+        path = bucket_path(config)
+        for scope, spec in limits.items():
+            value = request_key(scope)
+            if not spec or not value:
+                continue
+            capacity, period = parse_limit(spec)
+            wait = take(path, f'{request.endpoint}:{scope}:{value}', capacity, period)
+            if wait:
+                app.logger.warning('Rate limit (%s) hit on %s from %s', scope, request.endpoint, request.remote_addr)
+                raise TooManyRequests('Too many attempts, please wait and try again.',
+                                      retry_after=math.ceil(wait))
+        return None
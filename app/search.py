@@ -0,0 +1,49 @@
+import re
+
+from markupsafe import Markup, escape
+
+# snippet() wraps matches in these control characters; highlight() turns them
+# into <mark> tags after HTML-escaping the surrounding ticket text.
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+SNIPPET_SQL = "snippet(tickets_fts, -1, ?, ?, '…', 16)"
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+# The trigram tokenizer can only match substrings of at least this many characters
+TRIGRAM_MIN = 3
+
+
+def fts_query(text):
+    """Turn free text from a search box into a safe FTS5 query (all terms must match).
+
+    Every term is quoted so FTS5 operators and stray quotes in the input can't
+    cause syntax errors. The last term is a prefix match to support typing ahead.
+    Returns '' when there is nothing searchable.
+    """
+    terms = _TERM.findall(text or '')
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def username_ids(text):
+    """SQL selecting the ids of users whose username contains ``text``, and its params.
+
+    Case-insensitive. Three or more characters go through the users_trigram
+    index; shorter input (which has no trigram) falls back to LIKE over users.
+    """
+    text = (text or '').strip()
+    if len(text) >= TRIGRAM_MIN:
+        return 'SELECT rowid FROM users_trigram WHERE users_trigram MATCH ?', ['"' + text.replace('"', '""') + '"']
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return "SELECT id FROM users WHERE username LIKE ? ESCAPE '\\'", [f'%{escaped}%']
+
+
+def highlight(snippet):
+    if not snippet:
+        return Markup('')
+    return Markup(str(escape(snippet)).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>'))
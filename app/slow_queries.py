@@ -0,0 +1,197 @@
+"""Slow-query log.
+
+Every statement that takes longer than SLOW_QUERY_MS (execute plus fetches, as
+timed by ``app.db.TimedCursor``) is logged with its normalized SQL, the types of
+its bound parameters, how long it took, the route that ran it and the
+``EXPLAIN QUERY PLAN`` output captured on the same connection right away. The
+occurrences are also aggregated per (route, query shape) in the
+``slow_queries`` table, which the admin page at ``/admin/slow-queries`` reads.
+
+Entries are buffered in memory and handed to the writer (``app.writer``) at the
+end of the request, once the route's own transaction is finished, so logging
+never takes part in (or waits on) the transaction that was slow.
+
+Config:
+    SLOW_QUERY_MS      threshold in milliseconds (default 200, set in app/config.py); 0 turns the log off
+    SLOW_QUERY_BUFFER  entries kept in memory between writes (oldest dropped first)
+"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+from collections import deque, namedtuple
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from werkzeug.exceptions import ServiceUnavailable
+
+from app import db, writer
+from app.writer import write
+
+logger = logging.getLogger(__name__)
+
+SlowQuery = namedtuple('SlowQuery', 'route sql param_types ms plan')
+
+SORT_COLUMNS = {'total': 'total_ms', 'max': 'max_ms', 'count': 'count', 'recent': 'last_seen'}
+
+UPSERT_SQL = '''
+    INSERT INTO slow_queries (fingerprint, route, sql, param_types, count, total_ms, max_ms, last_ms, plan)
+    VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+    ON CONFLICT (fingerprint) DO UPDATE SET
+        count = count + 1,
+        total_ms = total_ms + excluded.total_ms,
+        max_ms = MAX(max_ms, excluded.max_ms),
+        last_ms = excluded.last_ms,
+        param_types = excluded.param_types,
+        plan = excluded.plan,
+        last_seen = CURRENT_TIMESTAMP
+'''
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+_SPACE = re.compile(r'\s+')
+
+_settings = {'threshold_ms': None}
+_pending = deque(maxlen=1000)
+_local = threading.local()  # .busy is set while we run our own statements; .route while a request's write job runs
+
+
+def normalize(sql):
+    """Collapse whitespace and replace literals (and placeholder lists) so equal shapes compare equal."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    return _PLACEHOLDER_LIST.sub('?, ...', sql)
+
+
+def _type_name(value):
+    return 'null' if value is None else type(value).__name__
+
+
+def param_types(params):
+    if params is None:
+        return 'executemany'
+    if isinstance(params, dict):
+        return ', '.join(f'{name}: {_type_name(value)}' for name, value in sorted(params.items()))
+    return ', '.join(_type_name(value) for value in params)
+
+
+def explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN as indented text, run on ``conn`` without going through the query listeners."""
+    if params is None:
+        return ''  # executemany: no single set of parameters to plan with
+    try:
+        rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    except sqlite3.Error as e:
+        return f'(no plan: {e})'
+    depth = {}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+
+def fingerprint(route, sql):
+    return hashlib.sha1(f'{route}\n{sql}'.encode('utf-8')).hexdigest()[:16]
+
+
+def _current_route():
+    if has_request_context():
+        return request.endpoint or request.path
+    return getattr(_local, 'route', None) or threading.current_thread().name
+
+
+def _attribute_to_route(fn):
+    """Writer job wrapper: file the job's slow statements under the route that queued it."""
+    if not has_request_context():
+        return fn
+    route = _current_route()
+
+    def job(conn):
+        _local.route = route
+        try:
+            return fn(conn)
+        finally:
+            _local.route = None
+    return job
+
+
+def _record(conn, sql, params, seconds):
+    threshold = current_app.config.get('SLOW_QUERY_MS') if has_app_context() else _settings['threshold_ms']
+    ms = seconds * 1000
+    if not threshold or ms < threshold or getattr(_local, 'busy', False):
+        return
+    _local.busy = True
+    try:
+        entry = SlowQuery(_current_route(), normalize(sql), param_types(params), ms, explain(conn, sql, params))
+    finally:
+        _local.busy = False
+    _pending.append(entry)
+    logger.warning('Slow query (%.1f ms) in %s: %s [params: %s]\n%s',
+                   entry.ms, entry.route, entry.sql, entry.param_types or 'none', entry.plan)
+
+
+def _upsert(entries):
+    rows = [(fingerprint(e.route, e.sql), e.route, e.sql, e.param_types, e.ms, e.ms, e.ms, e.plan) for e in entries]
+
+    def job(conn):
+        _local.busy = True  # on the writer thread: don't log our own upsert
+        try:
+            conn.executemany(UPSERT_SQL, rows)
+        finally:
+            _local.busy = False
+    return job
+
+
+def flush(path=None):
+    """Write buffered entries to ``slow_queries`` through the writer. Returns how many were written."""
+    entries = []
+    while _pending:
+        try:
+            entries.append(_pending.popleft())
+        except IndexError:
+            break  # drained by another thread
+    if not entries:
+        return 0
+    try:
+        write(_upsert(entries), path)
+    except (sqlite3.Error, ServiceUnavailable):
+        _pending.extendleft(reversed(entries))  # try again after the next request
+        logger.exception('Could not write the slow-query log')
+        return 0
+    return len(entries)
+
+
+def worst(conn, sort='total', limit=50):
+    """Aggregated offenders, worst first. ``sort`` is one of SORT_COLUMNS."""
+    column = SORT_COLUMNS.get(sort, SORT_COLUMNS['total'])
+    return conn.execute(f'''
+        SELECT *, total_ms / count AS avg_ms FROM slow_queries
+        ORDER BY {column} DESC LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+def clear(path=None):
+    _pending.clear()
+    write(lambda conn: conn.execute('DELETE FROM slow_queries').rowcount, path)
+
+
+def init_app(app):
+    global _pending
+    app.config.setdefault('SLOW_QUERY_BUFFER', 1000)
+    _settings['threshold_ms'] = app.config.get('SLOW_QUERY_MS')
+    if _pending.maxlen != app.config['SLOW_QUERY_BUFFER']:
+        _pending = deque(_pending, maxlen=app.config['SLOW_QUERY_BUFFER'])
+
+    db.add_query_listener(_record)
+    writer.add_job_wrapper(_attribute_to_route)
+
+    @app.teardown_request
+    def flush_slow_queries(exc=None):
+        if not _pending:
+            return
+        conn = g.get('db')
+        if conn is None or not conn.in_transaction:  # a route that left its transaction open will be rolled back; write later
+            flush()
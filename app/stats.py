@@ -0,0 +1,94 @@
+"""Ticket statistics read from the trigger-maintained ``ticket_stats`` table.
+
+``read_stats`` never touches ``tickets``. ``rebuild`` and ``verify`` are the
+slow path: they recompute the counters with GROUP BY, for repairs and checks
+(``flask --app main rebuild-stats``).
+"""
+import click
+
+from app.db import get_db_connection
+
+REBUILD_SQL = (
+    'DELETE FROM ticket_stats',
+    "INSERT INTO ticket_stats (dimension, key, count) SELECT 'total', '', COUNT(*) FROM tickets",
+    '''INSERT INTO ticket_stats (dimension, key, count)
+       SELECT 'status', COALESCE(status, ''), COUNT(*) FROM tickets GROUP BY COALESCE(status, '')''',
+    '''INSERT INTO ticket_stats (dimension, key, count)
+       SELECT 'priority', COALESCE(priority, ''), COUNT(*) FROM tickets GROUP BY COALESCE(priority, '')''',
+    '''INSERT INTO ticket_stats (dimension, key, count)
+       SELECT 'user', user_id, COUNT(*) FROM tickets GROUP BY user_id''',
+)
+
+# The same aggregates computed from scratch, as (dimension, key) -> count
+_RECOUNT_SQL = '''
+    SELECT 'total' AS dimension, '' AS key, COUNT(*) AS count FROM tickets
+    UNION ALL
+    SELECT 'status', COALESCE(status, ''), COUNT(*) FROM tickets GROUP BY COALESCE(status, '')
+    UNION ALL
+    SELECT 'priority', COALESCE(priority, ''), COUNT(*) FROM tickets GROUP BY COALESCE(priority, '')
+    UNION ALL
+    SELECT 'user', CAST(user_id AS TEXT), COUNT(*) FROM tickets GROUP BY user_id
+'''
+
+TOP_APPRENTICES = 10
+
+
+def read_stats(conn, top=TOP_APPRENTICES):
+    """Dashboard numbers: total, by_status, by_priority and the busiest apprentices."""
+    stats = {'total': 0, 'by_status': {}, 'by_priority': {}, 'by_apprentice': []}
+    for row in conn.execute("SELECT dimension, key, count FROM ticket_stats "
+                            "WHERE dimension IN ('total', 'status', 'priority') AND count > 0"):
+        if row['dimension'] == 'total':
+            stats['total'] = row['count']
+        else:
+            stats[f"by_{row['dimension']}"][row['key']] = row['count']
+
+    rows = conn.execute('''
+        SELECT ticket_stats.key AS user_id, users.username, ticket_stats.count
+        FROM ticket_stats
+        LEFT JOIN users ON users.id = CAST(ticket_stats.key AS INTEGER)
+        WHERE ticket_stats.dimension = 'user' AND ticket_stats.count > 0
+        ORDER BY ticket_stats.count DESC, users.username
+        LIMIT ?
+    ''', (top,)).fetchall()
+    stats['by_apprentice'] = [
+        {'user_id': int(row['user_id']), 'username': row['username'], 'count': row['count']} for row in rows
+    ]
+    return stats
+
+
+def verify(conn):
+    """Compare the counters with a full recount. Returns ``[(dimension, key, stored, actual), ...]``."""
+    stored = {(row[0], row[1]): row[2] for row in conn.execute('SELECT dimension, key, count FROM ticket_stats')}
+    actual = {(row[0], row[1]): row[2] for row in conn.execute(_RECOUNT_SQL)}
+    mismatches = []
+    for key in sorted(set(stored) | set(actual)):
+        if stored.get(key, 0) != actual.get(key, 0):
+            mismatches.append((*key, stored.get(key, 0), actual.get(key, 0)))
+    return mismatches
+
+
+def rebuild(conn):
+    """Recompute every counter from ``tickets`` in one transaction."""
+    with conn:
+        for statement in REBUILD_SQL:
+            conn.execute(statement)
+
+
+def init_app(app):
+    @app.cli.command('rebuild-stats')
+    @click.option('--check', is_flag=True, help='Only report drift, do not rebuild.')
+    def rebuild_stats_command(check):
+        """Recompute ticket_stats from the tickets table and verify it."""
+        conn = get_db_connection()
+        drift = verify(conn)
+        for dimension, key, stored, actual in drift:
+            click.echo(f'drift: {dimension}={key!r} stored={stored} actual={actual}')
+        if check:
+            raise SystemExit(1 if drift else 0)
+
+        rebuild(conn)
+        remaining = verify(conn)
+        if remaining:
+            raise click.ClickException(f'{len(remaining)} counter(s) still differ after rebuild')
+        click.echo(f'ticket_stats rebuilt ({len(drift)} counter(s) corrected).')
@@ -0,0 +1,110 @@
+"""Per-process read-through cache of ticket rows by id.
+
+``view_ticket`` and ``edit_ticket`` look up the same few tickets over and over
+(they are linked from emails and chat). Rows are kept in an LRU of
+TICKET_CACHE_SIZE entries and are never served stale, even when another
+gunicorn worker changed them:
+
+* Before every lookup the cache runs ``PRAGMA data_version`` on the caller's
+  connection. That number only moves when some *other* connection (this
+  process's writer, another worker, a script) has committed since this
+  connection last asked, so on a quiet database the check costs no I/O.
+* When it has moved, the ``tickets`` counter in ``data_versions`` (bumped by
+  triggers, see migration 0006) says whether tickets were among the changes.
+  If so the whole cache is dropped.
+
+Write routes also call ``invalidate`` for the tickets they touched.
+"""
+import threading
+import weakref
+from collections import OrderedDict
+
+TICKET_QUERY = 'SELECT * FROM tickets WHERE id = ?'
+# 'epoch' is random per database file, so pointing the app at another file also empties the cache
+TICKETS_VERSION_QUERY = "SELECT version FROM data_versions WHERE name IN ('epoch', 'tickets') ORDER BY name"
+
+
+class TicketCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self._entries = OrderedDict()  # ticket id -> row
+        self._lock = threading.Lock()
+        self._seen = weakref.WeakKeyDictionary()  # connection -> last PRAGMA data_version it returned
+        self._tickets_version = None  # (epoch, tickets) from data_versions the entries are consistent with
+        self._generation = 0  # bumped on every flush, so a row read before one is not cached after it
+
+    def _check_freshness(self, conn):
+        """Drop every entry if tickets changed since ``conn`` last looked. Returns the generation to cache under."""
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        with self._lock:
+            if self._seen.get(conn) == data_version:
+                return self._generation
+        tickets_version = tuple(row[0] for row in conn.execute(TICKETS_VERSION_QUERY))
+        with self._lock:
+            self._seen[conn] = data_version
+            if tickets_version != self._tickets_version:
+                self._tickets_version = tickets_version
+                self._flush()
+            return self._generation
+
+    def _flush(self):
+        self._entries.clear()
+        self._generation += 1
+        self.flushes += 1
+
+    def get(self, ticket_id, conn):
+        """Return the ticket row (or None), loading it with ``conn`` on a miss."""
+        generation = self._check_freshness(conn)
+        with self._lock:
+            row = self._entries.get(ticket_id)
+            if row is not None:
+                self._entries.move_to_end(ticket_id)
+                self.hits += 1
+                return row
+            self.misses += 1
+
+        row = conn.execute(TICKET_QUERY, (ticket_id,)).fetchone()
+        if row is None:
+            return None  # missing tickets aren't cached, so a new one is seen at once
+        with self._lock:
+            if generation == self._generation:
+                self._entries[ticket_id] = row
+                self._entries.move_to_end(ticket_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return row
+
+    def invalidate(self, *ticket_ids):
+        with self._lock:
+            for ticket_id in ticket_ids:
+                self._entries.pop(ticket_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._flush()
+            self._seen.clear()
+            self._tickets_version = None
+            self.hits = self.misses = self.flushes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'flushes': self.flushes,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+cache = TicketCache()
+
+
+def init_app(app):
+    cache.maxsize = app.config.setdefault('TICKET_CACHE_SIZE', 1024)
+
+
+def get_ticket(ticket_id, conn):
+    return cache.get(ticket_id, conn)
+
+
+def invalidate(*ticket_ids):
+    cache.invalidate(*ticket_ids)
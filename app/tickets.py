@@ -1,8 +1,18 @@
-from flask import render_template, request, redirect, url_for, session, flash
-from app import app
-from app.db import get_db_connection, get_user_id, get_ticket_by_id
+import json
+from urllib.parse import parse_qsl
+
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, session, flash, jsonify
+from app.db import get_read_connection, get_user_id, get_ticket_by_id
+from app.etags import conditional
+from app.importer import FORMATS, PRIORITIES, STATUSES, format_for, import_tickets
+from app.pagination import keyset, make_page, page_url, parse_page_args
+from app.search import MATCH_END, MATCH_START, SNIPPET_SQL, fts_query, highlight, username_ids
+from app.ticket_cache import invalidate
+from app.writer import write
 from functools import wraps
 
+bp = Blueprint('tickets', __name__)
+
 
 def apprentice_required(f):
     @wraps(f)
@@ -10,7 +20,7 @@ def apprentice_required(f):
         # allow only explicit 'apprentice' role
         if session.get('role') != 'apprentice':
             flash('Admins cannot submit tickets.', 'error')
-            return redirect(url_for('tickets'))
+            return redirect(url_for('tickets.tickets'))
         return f(*args, **kwargs)
     return wrapper
 
@@ -23,7 +33,7 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'username' not in session:
             flash('You need to log in to view this page.', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('auth.login'))
         return f(*args, **kwargs)
 
     return decorated_function
@@ -37,73 +47,140 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'username' not in session or session.get('role') != 'admin':
             flash('You do not have permission to view this page.', 'error')
-            return redirect(url_for('home'))
+            return redirect(url_for('pages.home'))
         return f(*args, **kwargs)
 
     return decorated_function
 
 
-@app.route('/tickets')
-@login_required
-def tickets():
-    conn = get_db_connection()
-
-    # Base query + join so we can filter by username and show it in the template
-    query = '''
-        SELECT
-            tickets.*,
-            users.username,
-            users.id AS apprentice_id
-        FROM tickets
-        JOIN users ON tickets.user_id = users.id
-        WHERE 1=1
-    '''
-    params = []
+def build_tickets_query(is_admin, user_id=None, status='', priority='',
+                        apprentice_name='', apprentice_id=None, search='',
+                        after=None, before=None, limit=None):
+    """Build the /tickets listing query. Returns (sql, params).
 
-    is_admin = (session.get('role') == 'admin')
+    ``search`` is an FTS5 query (see app.search.fts_query); when given, results
+    are ranked by relevance and carry a ``snippet`` column, and only the best
+    ``limit`` are returned. Otherwise tickets come newest first and ``after`` /
+    ``before`` select a keyset page (see app.pagination).
+    Kept separate from the view so app.query_plans can EXPLAIN every filter shape.
+    """
+    params = []
+    if search:
+        # Drive the query from the full-text index, then join back to the rows
+        query = f'''
+            SELECT
+                tickets.*,
+                users.username,
+                users.id AS apprentice_id,
+                {SNIPPET_SQL} AS snippet
+            FROM tickets_fts
+            JOIN tickets ON tickets.id = tickets_fts.rowid
+            JOIN users ON tickets.user_id = users.id
+            WHERE tickets_fts MATCH ?
+        '''
+        params += [MATCH_START, MATCH_END, search]
+    else:
+        # Base query + join so we can filter by username and show it in the template
+        query = '''
+            SELECT
+                tickets.*,
+                users.username,
+                users.id AS apprentice_id
+            FROM tickets
+            JOIN users ON tickets.user_id = users.id
+            WHERE 1=1
+        '''
 
     # Restrict non-admins to their own tickets
     if not is_admin:
         query += ' AND tickets.user_id = ?'
-        params.append(get_user_id(session['username']))
+        params.append(user_id)
 
     # Common filters
-    status_filter = (request.args.get('status') or '').strip()
-    if status_filter:
+    if status:
         query += ' AND tickets.status = ?'
-        params.append(status_filter)
+        params.append(status)
 
-    priority_filter = (request.args.get('priority') or '').strip()
-    if priority_filter:
+    if priority:
         query += ' AND tickets.priority = ?'
-        params.append(priority_filter)
+        params.append(priority)
 
     # Admin-only filters
     if is_admin:
-        apprentice_name = (request.args.get('apprentice_name') or '').strip()
         if apprentice_name:
-            # case-insensitive partial match
-            query += ' AND LOWER(users.username) LIKE ?'
-            params.append(f"%{apprentice_name.lower()}%")
-
-        apprentice_id = (request.args.get('apprentice_id') or '').strip()
-        if apprentice_id:
-            if apprentice_id.isdigit():
-                query += ' AND users.id = ?'
-                params.append(int(apprentice_id))
+            # Case-insensitive substring match, resolved to user ids through the trigram index first
+            id_sql, id_params = username_ids(apprentice_name)
+            query += f' AND tickets.user_id IN ({id_sql})'
+            params += id_params
+
+        if apprentice_id is not None:
+            query += ' AND users.id = ?'
+            params.append(apprentice_id)
+
+    if search:
+        # Best match first
+        query += ' ORDER BY tickets_fts.rank'
+    else:
+        # Newest first, seeking straight to the page on the primary key
+        condition, cursor_params, order_by, _ = keyset('tickets.id', True, after, before)
+        query += condition + order_by
+        params += cursor_params
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    return query, params
+
+
+bp.add_app_template_filter(highlight)
+bp.add_app_template_global(page_url)
+
+
+@bp.route('/tickets')
+@login_required
+@conditional('tickets', 'users')
+def tickets():
+    conn = get_read_connection()
+
+    is_admin = (session.get('role') == 'admin')
+    user_id = None if is_admin else get_user_id(session['username'])
+
+    apprentice_name = ''
+    apprentice_id = None
+    if is_admin:
+        apprentice_name = (request.args.get('apprentice_name') or '').strip()
+        raw_apprentice_id = (request.args.get('apprentice_id') or '').strip()
+        if raw_apprentice_id:
+            if raw_apprentice_id.isdigit():
+                apprentice_id = int(raw_apprentice_id)
             else:
                 flash('Apprentice ID must be numeric.', 'warning')
                 # (No ID filter applied)
 
-    # Order newest first (use created_at if available)
-    query += ' ORDER BY tickets.id DESC'
-
-    tickets = conn.execute(query, params).fetchall()
-    conn.close()
-
-    return render_template('tickets.html', tickets=tickets)
-
-@app.route('/submit_ticket', methods=['GET', 'POST'])
+    after, before, per_page = parse_page_args(request.args, current_app.config['TICKETS_PAGE_SIZE'],
+                                              current_app.config['MAX_PAGE_SIZE'])
+    search = fts_query(request.args.get('q'))
+    if search:
+        after = before = None  # ranked results: just the best page
+
+    query, params = build_tickets_query(
+        is_admin,
+        user_id=user_id,
+        status=(request.args.get('status') or '').strip(),
+        priority=(request.args.get('priority') or '').strip(),
+        apprentice_name=apprentice_name,
+        apprentice_id=apprentice_id,
+        search=search,
+        after=after,
+        before=before,
+        limit=per_page + 1,  # one extra row says whether there is another page
+    )
+    page = make_page(conn.execute(query, params).fetchall(), per_page, 'id', after, before)
+
+    return render_template('tickets.html', tickets=page.rows, page=page, searching=bool(search),
+                           live=request.args.get('live') == '1')
+
+
+@bp.route('/submit_ticket', methods=['GET', 'POST'])
 @login_required
 @apprentice_required
 def submit_ticket():
@@ -113,36 +190,30 @@ def submit_ticket():
         priority = request.form['priority']
         user_id = get_user_id(session['username'])
 
-        conn = get_db_connection()
-        conn.execute(
+        write(lambda conn: conn.execute(
             'INSERT INTO tickets (user_id, title, description, priority, status) VALUES (?, ?, ?, ?, ?)',
             (user_id, title, description, priority, 'open')
-        )
-        conn.commit()
-        conn.close()
+        ).lastrowid)
 
         flash('Ticket submitted successfully!', 'success')
-        return redirect(url_for('tickets'))
+        return redirect(url_for('tickets.tickets'))
 
     return render_template('submit_ticket.html')
 
 
-@app.route('/view_ticket/<int:ticket_id>')
+@bp.route('/view_ticket/<int:ticket_id>')
 @login_required
 def view_ticket(ticket_id):
     ticket = get_ticket_by_id(ticket_id)
     if not ticket:
         flash("Ticket not found!", "error")
-        return redirect(url_for('tickets'))
+        return redirect(url_for('tickets.tickets'))
     return render_template('view_ticket.html', ticket=ticket)
 
 
-@app.route('/edit_ticket/<int:ticket_id>', methods=['GET', 'POST'])
+@bp.route('/edit_ticket/<int:ticket_id>', methods=['GET', 'POST'])
 @login_required
 def edit_ticket(ticket_id):
-    conn = get_db_connection()
-    ticket = conn.execute('SELECT * FROM tickets WHERE id = ?', (ticket_id,)).fetchone()
-
     if request.method == 'POST':
         title = request.form['title']
         description = request.form['description']
@@ -151,36 +222,139 @@ def edit_ticket(ticket_id):
 
         if not title or not description:
             flash('Title and description are required!', 'error')
-            conn.close()
-            return redirect(url_for('edit_ticket', ticket_id=ticket_id))
+            return redirect(url_for('tickets.edit_ticket', ticket_id=ticket_id))
 
-        conn.execute(
+        write(lambda conn: conn.execute(
             'UPDATE tickets SET title = ?, description = ?, priority = ?, status = ? WHERE id = ?',
             (title, description, priority, status, ticket_id)
-        )
-        conn.commit()
-        conn.close()
+        ).rowcount)
+        invalidate(ticket_id)
 
         flash('Ticket updated successfully!', 'success')
-        return redirect(url_for('tickets'))
+        return redirect(url_for('tickets.tickets'))
 
-    conn.close()
+    ticket = get_ticket_by_id(ticket_id)
     return render_template('edit_ticket.html', ticket=ticket)
 
 
-@app.route('/delete_ticket/<int:ticket_id>', methods=['POST'])
+@bp.route('/delete_ticket/<int:ticket_id>', methods=['POST'])
 @admin_required
 def delete_ticket(ticket_id):
-    conn = get_db_connection()
-    ticket = conn.execute('SELECT * FROM tickets WHERE id = ?', (ticket_id,)).fetchone()
+    # One statement: delete and learn whether there was anything to delete
+    ticket = write(lambda conn: conn.execute('DELETE FROM tickets WHERE id = ? RETURNING title',
+                                             (ticket_id,)).fetchone())
+    invalidate(ticket_id)
     if not ticket:
-        conn.close()
         flash('Ticket not found.', 'error')
-        return redirect(url_for('tickets'))
-
-    conn.execute('DELETE FROM tickets WHERE id = ?', (ticket_id,))
-    conn.commit()
-    conn.close()
+        return redirect(url_for('tickets.tickets'))
 
     flash(f"Ticket '{ticket['title']}' has been deleted.", 'success')
-    return redirect(url_for('tickets'))
+    return redirect(url_for('tickets.tickets'))
+
+
+# ------------------ Batch admin actions ------------------
+BATCH_ACTIONS = {
+    # action -> (SQL, allowed values or None)
+    'status': ('UPDATE tickets SET status = ? WHERE id IN (SELECT value FROM json_each(?)) RETURNING id', STATUSES),
+    'priority': ('UPDATE tickets SET priority = ? WHERE id IN (SELECT value FROM json_each(?)) RETURNING id',
+                 PRIORITIES),
+    'delete': ('DELETE FROM tickets WHERE id IN (SELECT value FROM json_each(?)) RETURNING id', None),
+}
+BATCH_MAX_IDS = 5000
+# Listing parameters carried back to /tickets after a batch form; anything else in next_query is dropped
+LISTING_ARGS = ('status', 'priority', 'q', 'apprentice_name', 'apprentice_id', 'per_page', 'after', 'before', 'live')
+
+
+def apply_batch(conn, action, ids, value=None):
+    """Apply ``action`` to every ticket in ``ids`` in one set-based statement.
+
+    Runs inside the caller's transaction (the writer's, see app.writer).
+    Returns ``(affected_ids, missing_ids)``.
+    """
+    sql, _ = BATCH_ACTIONS[action]
+    params = (json.dumps(ids),) if value is None else (value, json.dumps(ids))
+    affected = sorted(row['id'] for row in conn.execute(sql, params).fetchall())
+    missing = sorted(set(ids) - set(affected))
+    return affected, missing
+
+
+@bp.route('/tickets/batch', methods=['POST'])
+@admin_required
+def batch_tickets():
+    """Change status/priority of, or delete, many tickets at once.
+
+    Accepts a form (``ticket_ids`` repeated, ``action``, and ``status`` or
+    ``priority``) from the tickets page, or JSON ``{"ids": [...], "action": ...,
+    "status"/"priority": ...}`` for scripts, which get a JSON summary back.
+    """
+    data = None
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'expected a JSON object'}), 400
+        raw_ids = data.get('ids', [])
+        # int() would accept "12" (as 1 and 2, iterated) or true; JSON callers must send real integers
+        if not isinstance(raw_ids, list) or any(type(ticket_id) is not int for ticket_id in raw_ids):
+            return jsonify({'error': 'ids must be a list of integer ticket ids'}), 400
+        action = data.get('action')
+        value = data.get(action) if action in ('status', 'priority') else None
+    else:
+        raw_ids = request.form.getlist('ticket_ids')
+        action = request.form.get('action')
+        value = request.form.get(action) if action in ('status', 'priority') else None
+
+    error = None
+    ids = []
+    if action not in BATCH_ACTIONS:
+        error = f"action must be one of: {', '.join(BATCH_ACTIONS)}"
+    elif BATCH_ACTIONS[action][1] is not None and value not in BATCH_ACTIONS[action][1]:
+        error = f"{action} must be one of: {', '.join(BATCH_ACTIONS[action][1])}"
+    else:
+        try:
+            ids = sorted({int(ticket_id) for ticket_id in raw_ids})
+        except (TypeError, ValueError):
+            error = 'ticket ids must be integers'
+        else:
+            if not ids:
+                error = 'select at least one ticket'
+            elif len(ids) > BATCH_MAX_IDS:
+                error = f'at most {BATCH_MAX_IDS} tickets per batch'
+
+    if error is None:
+        affected, missing = write(lambda conn: apply_batch(conn, action, ids, value))
+        invalidate(*affected)
+
+    if data is not None:
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify({'action': action, 'value': value, 'affected': affected, 'missing': missing})
+
+    if error:
+        flash(error[0].upper() + error[1:] + '.', 'error')
+    else:
+        verb = 'deleted' if action == 'delete' else f'updated ({action}: {value})'
+        flash(f'{len(affected)} ticket(s) {verb}.', 'success')
+        if missing:
+            flash(f"Not found: {', '.join(f'#{ticket_id}' for ticket_id in missing)}.", 'warning')
+    # Back to the listing with the filters that were active
+    listing = {key: value for key, value in parse_qsl(request.form.get('next_query', '')) if key in LISTING_ARGS}
+    return redirect(url_for('tickets.tickets', **listing))
+
+
+@bp.route('/admin/import_tickets', methods=['POST'])
+@admin_required
+def import_tickets_upload():
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'attach a CSV or NDJSON file as "file"'}), 400
+    fmt = request.form.get('format') or request.args.get('format') or format_for(upload.filename)
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(FORMATS)}"}), 400
+
+    # upload.stream is read line by line; the whole file is never held in memory
+    result = import_tickets(get_read_connection(), upload.stream, fmt)
+    return jsonify({
+        'inserted': result.inserted,
+        'failed': result.failed,
+        'errors': [{'line': line, 'error': message} for line, message in result.errors],
+    })
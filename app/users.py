@@ -3,14 +3,23 @@
 from functools import wraps
 
 from flask import (
-    render_template, request, redirect, url_for, session, flash, abort
+    Blueprint, current_app, render_template, request, redirect, url_for, session, flash, abort, jsonify
 )
 
-from flask_mail import Message
+from app import slow_queries, ticket_cache
+from app.db import get_read_connection
+from app.hashing import hash_password
+from app.mail_queue import enqueue, message, wake
+from app.pagination import keyset, make_page, parse_page_args
+from app.principals import cache as principal_cache, get_principal, invalidate
+from app.writer import write
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
 
-from app import app, bcrypt, mail, ts
-from app.db import get_db_connection
-from itsdangerous import BadSignature, SignatureExpired
+bp = Blueprint("users", __name__)
+
+
+def reset_serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
 
 
 # ------------------ Auth/Role Decorator ------------------
@@ -19,14 +28,9 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if "username" not in session:
             flash("You need to log in to manage users.", "error")
-            return redirect(url_for("login"))
-        conn = get_db_connection()
-        user = conn.execute(
-            "SELECT role FROM users WHERE username = ?",
-            (session["username"],),
-        ).fetchone()
-        conn.close()
-        if not user or user["role"] != "admin":
+            return redirect(url_for("auth.login"))
+        user = get_principal(session["username"], get_read_connection())
+        if not user or user.role != "admin":
             abort(403)
         return f(*args, **kwargs)
 
@@ -34,29 +38,28 @@ def admin_required(f):
 
 
 # ------------------ Forgot / Reset Password ------------------
-@app.route("/forgot-password", methods=["GET", "POST"])
+@bp.route("/forgot-password", methods=["GET", "POST"])
 def forgot_password():
     if request.method == "POST":
         email = (request.form.get("email") or "").strip().lower()
         if not email:
             flash("Please enter your email address.", "error")
-            return redirect(url_for("forgot_password"))
+            return redirect(url_for("users.forgot_password"))
 
         # Look up the user by email
-        conn = get_db_connection()
+        conn = get_read_connection()
         user = conn.execute(
             "SELECT id, username, email FROM users WHERE LOWER(email) = ?",
             (email,),
         ).fetchone()
-        conn.close()
 
         # Always behave the same (avoid account enumeration)
         if user:
-            token = ts.dumps(email, salt="pwd-reset")
-            reset_url = url_for("reset_password", token=token, _external=True)
+            token = reset_serializer().dumps(email, salt="pwd-reset")
+            reset_url = url_for("users.reset_password", token=token, _external=True)
 
             try:
-                msg = Message(
+                msg = message(
                     subject="Reset your password",
                     recipients=[email],
                     body=(
@@ -67,29 +70,31 @@ def forgot_password():
                         "If you didn't request this, you can ignore this email."
                     ),
                 )
-                mail.send(msg)
+                # Only queue it here; app.mail_queue delivers it off the request path
+                write(lambda conn: enqueue(msg, conn))
+                wake()
             except Exception as e:
                 # Dev fallback: log the link so you can test without SMTP working
-                app.logger.warning("Reset email failed to send: %s", e)
-                app.logger.info("Password reset link (dev): %s", reset_url)
+                current_app.logger.warning("Reset email could not be queued: %s", e)
+                current_app.logger.info("Password reset link (dev): %s", reset_url)
 
         flash("If an account with that email exists, a reset link has been sent.", "success")
-        return redirect(url_for("login"))
+        return redirect(url_for("auth.login"))
 
     return render_template("forgot_password.html")
 
 
-@app.route("/reset-password/<token>", methods=["GET", "POST"])
+@bp.route("/reset-password/<token>", methods=["GET", "POST"])
 def reset_password(token):
     # Verify token (1 hour expiry)
     try:
-        email = ts.loads(token, salt="pwd-reset", max_age=3600)
+        email = reset_serializer().loads(token, salt="pwd-reset", max_age=3600)
     except SignatureExpired:
         flash("Reset link has expired. Please request a new one.", "error")
-        return redirect(url_for("forgot_password"))
+        return redirect(url_for("users.forgot_password"))
     except BadSignature:
         flash("Invalid reset link.", "error")
-        return redirect(url_for("forgot_password"))
+        return redirect(url_for("users.forgot_password"))
 
     if request.method == "POST":
         pwd = (request.form.get("password") or "").strip()
@@ -101,8 +106,8 @@ def reset_password(token):
         confirm = confirm.strip()
 
         # (Optional) debug without leaking secrets
-        app.logger.debug("Reset form keys: %s", list(request.form.keys()))
-        app.logger.debug("Lengths: pwd=%d confirm=%d", len(pwd), len(confirm))
+        current_app.logger.debug("Reset form keys: %s", list(request.form.keys()))
+        current_app.logger.debug("Lengths: pwd=%d confirm=%d", len(pwd), len(confirm))
 
         if len(pwd) < 8:
             flash("Password must be at least 8 characters.", "error")
@@ -113,72 +118,92 @@ def reset_password(token):
             return redirect(request.url)
 
         # Store a bcrypt hash (consistent with login)
-        hashed = bcrypt.generate_password_hash(pwd).decode("utf-8")
+        hashed = hash_password(pwd)
 
-        conn = get_db_connection()
-        conn.execute(
+        write(lambda conn: conn.execute(
             "UPDATE users SET password = ? WHERE LOWER(email) = ?",
             (hashed, email.lower()),
-        )
-        conn.commit()
-        conn.close()
+        ).rowcount)
 
         flash("Your password has been reset. You can now log in.", "success")
-        return redirect(url_for("login"))
+        return redirect(url_for("auth.login"))
 
     return render_template("reset_password.html", token=token)
 
 
 # ------------------ Admin: Manage Users ------------------
-@app.route("/admin_users")
+@bp.route("/admin_users")
 @admin_required
 def admin_users():
-    conn = get_db_connection()
+    conn = get_read_connection()
     role_filter = request.args.get("role")
+    after, before, per_page = parse_page_args(request.args, current_app.config["USERS_PAGE_SIZE"],
+                                              current_app.config["MAX_PAGE_SIZE"])
+    condition, cursor_params, order_by, _ = keyset("id", False, after, before)
+
+    query, params = "SELECT * FROM users WHERE 1=1", []
     if role_filter:
-        users = conn.execute(
-            "SELECT * FROM users WHERE role = ?",
-            (role_filter,),
-        ).fetchall()
-    else:
-        users = conn.execute("SELECT * FROM users").fetchall()
-    conn.close()
-    return render_template("admin_users.html", users=users, role=role_filter)
+        query += " AND role = ?"
+        params.append(role_filter)
+    rows = conn.execute(query + condition + order_by + " LIMIT ?",
+                        (*params, *cursor_params, per_page + 1)).fetchall()
+    page = make_page(rows, per_page, "id", after, before)
+    return render_template("admin_users.html", users=page.rows, page=page, role=role_filter)
 
 
-@app.route("/admin/users/edit/<int:user_id>", methods=["GET", "POST"])
+@bp.route("/admin/users/edit/<int:user_id>", methods=["GET", "POST"])
 @admin_required
 def edit_user(user_id):
-    conn = get_db_connection()
     if request.method == "POST":
         username = request.form["username"]
         email = request.form["email"]
         role = request.form["role"]
 
-        conn.execute(
+        write(lambda conn: conn.execute(
             "UPDATE users SET username = ?, email = ?, role = ? WHERE id = ?",
             (username, email, role, user_id),
-        )
-        conn.commit()
-        conn.close()
+        ).rowcount)
+        invalidate(username=username, user_id=user_id)
 
         flash("User updated successfully!", "success")
-        return redirect(url_for("admin_users"))
+        return redirect(url_for("users.admin_users"))
 
-    user = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
-    conn.close()
+    user = get_read_connection().execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
     return render_template("edit_user.html", user=user)
 
 
-@app.route("/admin/users/delete/<int:user_id>", methods=["POST"])
+@bp.route("/admin/users/delete/<int:user_id>", methods=["POST"])
 @admin_required
 def delete_user(user_id):
     try:
-        conn = get_db_connection()
-        conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
-        conn.commit()
-        conn.close()
+        write(lambda conn: conn.execute("DELETE FROM users WHERE id = ?", (user_id,)).rowcount)
+        invalidate(user_id=user_id)
         flash("User deleted successfully!", "success")
     except Exception as e:
         flash(f"An error occurred: {str(e)}", "error")
-    return redirect(url_for("admin_users"))
+    return redirect(url_for("users.admin_users"))
+
+
+@bp.route("/admin/cache-stats")
+@admin_required
+def cache_stats():
+    return jsonify({"principals": principal_cache.stats(), "tickets": ticket_cache.cache.stats()})
+
+
+@bp.route("/admin/slow-queries")
+@admin_required
+def slow_queries_report():
+    sort = request.args.get("sort", "total")
+    if sort not in slow_queries.SORT_COLUMNS:
+        sort = "total"
+    slow_queries.flush()  # include what this worker has buffered
+    return render_template("admin_slow_queries.html", queries=slow_queries.worst(get_read_connection(), sort), sort=sort,
+                           threshold_ms=current_app.config.get("SLOW_QUERY_MS"))
+
+
+@bp.route("/admin/slow-queries/clear", methods=["POST"])
+@admin_required
+def clear_slow_queries():
+    slow_queries.clear()
+    flash("Slow-query log cleared.", "success")
+    return redirect(url_for("users.slow_queries_report"))
@@ -0,0 +1,170 @@
+"""Single writer with group commit.
+
+Request handlers hand their mutations to ``write(fn)`` instead of committing on
+their own connection. ``fn(conn)`` runs on this process's writer thread, which
+owns the only connection that writes to the database. Jobs that arrive within
+WRITE_GROUP_WINDOW_MS of the first one (up to WRITE_GROUP_MAX) are applied in
+one ``BEGIN IMMEDIATE`` transaction and made durable by a single commit. Each
+job runs in its own savepoint, so a job that raises is rolled back on its own
+and only its caller sees the error. ``write`` blocks until the group has
+committed and returns what ``fn`` returned.
+
+``fn`` must not commit or roll back; the writer does. Anything it needs from a
+cursor has to be fetched before it returns.
+
+Config:
+    WRITE_GROUP_WINDOW_MS  how long the writer waits for more jobs after the first (0: take what is queued)
+    WRITE_GROUP_MAX        jobs per transaction
+    WRITE_TIMEOUT          seconds a caller waits for its job to start before giving up with a 503
+    WRITE_IDLE_TIMEOUT     seconds without writes before the thread closes its connection and exits
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from flask import current_app, has_app_context
+from werkzeug.exceptions import ServiceUnavailable
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WRITE_GROUP_WINDOW_MS': 2.0,
+    'WRITE_GROUP_MAX': 100,
+    'WRITE_TIMEOUT': 10.0,
+    'WRITE_IDLE_TIMEOUT': 60.0,
+}
+
+_lock = threading.Lock()
+_writers = {}  # database path -> Writer
+_owner_pid = None
+
+# Called as wrapper(fn) on the caller's thread; returns the job to queue instead of fn
+_job_wrappers = []
+
+
+def add_job_wrapper(wrapper):
+    """Have ``wrapper(fn)`` wrap every job ``write`` queues, e.g. to carry request state to the writer thread."""
+    if wrapper not in _job_wrappers:
+        _job_wrappers.append(wrapper)
+
+
+def _config(name):
+    if has_app_context():
+        return current_app.config.get(name, DEFAULTS[name])
+    return DEFAULTS[name]
+
+
+class Writer(threading.Thread):
+    """Applies queued jobs for one database file in group-committed transactions."""
+
+    def __init__(self, path, window, max_jobs, idle_timeout):
+        super().__init__(name='db-writer', daemon=True)
+        self.path = path
+        self.window = window
+        self.max_jobs = max_jobs
+        self.idle_timeout = idle_timeout
+        self.jobs = queue.SimpleQueue()
+        self.groups = 0  # transactions committed, for tests and debugging
+
+    def next_group(self):
+        """Block for a first job, then collect more until the window closes. None when idle."""
+        try:
+            group = [self.jobs.get(timeout=self.idle_timeout)]
+        except queue.Empty:
+            return None
+        deadline = time.monotonic() + self.window
+        while len(group) < self.max_jobs:
+            remaining = deadline - time.monotonic()
+            try:
+                group.append(self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def apply(self, conn, group):
+        """Run ``group`` in one transaction; settle every job's future."""
+        group = [(fn, future) for fn, future in group if future.set_running_or_notify_cancel()]
+        if not group:
+            return
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, future in group:
+                conn.execute('SAVEPOINT job')
+                try:
+                    outcomes.append((future, fn(conn), None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO job')
+                    outcomes.append((future, None, e))
+                conn.execute('RELEASE job')
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in group:
+                future.set_exception(e)
+            return
+        self.groups += 1
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def run(self):
+        conn = db.connect(self.path)
+        try:
+            while True:
+                group = self.next_group()
+                if group is None:
+                    with _lock:
+                        if not self.jobs.empty():
+                            continue
+                        if _writers.get(self.path) is self:
+                            del _writers[self.path]
+                        return
+                try:
+                    self.apply(conn, group)
+                except Exception:  # keep the writer alive; callers already got their errors
+                    logger.exception('Database writer error')
+        finally:
+            conn.really_close()
+
+
+def _writer_for(path):
+    """This process's writer for ``path`` (threads do not survive a fork, so start afresh in a child)."""
+    global _owner_pid
+    if _owner_pid != os.getpid():
+        _writers.clear()
+        _owner_pid = os.getpid()
+    writer = _writers.get(path)
+    if writer is None:
+        writer = _writers[path] = Writer(path, _config('WRITE_GROUP_WINDOW_MS') / 1000,
+                                         _config('WRITE_GROUP_MAX'), _config('WRITE_IDLE_TIMEOUT'))
+        writer.start()
+    return writer
+
+
+def write(fn, path=None):
+    """Run ``fn(conn)`` on the writer, in a transaction shared with concurrent writes; return its result."""
+    for wrapper in _job_wrappers:
+        fn = wrapper(fn)
+    future = Future()
+    with _lock:
+        _writer_for(path or db.database_path()).jobs.put((fn, future))
+    try:
+        return future.result(timeout=_config('WRITE_TIMEOUT'))
+    except TimeoutError:
+        if future.cancel():  # never started, and now never will
+            raise ServiceUnavailable('The server is busy, please try again in a moment.', retry_after=1)
+        return future.result()  # already in a transaction that is about to commit
+
+
+def init_app(app):
+    for name, value in DEFAULTS.items():
+        app.config.setdefault(name, value)
@@ -0,0 +1,174 @@
+"""Latency and throughput benchmark for the main routes.
+
+    python generate_data.py bench.db --users 2000 --tickets 200000
+    python benchmark.py bench.db --iterations 50 --save baseline.json
+    ... change something ...
+    python benchmark.py bench.db --iterations 50 --compare baseline.json
+
+Requests go through Flask's test client, so the numbers cover routing, SQL and
+template rendering but not the network or gunicorn. Every ``/tickets`` filter
+combination is run as an admin and as an apprentice.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+STATUSES = ('', 'open', 'in_progress', 'closed')
+PRIORITIES = ('', 'High', 'Medium', 'Low')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    total = sum(timings)
+    return {
+        'requests': len(timings),
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(total / len(timings) * 1000, 3),
+        'throughput_rps': round(len(timings) / total, 1) if total else 0.0,
+    }
+
+
+def scenarios(ticket_ids, admin, apprentice, password):
+    """Yield ``(name, user, method, url_or_factory, data, expected_status)``."""
+    for role, user in (('admin', admin), ('apprentice', apprentice)):
+        for status in STATUSES:
+            for priority in PRIORITIES:
+                query = '&'.join(f'{k}={v}' for k, v in (('status', status), ('priority', priority)) if v)
+                url = '/tickets' + (f'?{query}' if query else '')
+                yield f'GET {url} [{role}]', user, 'GET', url, None, 200
+        yield f'GET /api/tickets [{role}]', user, 'GET', '/api/tickets', None, 200
+
+    rng = random.Random(0)
+    yield ('GET /view_ticket/<id> [admin]', admin, 'GET',
+           lambda: f'/view_ticket/{rng.choice(ticket_ids)}', None, 200)
+    yield ('POST /login', None, 'POST', '/login', {'username': apprentice[0], 'password': password}, 302)
+
+
+def run(client, name, user, method, url, data, expected, iterations, warmup):
+    with client.session_transaction() as sess:
+        sess.clear()
+        if user is not None:
+            sess['username'], sess['role'] = user
+
+    timings = []
+    for i in range(warmup + iterations):
+        target = url() if callable(url) else url
+        started = time.perf_counter()
+        response = client.open(target, method=method, data=data)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        if response.status_code != expected:
+            raise RuntimeError(f'{name}: expected {expected}, got {response.status_code} for {target}')
+        if i >= warmup:
+            timings.append(elapsed)
+    return summarize(timings)
+
+
+def compare(results, baseline):
+    print(f"\n{'scenario':<58}{'p50 base':>10}{'p50 now':>10}{'change':>9}{'p95 change':>12}")
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+
+        def change(key):
+            return (now[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+
+        print(f"{name:<58}{before['p50_ms']:>10.2f}{now['p50_ms']:>10.2f}"
+              f"{change('p50_ms'):>+8.1f}%{change('p95_ms'):>+11.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the helpdesk routes against a database.')
+    parser.add_argument('database', help='database to benchmark, e.g. one made by generate_data.py')
+    parser.add_argument('--iterations', type=int, default=30, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=3, help='unmeasured requests per scenario')
+    parser.add_argument('--only', help='run only scenarios whose name contains this text')
+    parser.add_argument('--password', default='password123', help='password of the generated users')
+    parser.add_argument('--save', metavar='FILE', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare against a saved baseline')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        parser.error(f'{args.database} does not exist')
+
+    # The app reads its config from the environment at import time
+    os.environ['DATABASE'] = args.database
+    os.environ.setdefault('TESTING', 'true')
+    from main import app
+    from app.db import connect
+    app.config['DATABASE'] = args.database  # in case the app was already imported
+
+    conn = connect(args.database)
+    try:
+        ticket_ids = [row['id'] for row in conn.execute('SELECT id FROM tickets')]
+        admin = conn.execute("SELECT username, role FROM users WHERE role = 'admin' ORDER BY id").fetchone()
+        # The busiest apprentice is the worst case for their own ticket list
+        apprentice = conn.execute('''SELECT users.username, users.role, users.password
+                                     FROM users JOIN tickets ON tickets.user_id = users.id
+                                     WHERE users.role = 'apprentice'
+                                     GROUP BY users.id ORDER BY COUNT(*) DESC LIMIT 1''').fetchone()
+    finally:
+        conn.really_close()
+    if not ticket_ids or admin is None or apprentice is None:
+        parser.error('the database needs at least one admin, one apprentice and one ticket')
+
+    # Hash at the cost the users were generated with, so POST /login never rehashes
+    # (a write to the database being measured) and times the same bcrypt work every run.
+    rounds = app.config['BCRYPT_LOG_ROUNDS']
+    app.config['BCRYPT_LOG_ROUNDS'] = int(apprentice['password'].split('$')[2])
+    apprentice = (apprentice['username'], apprentice['role'])
+    results = {}
+    try:
+        with app.test_client() as client:
+            for name, user, method, url, data, expected in scenarios(ticket_ids, tuple(admin), apprentice,
+                                                                     args.password):
+                if args.only and args.only not in name:
+                    continue
+                results[name] = stats = run(client, name, user, method, url, data, expected,
+                                            args.iterations, args.warmup)
+                print(f"{name:<58}p50 {stats['p50_ms']:>8.2f}ms  p95 {stats['p95_ms']:>8.2f}ms  "
+                      f"p99 {stats['p99_ms']:>8.2f}ms  {stats['throughput_rps']:>8.1f} req/s")
+    finally:
+        app.config['BCRYPT_LOG_ROUNDS'] = rounds
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'meta': {
+                    'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                    'database': os.path.basename(args.database),
+                    'tickets': len(ticket_ids),
+                    'iterations': args.iterations,
+                    'python': platform.python_version(),
+                    'sqlite': sqlite3.sqlite_version,
+                },
+                'results': results,
+            }, f, indent=2)
+        print(f'\nSaved baseline to {args.save}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
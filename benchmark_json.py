@@ -0,0 +1,88 @@
+"""JSON response benchmark: the old dict-copy path against the row provider.
+
+    python benchmark_json.py --rows 500 --runs 50
+
+Builds ``--rows`` ticket rows (the API's largest page by default) and times
+building a ``jsonify`` response from them three ways: copying each row into a
+dict for Flask's default provider (the old ``api_tickets`` path), handing the
+rows to ``RowJSONProvider`` on the standard-library encoder, and the same with
+orjson when it is installed. Last comes the ``api_tickets`` path, where SQLite
+encodes each row (``json_object_sql``); its time includes running the query,
+the others start from rows already fetched. It also reports the gzip size and
+time of the body at levels 1 and 6.
+"""
+import argparse
+import gzip
+import random
+import sqlite3
+import statistics
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.json_provider import RowJSONProvider, json_object_sql, orjson
+
+
+WORDS = ('printer', 'laptop', 'password', 'reset', 'vpn', 'email', 'screen', 'broken', 'slow', 'cannot',
+         'login', 'access', 'floor', 'meeting', 'room', 'urgent', 'please', 'help', 'error', 'again', 'since',
+         'yesterday', 'update', 'install', 'licence', 'teams', 'outlook', 'keyboard', 'mouse', 'dock')
+
+
+def make_db(count):
+    rng = random.Random(1)
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE tickets (id INTEGER PRIMARY KEY, user_id INTEGER, title TEXT, description TEXT, '
+                 'priority TEXT, status TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+    conn.executemany(
+        'INSERT INTO tickets (user_id, title, description, priority, status) VALUES (?, ?, ?, ?, ?)',
+        [(rng.randrange(2000), ' '.join(rng.choices(WORDS, k=5)), ' '.join(rng.choices(WORDS, k=rng.randrange(10, 120))),
+          rng.choice(('Low', 'Medium', 'High')), rng.choice(('open', 'closed'))) for _ in range(count)],
+    )
+    return conn
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app({'TESTING': True, 'DATABASE_AUTO_MIGRATE': False})
+    conn = make_db(args.rows)
+    rows = conn.execute('SELECT * FROM tickets ORDER BY id').fetchall()
+    encoded_sql = f'SELECT id, {json_object_sql(rows[0].keys())} AS doc FROM tickets ORDER BY id'
+    default, fast = DefaultJSONProvider(app), RowJSONProvider(app)
+
+    with app.app_context():
+        body = default.response([dict(row) for row in rows]).get_data()
+        print(f'{args.rows} rows, {len(body) / 1024:.1f} KiB of JSON, median of {args.runs} runs')
+        results = [('dicts + stdlib (before)', timed(lambda: default.response([dict(row) for row in rows]), args.runs))]
+        for accelerated in (False, True) if orjson is not None else (False,):
+            fast.accelerated = accelerated
+            results.append((f"rows + {'orjson' if accelerated else 'stdlib'}",
+                            timed(lambda: fast.response(rows), args.runs)))
+        results.append(('SQLite json_object', timed(
+            lambda: fast.json_rows_response([row['doc'] for row in conn.execute(encoded_sql)]), args.runs)))
+        for label, ms in results:
+            print(f'  {label:<24} {ms:7.2f} ms  ({results[0][1] / ms:4.1f}x)')
+
+        for level in (1, 6):
+            compressed = gzip.compress(body, compresslevel=level, mtime=0)
+            gzip_ms = timed(lambda: gzip.compress(body, compresslevel=level, mtime=0), args.runs)
+            print(f'  gzip -{level}                  {gzip_ms:7.2f} ms  '
+                  f'{len(compressed) / 1024:.1f} KiB ({len(compressed) / len(body):.0%} of the body)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Worker startup benchmark: import-to-first-request cost.
+
+    python benchmark_startup.py --runs 10
+    python benchmark_startup.py --runs 10 --save startup.json
+    python benchmark_startup.py --importtime          # slowest imports of one run
+
+Each run is a fresh interpreter that imports the WSGI entry point (``main:app``,
+as gunicorn does), then serves one request through the test client. Reported
+per phase: interpreter start to ``main`` imported, and the first request.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+with main.app.test_client() as client:
+    status = client.get(sys.argv[1]).status_code
+served = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_request_ms": (served - imported) * 1000,
+                  "total_ms": (served - started) * 1000, "status": status}))
+'''
+
+
+def run_once(path, env, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', PROBE, path]
+    result = subprocess.run(command, cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr, top, max_depth=3):
+    """Parse ``-X importtime`` output into ``[(cumulative_us, depth, module), ...]``, slowest first."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # the header line
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # top level has one leading space, then 2 per level
+        if depth <= max_depth:
+            rows.append((int(parts[1]), depth, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure import-to-first-request time of the app.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/login', help='URL of the first request (default: /login)')
+    parser.add_argument('--importtime', action='store_true', help='show the slowest top-level imports of one run')
+    parser.add_argument('--save', metavar='FILE', help='write the results as JSON')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, TESTING='true', DATABASE=os.path.join(tmp, 'startup.db'),
+                   PYTHONDONTWRITEBYTECODE='')
+        run_once(args.path, env)  # creates the database and warms the bytecode cache
+
+        if args.importtime:
+            _, stderr = run_once(args.path, env, importtime=True)
+            for cumulative_us, depth, name in slowest_imports(stderr, 20):
+                print(f"{cumulative_us / 1000:>8.1f} ms  {'  ' * depth}{name}")
+            return 0
+
+        samples = [run_once(args.path, env)[0] for _ in range(args.runs)]
+
+    results = {}
+    for key in ('import_ms', 'first_request_ms', 'total_ms'):
+        values = sorted(sample[key] for sample in samples)
+        results[key] = {'median': round(statistics.median(values), 1), 'min': round(values[0], 1),
+                        'max': round(values[-1], 1)}
+        print(f"{key:<18}median {results[key]['median']:>7.1f} ms   "
+              f"min {results[key]['min']:>7.1f} ms   max {results[key]['max']:>7.1f} ms")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'runs': args.runs, 'path': args.path, 'results': results}, f, indent=2)
+        print(f'Saved to {args.save}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Build a helpdesk database of any size for load and performance testing.
+
+    python generate_data.py bench.db --users 2000 --tickets 1000000
+
+Every user's password is ``password123``. Ticket ownership, status and priority
+are skewed the way real data is (a few busy apprentices, mostly closed tickets,
+mostly Medium priority) and descriptions vary from one line to a few
+paragraphs. The same ``--seed`` always produces the same database.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import bcrypt
+
+from create_tables import init_db
+
+PASSWORD = 'password123'
+
+STATUS_WEIGHTS = {'closed': 60, 'open': 25, 'in_progress': 15}
+PRIORITY_WEIGHTS = {'Medium': 50, 'Low': 35, 'High': 15}
+
+SUBJECTS = ['laptop', 'printer', 'email', 'VPN', 'password', 'monitor', 'Wi-Fi', 'software licence',
+            'training portal', 'shared drive', 'calendar', 'phone', 'docking station', 'Teams', 'payroll']
+PROBLEMS = ['not working', 'very slow', 'keeps crashing', 'access request', 'error on startup',
+            'cannot connect', 'needs replacing', 'update request', 'locked out', 'missing']
+WORDS = ('the a my it is not when after before every morning since yesterday error message screen '
+         'login page connection keeps showing says tried restarting again still same problem help '
+         'please urgent team meeting file folder update install cable battery charger keyboard mouse '
+         'account permission denied timeout network office home working').split()
+
+
+def weighted(rng, weights, k):
+    return rng.choices(list(weights), weights=list(weights.values()), k=k)
+
+
+def description(rng):
+    # Log-normal lengths: mostly a sentence or two, occasionally a long write-up
+    length = max(3, min(int(rng.lognormvariate(3.0, 0.9)), 600))
+    return ' '.join(rng.choice(WORDS) for _ in range(length)).capitalize() + '.'
+
+
+def generate_users(count, admins, password_hash):
+    for i in range(1, count + 1):
+        if i <= admins:
+            yield f'admin{i}', password_hash, f'admin{i}@example.com', 'admin'
+        else:
+            n = i - admins
+            yield f'apprentice{n}', password_hash, f'apprentice{n}@example.com', 'apprentice'
+
+
+def generate_tickets(rng, count, owner_ids, days, batch=10000):
+    # Zipf-like ownership: the first apprentices file far more tickets than the rest
+    owner_weights = [1 / rank for rank in range(1, len(owner_ids) + 1)]
+    start = datetime.now() - timedelta(days=days)
+    step = timedelta(days=days) / max(count, 1)
+    created = 0
+    while created < count:
+        n = min(batch, count - created)
+        owners = rng.choices(owner_ids, weights=owner_weights, k=n)
+        statuses = weighted(rng, STATUS_WEIGHTS, n)
+        priorities = weighted(rng, PRIORITY_WEIGHTS, n)
+        for i in range(n):
+            title = f'{rng.choice(SUBJECTS).capitalize()} {rng.choice(PROBLEMS)}'
+            # Ids and timestamps increase together, as they do in production
+            created_at = (start + step * (created + i)).strftime('%Y-%m-%d %H:%M:%S')
+            yield owners[i], title, description(rng), priorities[i], statuses[i], created_at
+        created += n
+
+
+def generate(path, users=50, admins=5, tickets=1000, days=365, seed=0, rounds=12):
+    """Create ``path`` (which must not exist yet) and fill it. Returns the elapsed seconds."""
+    if os.path.exists(path):
+        raise FileExistsError(f'{path} already exists')
+    if users <= admins:
+        raise ValueError('users must be greater than admins (tickets need an apprentice owner)')
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    init_db(path)
+
+    # One bcrypt hash shared by every account: hashing per user would dominate the run
+    password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -200000')
+    try:
+        conn.execute('BEGIN')
+        conn.executemany('INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)',
+                         generate_users(users, admins, password_hash))
+        owner_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'apprentice' ORDER BY id")]
+        conn.executemany(
+            '''INSERT INTO tickets (user_id, title, description, priority, status, created_at)
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            generate_tickets(rng, tickets, owner_ids, days),
+        )
+        conn.execute('COMMIT')
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic helpdesk database.')
+    parser.add_argument('path', help='database file to create')
+    parser.add_argument('--users', type=int, default=50, help='total users, admins included (default: 50)')
+    parser.add_argument('--admins', type=int, default=5, help='how many of the users are admins (default: 5)')
+    parser.add_argument('--tickets', type=int, default=1000, help='tickets to create (default: 1000)')
+    parser.add_argument('--days', type=int, default=365, help='spread created_at over this many days')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rounds', type=int, default=int(os.getenv('BCRYPT_LOG_ROUNDS', '12')),
+                        help='bcrypt cost for the shared password hash')
+    args = parser.parse_args(argv)
+
+    elapsed = generate(args.path, users=args.users, admins=args.admins, tickets=args.tickets,
+                       days=args.days, seed=args.seed, rounds=args.rounds)
+    print(f'Created {args.path}: {args.users} users, {args.tickets} tickets in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
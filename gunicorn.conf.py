@@ -0,0 +1,34 @@
+# Read by gunicorn from the working directory, so `gunicorn main:app` (Procfile) uses it.
+import os
+import tempfile
+
+# Import the app and run migrations once in the master, then fork the workers from it.
+# Each worker opens its own SQLite connections after the fork (see app.db._forget_inherited_connections).
+preload_app = True
+
+# Threaded workers: an open /api/tickets/stream (opt-in live view) holds one thread for up to
+# STREAM_MAX_DURATION, not a whole worker process. STREAM_MAX_CONNECTIONS (default 4) keeps most
+# threads free for ordinary requests.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+
+# Workers share their /metrics numbers through snapshot files (see app.metrics). Run several servers on one
+# host? Give each its own METRICS_DIR.
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'helpdesk-metrics'))
+
+
+def on_starting(server):
+    # Snapshots left by the previous server's workers would otherwise be summed in forever
+    from app import metrics
+
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+    metrics.clear_snapshots(os.environ['METRICS_DIR'])
+
+
+def post_fork(server, worker):
+    # Threads do not survive the fork, so each worker starts its own mail sender here rather than on
+    # its first request: mail left queued by the previous server goes out right away.
+    from app import app as flask_app, mail_queue
+
+    if flask_app.config['MAIL_QUEUE_WORKER']:
+        mail_queue.ensure_worker(flask_app)
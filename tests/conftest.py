@@ -0,0 +1,70 @@
+"""Shared fixtures: every test gets its own freshly migrated database.
+
+A module adds the rows it needs by overriding ``client`` (or ``db_path``) and
+calling ``seed``::
+
+    @pytest.fixture
+    def client(client, db_path):
+        seed(db_path, users=[('boss', 'admin')], tickets=[(1, 'T', 'D', 'Low', 'open')])
+        login_as(client, 'admin')
+        return client
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Importing main builds the default app, which migrates its database. Point it at a copy
+# first so a test run never rewrites (or deletes rows from) the tracked helpdesk.db.
+_scratch = tempfile.mkdtemp(prefix='helpdesk-tests-')
+os.environ['DATABASE'] = os.path.join(_scratch, 'helpdesk.db')
+shutil.copyfile(os.path.join(os.path.dirname(__file__), os.pardir, 'helpdesk.db'), os.environ['DATABASE'])
+
+from app.db import connect  # noqa: E402
+from create_tables import init_db  # noqa: E402
+from main import app  # noqa: E402
+
+USERNAMES = {'admin': 'boss', 'apprentice': 'alex'}
+
+
+def seed(path, users=(), tickets=()):
+    """Insert ``users`` as ``(username, role)`` and ``tickets`` as ``(user_id, title, description, priority, status)``.
+
+    Users get the password 'x' and the email ``<username>@example.com``; ids follow the order given.
+    """
+    conn = connect(path)
+    conn.executemany('INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)',
+                     [(username, 'x', f'{username}@example.com', role) for username, role in users])
+    conn.executemany('INSERT INTO tickets (user_id, title, description, priority, status) VALUES (?, ?, ?, ?, ?)',
+                     tickets)
+    conn.commit()
+    conn.really_close()
+
+
+def login_as(client, role, username=None):
+    """Sign ``client`` in with ``role``, as 'boss' (admin) or 'alex' (apprentice) unless ``username`` is given."""
+    with client.session_transaction() as sess:
+        sess['username'] = username or USERNAMES[role]
+        sess['role'] = role
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """An empty, migrated database that the app uses for this test."""
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    monkeypatch.setitem(app.config, 'DATABASE', path)
+    monkeypatch.setitem(app.config, 'TESTING', True)
+    return path
+
+
+@pytest.fixture
+def client(db_path):
+    """A test client for the app, signed in as nobody."""
+    with app.test_client() as client:
+        yield client
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_scratch, ignore_errors=True)
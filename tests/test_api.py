@@ -0,0 +1,111 @@
+import json
+import pytest
+from main import app
+from conftest import login_as, seed
+
+
+@pytest.fixture
+def client(client, db_path):
+    seed(db_path, users=[('a', 'apprentice')],
+         tickets=[(1, f'Ticket {i}', 'long description ' * 20, 'Low', 'open') for i in range(1, 8)])
+    login_as(client, 'apprentice', 'a')  # owns every ticket above
+    return client
+
+
+def test_api_tickets_pages_with_cursor(client):
+    res = client.get('/api/tickets?limit=3')
+    assert res.status_code == 200
+    assert [t['id'] for t in res.get_json()] == [1, 2, 3]
+    assert res.headers['X-Next-Cursor'] == '3'
+
+    res = client.get('/api/tickets?limit=3&after=3')
+    assert [t['id'] for t in res.get_json()] == [4, 5, 6]
+
+    res = client.get('/api/tickets?limit=3&after=6')
+    assert [t['id'] for t in res.get_json()] == [7]
+    assert 'X-Next-Cursor' not in res.headers
+
+
+def test_api_tickets_field_projection(client):
+    res = client.get('/api/tickets?fields=title,status')
+    first = res.get_json()[0]
+    assert set(first) == {'id', 'title', 'status'}
+
+
+def test_api_tickets_rejects_unknown_field(client):
+    res = client.get('/api/tickets?fields=password')
+    assert res.status_code == 400
+
+
+def test_api_tickets_limit_is_capped(client):
+    app.config['API_MAX_PAGE_SIZE'] = 2
+    try:
+        res = client.get('/api/tickets?limit=1000')
+        assert len(res.get_json()) == 2
+    finally:
+        app.config['API_MAX_PAGE_SIZE'] = 500
+
+
+def test_api_tickets_next_link_ignores_url_for_options(client):
+    res = client.get('/api/tickets?limit=2&_method=DELETE&_external=1')
+    assert res.status_code == 200
+    assert res.headers['Link'] == '</api/tickets?limit=2&after=2>; rel="next"'
+
+
+def test_api_tickets_rejects_bad_cursor(client):
+    assert client.get('/api/tickets?after=abc').status_code == 400
+    assert client.get('/api/tickets?limit=0').status_code == 400
+
+
+def test_api_tickets_needs_login_and_shows_only_own_tickets(client):
+    seed(app.config['DATABASE'], users=[('b', 'apprentice')], tickets=[(2, 'Mine', 'd', 'Low', 'open')])
+
+    assert [t['id'] for t in client.get('/api/tickets').get_json()] == list(range(1, 8))
+    login_as(client, 'apprentice', 'b')
+    res = client.get('/api/tickets?limit=1')
+    assert [t['id'] for t in res.get_json()] == [8]
+    assert 'X-Next-Cursor' not in res.headers
+
+    login_as(client, 'admin')
+    assert len(client.get('/api/tickets').get_json()) == 8
+
+    with client.session_transaction() as sess:
+        sess.clear()
+    assert client.get('/api/tickets').status_code == 401
+
+
+def test_export_requires_admin_or_token(client, monkeypatch):
+    assert client.get('/api/tickets/export').status_code == 401  # signed in, but not an admin
+    monkeypatch.setitem(app.config, 'EXPORT_TOKEN', 'nightly')
+    assert client.get('/api/tickets/export', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/api/tickets/export', headers={'Authorization': 'Bearer nightly'}).status_code == 200
+
+
+def test_export_ndjson_streams_every_ticket(client):
+    login_as(client, 'admin')
+    app.config['EXPORT_BATCH_SIZE'] = 2
+    try:
+        res = client.get('/api/tickets/export?format=ndjson&fields=title')
+    finally:
+        app.config['EXPORT_BATCH_SIZE'] = 500
+    assert res.status_code == 200
+    assert res.mimetype == 'application/x-ndjson'
+    lines = res.get_data(as_text=True).splitlines()
+    assert len(lines) == 7
+    assert json.loads(lines[0]) == {'id': 1, 'title': 'Ticket 1'}
+
+
+def test_export_json_is_a_valid_array(client):
+    login_as(client, 'admin')
+    app.config['EXPORT_BATCH_SIZE'] = 3
+    try:
+        res = client.get('/api/tickets/export?format=json')
+    finally:
+        app.config['EXPORT_BATCH_SIZE'] = 500
+    data = json.loads(res.get_data(as_text=True))
+    assert [t['id'] for t in data] == list(range(1, 8))
+
+
+def test_export_rejects_unknown_format(client):
+    login_as(client, 'admin')
+    assert client.get('/api/tickets/export?format=xml').status_code == 400
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+
+from flask import url_for
+
+from app import create_app, db
+from create_tables import init_db
+
+
+def test_create_app_applies_config_and_registers_blueprints(tmp_path):
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    app = create_app({'TESTING': True, 'DATABASE': path, 'TICKETS_PAGE_SIZE': 7})
+
+    assert app.config['DATABASE'] == path
+    assert app.config['TICKETS_PAGE_SIZE'] == 7
+    assert app.config['SLOW_QUERY_MS'] == 200  # the app/config.py default; no module overrides it
+    assert app.config['MAIL_SUPPRESS_SEND'] is True
+    assert {'pages', 'auth', 'users', 'tickets', 'api'} <= set(app.blueprints)
+    with app.test_request_context():
+        assert url_for('tickets.view_ticket', ticket_id=3) == '/view_ticket/3'
+        assert url_for('api.api_tickets') == '/api/tickets'
+
+    assert 'mail' not in app.extensions  # set up on first send only
+    assert app.test_client().get('/login').status_code == 200
+
+
+def test_importing_the_package_does_not_build_an_app():
+    code = 'import sys, app; print(sorted(m for m in ("flask_mail", "app.tickets") if m in sys.modules))'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_forked_child_reconnects(tmp_path):
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    parent_conn = db._thread_connection(path)
+
+    db._forget_inherited_connections()  # what os.register_at_fork runs in the child
+    child_conn = db._thread_connection(path)
+
+    assert child_conn is not parent_conn
+    assert parent_conn in db._inherited  # kept alive, never closed from the child
+    child_conn.really_close()
+    db._inherited.remove(parent_conn)
+    parent_conn.really_close()
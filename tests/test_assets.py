@@ -0,0 +1,42 @@
+import gzip
+import re
+
+from app.assets import CACHE_CONTROL, AssetManifest
+from main import app
+
+
+def static_urls(html):
+    return re.findall(r'/static/[^"]+', html)
+
+
+def test_pages_link_fingerprinted_assets():
+    with app.test_client() as client:
+        urls = static_urls(client.get('/faq').get_data(as_text=True))
+    assert urls
+    assert all(re.fullmatch(r'/static/\w+\.[0-9a-f]{12}\.\w+', url) for url in urls)
+
+
+def test_fingerprinted_css_is_immutable_and_precompressed():
+    with app.test_client() as client:
+        css = next(url for url in static_urls(client.get('/faq').get_data(as_text=True)) if url.endswith('.css'))
+        plain = client.get(css)
+        zipped = client.get(css, headers={'Accept-Encoding': 'gzip'})
+        assert plain.headers['Cache-Control'] == zipped.headers['Cache-Control'] == CACHE_CONTROL
+        assert 'Content-Encoding' not in plain.headers
+        assert zipped.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(zipped.data) == plain.data == client.get('/static/styles.css').data
+        assert client.get(css, headers={'If-None-Match': zipped.headers['ETag']}).status_code == 304
+
+        # Unknown fingerprints are not files
+        assert client.get('/static/styles.000000000000.css').status_code == 404
+
+
+def test_fingerprint_follows_content(tmp_path):
+    (tmp_path / 'app.js').write_text('console.log(1);')
+    (tmp_path / 'big.css').write_text('body { color: red; }\n' * 100)
+    manifest = AssetManifest(str(tmp_path), max_inline=1000).build()
+    first = manifest.urls['app.js']
+    assert manifest.assets[manifest.urls['big.css']].data is None  # too big to keep in memory
+
+    (tmp_path / 'app.js').write_text('console.log(2);')
+    assert manifest.build().urls['app.js'] != first
@@ -0,0 +1,73 @@
+import pytest
+from main import app
+from app.db import connect
+from conftest import login_as, seed
+
+
+@pytest.fixture
+def client(client, db_path):
+    seed(db_path, users=[('alex', 'apprentice')], tickets=[(1, f'T{i}', 'D', 'Low', 'open') for i in range(1, 6)])
+    login_as(client, 'admin')
+    return client
+
+
+def rows():
+    conn = connect(app.config['DATABASE'])
+    result = {row['id']: (row['status'], row['priority']) for row in conn.execute('SELECT * FROM tickets')}
+    conn.really_close()
+    return result
+
+
+def test_batch_status_change_reports_missing_ids(client):
+    res = client.post('/tickets/batch', json={'ids': [1, 2, 99], 'action': 'status', 'status': 'closed'})
+    assert res.get_json() == {'action': 'status', 'value': 'closed', 'affected': [1, 2], 'missing': [99]}
+    assert rows()[1] == ('closed', 'Low')
+    assert rows()[3] == ('open', 'Low')
+
+
+def test_batch_priority_and_delete(client):
+    client.post('/tickets/batch', json={'ids': [3, 4], 'action': 'priority', 'priority': 'High'})
+    assert rows()[4] == ('open', 'High')
+
+    res = client.post('/tickets/batch', json={'ids': [4, 5], 'action': 'delete'})
+    assert res.get_json()['affected'] == [4, 5]
+    assert sorted(rows()) == [1, 2, 3]
+
+
+def test_batch_rejects_invalid_values(client):
+    assert client.post('/tickets/batch', json={'ids': [1], 'action': 'status', 'status': 'done'}).status_code == 400
+    assert client.post('/tickets/batch', json={'ids': [], 'action': 'delete'}).status_code == 400
+    assert client.post('/tickets/batch', json={'ids': ['x'], 'action': 'delete'}).status_code == 400
+
+
+@pytest.mark.parametrize('body', [
+    {'ids': '12', 'action': 'delete'},       # a string is not a list of ids
+    {'ids': [True], 'action': 'delete'},
+    {'ids': ['1'], 'action': 'delete'},
+    {'ids': 1, 'action': 'delete'},
+    [1, 2],                                  # not an object at all
+])
+def test_batch_rejects_malformed_json(client, body):
+    res = client.post('/tickets/batch', json=body)
+    assert res.status_code == 400
+    assert 'error' in res.get_json()
+    assert sorted(rows()) == [1, 2, 3, 4, 5]
+
+
+def test_batch_form_flashes_summary_and_keeps_filters(client):
+    res = client.post('/tickets/batch', data={
+        'ticket_ids': ['1', '2'], 'action': 'status', 'status': 'in_progress',
+        'next_query': 'priority=Low&_external=1&_scheme=javascript&_anchor=x&evil=1',
+    })
+    assert res.status_code == 302
+    assert res.headers['Location'].endswith('/tickets?priority=Low')
+    page = client.get(res.headers['Location'])
+    assert b'2 ticket(s) updated' in page.data
+    assert b'batchForm' in page.data
+
+
+def test_batch_requires_admin(client):
+    with client.session_transaction() as sess:
+        sess['role'] = 'apprentice'
+    client.post('/tickets/batch', json={'ids': [1], 'action': 'delete'})
+    assert 1 in rows()
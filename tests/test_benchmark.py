@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import benchmark
+import generate_data
+from app import principals
+from app.db import connect
+from main import app
+
+
+@pytest.fixture
+def bench_db(tmp_path):
+    path = str(tmp_path / 'bench.db')
+    generate_data.generate(path, users=12, admins=2, tickets=500, seed=1, rounds=4)
+    return path
+
+
+def test_generate_counts_and_skew(bench_db):
+    conn = connect(bench_db)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM users WHERE role = 'admin'").fetchone()[0] == 2
+        assert conn.execute('SELECT COUNT(*) FROM tickets').fetchone()[0] == 500
+        by_status = dict(conn.execute('SELECT status, COUNT(*) FROM tickets GROUP BY status').fetchall())
+        assert by_status['closed'] > by_status['open'] > by_status['in_progress']
+        owners = [row[0] for row in conn.execute('SELECT COUNT(*) FROM tickets GROUP BY user_id ORDER BY 1 DESC')]
+        assert owners[0] > 3 * owners[-1]
+        # Stats triggers and the search index are filled as rows go in
+        assert conn.execute("SELECT count FROM ticket_stats WHERE dimension = 'total'").fetchone()[0] == 500
+        assert conn.execute("SELECT COUNT(*) FROM tickets_fts WHERE tickets_fts MATCH 'printer'").fetchone()[0] > 0
+    finally:
+        conn.really_close()
+
+
+def test_generate_refuses_to_overwrite(bench_db):
+    with pytest.raises(FileExistsError):
+        generate_data.generate(bench_db)
+
+
+def test_percentile():
+    values = [i / 1000 for i in range(1, 101)]
+    assert benchmark.percentile(values, 50) == 0.05
+    assert benchmark.percentile(values, 99) == 0.099
+    assert benchmark.percentile([0.2], 95) == 0.2
+
+
+def test_benchmark_saves_baseline(bench_db, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv('DATABASE', bench_db)
+    monkeypatch.setitem(app.config, 'DATABASE', bench_db)
+    principals.cache.clear()
+    baseline = tmp_path / 'baseline.json'
+
+    assert benchmark.main([bench_db, '--iterations', '3', '--warmup', '0', '--only', 'priority=High',
+                           '--save', str(baseline)]) == 0
+    principals.cache.clear()
+
+    saved = json.loads(baseline.read_text())
+    assert saved['meta']['tickets'] == 500
+    assert set(saved['results']) == {
+        f'GET /tickets?{query}priority=High [{role}]'
+        for role in ('admin', 'apprentice') for query in ('', 'status=open&', 'status=in_progress&', 'status=closed&')
+    }
+    for stats in saved['results'].values():
+        assert stats['requests'] == 3
+        assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms']
+
+
+def test_benchmark_login_does_not_rehash(bench_db, monkeypatch, capsys):
+    monkeypatch.setenv('DATABASE', bench_db)
+    monkeypatch.setitem(app.config, 'DATABASE', bench_db)
+    monkeypatch.setitem(app.config, 'BCRYPT_LOG_ROUNDS', 12)  # not the cost the users were generated with
+    principals.cache.clear()
+
+    def hashes():
+        conn = connect(bench_db)
+        try:
+            return conn.execute('SELECT password FROM users ORDER BY id').fetchall()
+        finally:
+            conn.really_close()
+
+    before = hashes()
+    assert benchmark.main([bench_db, '--iterations', '2', '--warmup', '0', '--only', 'POST /login']) == 0
+    principals.cache.clear()
+    assert hashes() == before
+    assert app.config['BCRYPT_LOG_ROUNDS'] == 12
@@ -0,0 +1,152 @@
+import json
+
+import pytest
+
+from app import changes, migrations
+from app.db import connect
+from conftest import login_as, seed
+from main import app
+
+
+@pytest.fixture
+def db_path(db_path):
+    seed(db_path, users=[('boss', 'admin'), ('app1', 'apprentice'), ('app2', 'apprentice')],
+         tickets=[(2, 'Mine', 'D', 'Low', 'open'), (3, 'Theirs', 'D', 'Low', 'open')])
+    conn = connect(db_path)
+    conn.execute("UPDATE tickets SET status = 'closed' WHERE id = 1")
+    conn.execute('DELETE FROM tickets WHERE id = 2')
+    conn.commit()
+    conn.really_close()
+    return db_path
+
+
+def events(text):
+    """Parse SSE text into ``[(event, id, data), ...]``."""
+    parsed = []
+    for block in text.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            parsed.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+    return parsed
+
+
+def read_stream(path, after, user_id=None):
+    return events(''.join(changes.stream(path, after, user_id, poll_interval=0.01, max_duration=0.05)))
+
+
+def test_triggers_log_every_change(db_path):
+    received = read_stream(db_path, 0)
+    assert [(data['op'], data['ticket_id']) for _, _, data in received] == \
+        [('insert', 1), ('insert', 2), ('update', 1), ('delete', 2)]
+    assert [event_id for _, event_id, _ in received] == ['1', '2', '3', '4']
+    assert received[2][2]['ticket'] == {'id': 1, 'title': 'Mine', 'status': 'closed', 'priority': 'Low', 'user_id': 2}
+    assert received[3][2]['ticket'] is None
+
+
+def test_apprentice_sees_only_own_tickets(db_path):
+    received = read_stream(db_path, 0, user_id=2)
+    assert {data['ticket_id'] for _, _, data in received} == {1}
+
+
+def test_resume_after_last_event_id(db_path):
+    assert [data['seq'] for _, _, data in read_stream(db_path, 2)] == [3, 4]
+
+
+def test_new_stream_starts_at_the_present(db_path):
+    assert read_stream(db_path, None) == []
+
+
+def test_resume_from_before_pruned_rows_asks_for_reset(db_path):
+    conn = connect(db_path)
+    conn.execute('DELETE FROM ticket_changes WHERE seq <= 3')
+    conn.commit()
+    conn.really_close()
+    assert read_stream(db_path, 1) == [('reset', None, {})]
+
+
+def test_stream_route(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'STREAM_POLL_INTERVAL', 0.01)
+    monkeypatch.setitem(app.config, 'STREAM_MAX_DURATION', 0.05)
+    assert client.get('/api/tickets/stream').status_code == 401
+
+    login_as(client, 'apprentice', 'app2')
+    res = client.get('/api/tickets/stream', headers={'Last-Event-ID': '0'})
+    assert res.mimetype == 'text/event-stream'
+    assert [(data['op'], data['ticket_id']) for _, _, data in events(res.get_data(as_text=True))] == \
+        [('insert', 2), ('delete', 2)]
+
+    assert client.get('/api/tickets/stream?last_event_id=x').status_code == 400
+
+
+def test_stream_refuses_a_session_whose_user_is_gone(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'STREAM_MAX_DURATION', 0.01)
+    login_as(client, 'apprentice', 'ghost')  # e.g. the account was deleted after signing in
+    assert client.get('/api/tickets/stream', headers={'Last-Event-ID': '0'}).status_code == 401
+    assert client.get('/api/tickets').status_code == 401
+
+
+def test_open_streams_are_capped_per_process(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'STREAM_MAX_DURATION', 0.01)
+    monkeypatch.setitem(app.config, 'STREAM_MAX_CONNECTIONS', 1)
+    login_as(client, 'admin')
+    held = client.get('/api/tickets/stream', buffered=False)
+    refused = client.get('/api/tickets/stream')
+    assert refused.status_code == 503
+    assert 'Retry-After' in refused.headers
+    held.close()  # frees the slot, even though the stream was never read
+    assert client.get('/api/tickets/stream').status_code == 200
+
+
+def test_tickets_page_subscribes_only_in_live_view(client):
+    login_as(client, 'admin')
+    assert b'EventSource' not in client.get('/tickets').data
+    assert b'EventSource' in client.get('/tickets?live=1').data
+
+
+def sync(client, **args):
+    res = client.get('/api/tickets', query_string=args)
+    assert res.status_code == 200
+    return res.get_json()
+
+
+def test_delta_sync_returns_changes_and_tombstones(client, db_path):
+    assert client.get('/api/tickets?since=0').status_code == 401
+    login_as(client, 'admin')
+
+    full = sync(client, since=0, fields='title,status')
+    assert full == {'tickets': [{'seq': 3, 'id': 1, 'title': 'Mine', 'status': 'closed'}],
+                    'deleted': [2], 'high_water': 4, 'has_more': False}
+    assert sync(client, since=4) == {'tickets': [], 'deleted': [], 'high_water': 4, 'has_more': False}
+
+    conn = connect(db_path)
+    conn.execute("UPDATE tickets SET priority = 'High' WHERE id = 1")
+    conn.execute("INSERT INTO tickets (user_id, title, description, priority, status) VALUES (3, 'New', 'D', 'Low', 'open')")
+    conn.commit()
+    conn.really_close()
+    delta = sync(client, since=4, fields='priority')
+    assert delta['tickets'] == [{'seq': 5, 'id': 1, 'priority': 'High'}, {'seq': 6, 'id': 3, 'priority': 'Low'}]
+    assert delta['high_water'] == 6
+
+    page = sync(client, since=0, limit=1)
+    assert (page['deleted'], page['high_water'], page['has_more']) == ([2], 4, True)
+    assert client.get('/api/tickets?since=0&limit=1&_method=DELETE').headers['Link'] == \
+        '</api/tickets?since=4&limit=1>; rel="next"'
+
+    assert client.get('/api/tickets?since=x').status_code == 400
+    assert client.get('/api/tickets?since=0&after=3').status_code == 400
+
+
+def test_delta_sync_apprentice_sees_own_tickets(client):
+    login_as(client, 'apprentice', 'app2')
+    assert sync(client, since=0) == {'tickets': [], 'deleted': [2], 'high_water': 4, 'has_more': False}
+
+
+def test_sync_backfills_tickets_older_than_the_change_log(tmp_path):
+    path = str(tmp_path / 'old.db')
+    migrations.upgrade(path, target=10)
+    seed(path, users=[('boss', 'admin')], tickets=[(1, 'Old', 'D', 'Low', 'open')])
+
+    migrations.upgrade(path)
+    conn = connect(path)
+    assert changes.sync_since(conn, 0, ['id', 'title']) == ([{'seq': 1, 'id': 1, 'title': 'Old'}], [], 1, False)
+    conn.really_close()
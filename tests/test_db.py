@@ -0,0 +1,44 @@
+import pytest
+from main import app
+from app import db
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'helpdesk.db')
+    original = app.config['DATABASE']
+    app.config['DATABASE'] = path
+    yield path
+    app.config['DATABASE'] = original
+
+
+def test_connection_is_reused_within_app_context(db_path):
+    with app.app_context():
+        first = db.get_db_connection()
+        second = db.get_db_connection()
+        assert first is second
+
+
+def test_connection_is_reused_across_requests_on_same_thread(db_path):
+    with app.app_context():
+        first = db.get_db_connection()
+    with app.app_context():
+        second = db.get_db_connection()
+    assert first is second
+
+
+def test_pragmas_applied_at_connect(db_path):
+    with app.app_context():
+        conn = db.get_db_connection()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+        assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+
+def test_close_keeps_pooled_connection_usable(db_path):
+    with app.app_context():
+        conn = db.get_db_connection()
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.execute('INSERT INTO t VALUES (1)')
+        conn.close()  # uncommitted insert is rolled back, connection stays open
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
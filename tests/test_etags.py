@@ -0,0 +1,40 @@
+import pytest
+from main import app
+from conftest import login_as, seed
+
+
+@pytest.fixture
+def client(client, db_path):
+    seed(db_path, users=[('boss', 'admin')], tickets=[(1, 'T', 'D', 'Low', 'open')])
+    login_as(client, 'admin')
+    return client
+
+
+def add_ticket():
+    seed(app.config['DATABASE'], tickets=[(1, 'N', 'D', 'High', 'open')])
+
+
+@pytest.mark.parametrize('url', ['/tickets', '/api/tickets'])
+def test_unchanged_listing_is_not_modified(client, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = client.get(url, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+@pytest.mark.parametrize('url', ['/tickets', '/api/tickets'])
+def test_write_changes_etag(client, url):
+    etag = client.get(url).headers['ETag']
+    add_ticket()
+    res = client.get(url, headers={'If-None-Match': etag})
+    assert res.status_code == 200
+    assert res.headers['ETag'] != etag
+
+
+def test_filters_are_part_of_etag(client):
+    etag = client.get('/tickets').headers['ETag']
+    res = client.get('/tickets?status=closed', headers={'If-None-Match': etag})
+    assert res.status_code == 200
@@ -0,0 +1,105 @@
+import threading
+
+import bcrypt as _bcrypt
+import pytest
+from werkzeug.exceptions import ServiceUnavailable
+
+from main import app
+from create_tables import init_db
+from app import hashing
+from app.db import connect
+
+
+@pytest.fixture
+def hashing_config():
+    original = {key: app.config[key] for key in ('BCRYPT_LOG_ROUNDS', 'BCRYPT_POOL_SIZE', 'BCRYPT_MAX_PENDING')}
+    app.config.update(BCRYPT_LOG_ROUNDS=4, BCRYPT_POOL_SIZE=1, BCRYPT_MAX_PENDING=2)
+    hashing._owner_pid = None  # rebuild the pool with this config
+    yield app.config
+    app.config.update(original)
+    if hashing._pool is not None:
+        hashing._pool.shutdown()
+    hashing._owner_pid = None
+
+
+def test_hash_and_check_in_pool(hashing_config):
+    with app.app_context():
+        pw_hash = hashing.hash_password('s3cret!')
+        assert pw_hash.startswith('$2b$04$')
+        assert hashing.check_password(pw_hash, 's3cret!')
+        assert not hashing.check_password(pw_hash, 'wrong')
+        assert not hashing.check_password('not-a-hash', 's3cret!')
+
+
+def test_hash_from_a_request_thread_while_others_run(hashing_config):
+    # As under gthread: the pool is first started from a non-main thread while other threads hold locks
+    stop = threading.Event()
+    held = threading.Lock()
+
+    def busy():
+        with held:
+            stop.wait(10)
+
+    others = [threading.Thread(target=busy) for _ in range(3)]
+    for thread in others:
+        thread.start()
+    results = []
+
+    def request():
+        with app.app_context():
+            pw_hash = hashing.hash_password('s3cret!')
+            results.append(hashing.check_password(pw_hash, 's3cret!'))
+
+    try:
+        worker = threading.Thread(target=request)
+        worker.start()
+        worker.join(30)
+        assert not worker.is_alive()
+        assert results == [True]
+    finally:
+        stop.set()
+        for thread in others:
+            thread.join()
+
+
+def test_saturated_pool_is_rejected_with_503(hashing_config):
+    with app.app_context():
+        _, slots = hashing._state()
+        slots.acquire()
+        slots.acquire()
+        try:
+            with pytest.raises(ServiceUnavailable):
+                hashing.hash_password('s3cret!')
+        finally:
+            slots.release()
+            slots.release()
+
+
+def test_needs_rehash_compares_cost(hashing_config):
+    with app.app_context():
+        assert not hashing.needs_rehash(_bcrypt.hashpw(b'x', _bcrypt.gensalt(4)).decode())
+        assert hashing.needs_rehash(_bcrypt.hashpw(b'x', _bcrypt.gensalt(5)).decode())
+
+
+def test_login_rehashes_to_configured_cost(hashing_config, tmp_path):
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    conn = connect(path)
+    old_hash = _bcrypt.hashpw(b'password123', _bcrypt.gensalt(5)).decode()
+    conn.execute("INSERT INTO users (username, password, email, role) VALUES ('alex', ?, 'a@example.com', 'apprentice')",
+                 (old_hash,))
+    conn.commit()
+
+    original = app.config['DATABASE']
+    app.config['DATABASE'] = path
+    try:
+        with app.test_client() as client:
+            res = client.post('/login', data={'username': 'alex', 'password': 'password123'})
+        assert res.status_code == 302
+    finally:
+        app.config['DATABASE'] = original
+
+    new_hash = conn.execute("SELECT password FROM users WHERE username = 'alex'").fetchone()[0]
+    conn.really_close()
+    assert new_hash.startswith('$2b$04$')
+    assert _bcrypt.checkpw(b'password123', new_hash.encode())
@@ -0,0 +1,72 @@
+import io
+import json
+
+import pytest
+from main import app
+from app.db import connect
+from app.importer import import_tickets
+from conftest import login_as, seed
+
+
+@pytest.fixture
+def conn(db_path):
+    seed(db_path, users=[('alex', 'apprentice'), ('boss', 'admin')])
+    conn = connect(db_path)
+    yield conn
+    conn.really_close()
+
+
+CSV = (
+    'username,title,description,priority,status,created_at\n'
+    'alex,Laptop,Will not boot,High,open,2023-01-02 10:00:00\n'
+    'alex,Bad priority,Desc,Urgent,open,\n'
+    'ghost,Unknown user,Desc,Low,open,\n'
+    'alex,Printer,Out of toner,Low,,\n'
+    'alex,,No title,Low,open,\n'
+)
+
+
+def test_csv_import_reports_bad_rows_and_keeps_good_ones(conn):
+    result = import_tickets(conn, io.BytesIO(CSV.encode()), 'csv', chunk_size=2, path=app.config['DATABASE'])
+    assert (result.inserted, result.failed) == (2, 3)
+    assert [line for line, _ in result.errors] == [3, 4, 6]
+    assert 'priority' in result.errors[0][1]
+
+    rows = conn.execute('SELECT title, status, created_at FROM tickets ORDER BY id').fetchall()
+    assert [tuple(r) for r in rows][0] == ('Laptop', 'open', '2023-01-02 10:00:00')
+    assert rows[1]['status'] == 'open'
+
+
+def test_ndjson_import(conn):
+    lines = [
+        json.dumps({'user_id': 1, 'title': 'A', 'description': 'D', 'priority': 'Medium', 'status': 'closed'}),
+        '{not json',
+        json.dumps({'user_id': 99, 'title': 'B', 'description': 'D', 'priority': 'Low'}),
+        '',
+        json.dumps({'user_id': '1', 'title': 'C', 'description': 'D', 'priority': 'Low'}),
+    ]
+    result = import_tickets(conn, io.BytesIO('\n'.join(lines).encode()), 'ndjson', path=app.config['DATABASE'])
+    assert (result.inserted, result.failed) == (2, 2)
+    assert [line for line, _ in result.errors] == [2, 3]
+
+
+def test_upload_endpoint_is_admin_only(conn, client):
+    data = {'file': (io.BytesIO(CSV.encode()), 'legacy.csv')}
+    res = client.post('/admin/import_tickets', data=data, content_type='multipart/form-data')
+    assert res.status_code == 302
+
+    login_as(client, 'admin')
+    data = {'file': (io.BytesIO(CSV.encode()), 'legacy.csv')}
+    res = client.post('/admin/import_tickets', data=data, content_type='multipart/form-data')
+    body = res.get_json()
+    assert (body['inserted'], body['failed']) == (2, 3)
+    assert body['errors'][1] == {'line': 4, 'error': "unknown username 'ghost'"}
+
+
+def test_import_cli(conn, tmp_path):
+    path = tmp_path / 'legacy.ndjson'
+    path.write_text(json.dumps({'username': 'alex', 'title': 'A', 'description': 'D', 'priority': 'Low'}) + '\n')
+    result = app.test_cli_runner().invoke(args=['import-tickets', str(path)])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 1 ticket(s), 0 row(s) failed.' in result.output
+    assert conn.execute('SELECT COUNT(*) FROM tickets').fetchone()[0] == 1
@@ -0,0 +1,191 @@
+import socketserver
+import threading
+
+import pytest
+from flask import Flask
+from flask_mail import Mail, Message
+
+from main import app
+from create_tables import init_db
+from app import create_app, mail_queue
+from app.db import connect
+from app.mail_queue import MailQueueWorker, enqueue
+from app.writer import write
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server to accept mail and count connections."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, reject_rcpt=False):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.reject_rcpt = reject_rcpt
+        self.connections = 0
+        self.messages = []
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 stand-in ESMTP')
+        rcpts = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 stand-in')
+            elif command == 'MAIL':
+                rcpts = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                if self.server.reject_rcpt:
+                    self.reply('451 try again later')
+                else:
+                    rcpts.append(line)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                data = []
+                while (chunk := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(chunk)
+                self.server.messages.append((rcpts, b''.join(data)))
+                self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    original = app.config['DATABASE']
+    app.config.update(DATABASE=path, MAIL_QUEUE_WORKER=False)
+    yield path
+    app.config['DATABASE'] = original
+
+
+def mail_for(server):
+    mail_app = Flask('mail-stand-in')
+    mail_app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=server.server_address[1],
+                           MAIL_USE_TLS=False, MAIL_USE_SSL=False, MAIL_DEFAULT_SENDER='helpdesk@example.com')
+    return Mail(mail_app)
+
+
+def queue(n):
+    with app.app_context():
+        for i in range(n):
+            msg = Message(subject=f'Hello {i}', recipients=[f'user{i}@example.com'], body='Hi', sender='helpdesk@example.com')
+            write(lambda conn: enqueue(msg, conn))
+
+
+def outbox(path):
+    conn = connect(path)
+    rows = conn.execute('SELECT * FROM mail_outbox ORDER BY id').fetchall()
+    conn.really_close()
+    return rows
+
+
+def test_batch_is_sent_over_one_connection(db_path, smtp_server):
+    queue(3)
+    worker = MailQueueWorker(app, connect_mail=mail_for(smtp_server).connect)
+    conn = connect(db_path)
+    with app.app_context():
+        assert worker.drain_once(conn) == 3
+        assert worker.drain_once(conn) == 0
+        worker.close_smtp()
+    conn.really_close()
+
+    assert len(smtp_server.messages) == 3
+    assert smtp_server.connections == 1
+    assert [row['status'] for row in outbox(db_path)] == ['sent'] * 3
+
+
+def test_failed_send_is_retried_with_backoff(db_path):
+    server = SMTPStandIn(reject_rcpt=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    queue(1)
+    app.config['MAIL_QUEUE_MAX_ATTEMPTS'] = 2
+    worker = MailQueueWorker(app, connect_mail=mail_for(server).connect)
+    conn = connect(db_path)
+    try:
+        with app.app_context():
+            worker.drain_once(conn)
+            row = outbox(db_path)[0]
+            assert (row['status'], row['attempts']) == ('pending', 1)
+            assert row['next_attempt_at'] > row['claimed_at']
+            assert worker.drain_once(conn) == 0  # not due yet
+
+            conn.execute('UPDATE mail_outbox SET next_attempt_at = 0')
+            conn.commit()
+            worker.drain_once(conn)
+            worker.close_smtp()
+    finally:
+        app.config['MAIL_QUEUE_MAX_ATTEMPTS'] = 5
+        conn.really_close()
+        server.shutdown()
+        server.server_close()
+
+    row = outbox(db_path)[0]
+    assert (row['status'], row['attempts']) == ('failed', 2)
+    assert '451' in row['last_error']
+
+
+def test_forgot_password_only_enqueues(db_path):
+    conn = connect(db_path)
+    conn.execute("INSERT INTO users (username, password, email, role) VALUES ('alex', 'x', 'alex@example.com', 'apprentice')")
+    conn.commit()
+    conn.really_close()
+
+    with app.test_client() as client:
+        res = client.post('/forgot-password', data={'email': 'Alex@Example.com'})
+    assert res.status_code == 302
+
+    rows = outbox(db_path)
+    assert len(rows) == 1
+    assert rows[0]['status'] == 'pending'
+    assert 'alex@example.com' in rows[0]['recipients']
+    assert 'reset-password' in rows[0]['body']
+
+
+class WorkerStandIn:
+    started = []
+
+    def __init__(self, app):
+        self.app = app
+
+    def start(self):
+        self.started.append(self)
+
+    def is_alive(self):
+        return True
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_worker_starts_with_the_first_request(db_path, monkeypatch, enabled):
+    monkeypatch.setattr(mail_queue, 'MailQueueWorker', WorkerStandIn)
+    monkeypatch.setattr(mail_queue, '_worker', None)
+    monkeypatch.setattr(WorkerStandIn, 'started', [])
+    web = create_app({'DATABASE': db_path, 'TESTING': False, 'MAIL_QUEUE_WORKER': enabled})
+    client = web.test_client()
+    client.get('/login')
+    client.get('/login')  # already running: not started again
+
+    assert len(WorkerStandIn.started) == (1 if enabled else 0)
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from flask import g
+from main import app
+from app import metrics
+from app.writer import write
+from conftest import login_as, seed
+
+
+@pytest.fixture
+def client(client, db_path, monkeypatch):
+    seed(db_path, users=[('boss', 'admin')], tickets=[(1, 'T', 'D', 'Low', 'open')])
+    monkeypatch.setitem(app.config, 'METRICS_DIR', None)
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', None)
+    monkeypatch.setattr(metrics, 'registry', metrics.Registry())
+    login_as(client, 'admin')
+    return client
+
+
+def samples(text):
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            result[name] = float(value)
+    return result
+
+
+def test_records_requests_latency_and_sql(client):
+    client.get('/view_ticket/1')
+    client.get('/view_ticket/1')
+    client.get('/no-such-page')
+
+    res = client.get('/metrics')
+    assert res.mimetype == 'text/plain'
+    text = res.get_data(as_text=True)
+    assert '# TYPE helpdesk_http_request_duration_seconds histogram' in text
+    values = samples(text)
+    assert values['helpdesk_http_requests_total{endpoint="tickets.view_ticket",method="GET",status="200"}'] == 2
+    assert values['helpdesk_http_requests_total{endpoint="unmatched",method="GET",status="404"}'] == 1
+    assert values['helpdesk_http_request_duration_seconds_count{endpoint="tickets.view_ticket"}'] == 2
+    assert values['helpdesk_http_request_duration_seconds_bucket{endpoint="tickets.view_ticket",le="+Inf"}'] == 2
+    # At least the ticket lookup itself
+    assert values['helpdesk_sql_queries_total{endpoint="tickets.view_ticket"}'] >= 2
+    assert values['helpdesk_sql_duration_seconds_total{endpoint="tickets.view_ticket"}'] > 0
+    assert values['helpdesk_sql_queries_per_request_count{endpoint="tickets.view_ticket"}'] == 2
+
+
+def test_aggregates_snapshots_from_other_workers(client, tmp_path):
+    directory = tmp_path / 'metrics'
+    directory.mkdir()
+    app.config['METRICS_DIR'] = str(directory)
+    other = [
+        ['helpdesk_http_requests_total', [['endpoint', 'pages.faq'], ['method', 'GET'], ['status', '200']], 5],
+        ['helpdesk_http_request_duration_seconds', [['endpoint', 'pages.faq']], [1] * 11 + [0.01, 5]],
+    ]
+    (directory / '99999-abcd.json').write_text(json.dumps(other))
+
+    client.get('/faq')
+    values = samples(client.get('/metrics').get_data(as_text=True))
+    assert values['helpdesk_http_requests_total{endpoint="pages.faq",method="GET",status="200"}'] == 6
+    assert values['helpdesk_http_request_duration_seconds_count{endpoint="pages.faq"}'] == 6
+    # This worker's own snapshot was written for the others to read
+    assert len(list(directory.glob('*.json'))) == 2
+
+
+def test_only_admins_and_token_holders_can_read(client):
+    with client.session_transaction() as sess:
+        sess['role'] = 'apprentice'
+    assert client.get('/metrics').status_code == 401
+    app.config['METRICS_TOKEN'] = 's3cret'
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+
+def test_writer_statements_count_towards_the_request(client):
+    with app.test_request_context('/'):
+        g._metrics = [0.0, 0, 0.0]
+        write(lambda conn: conn.execute("UPDATE tickets SET status = 'closed' WHERE id = 1").rowcount)
+        assert g._metrics[1] == 1
+        assert g._metrics[2] > 0
+
+
+def test_clear_snapshots(tmp_path):
+    (tmp_path / '1-a.json').write_text('[]')
+    (tmp_path / '2-b.json.tmp').write_text('[')
+    metrics.clear_snapshots(str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    for value in (0.001, 0.02, 0.3, 20):
+        registry.observe('helpdesk_http_request_duration_seconds', {'endpoint': 'x'}, value)
+    text = metrics.render(metrics.merge([registry.snapshot()]))
+    values = samples(text)
+    assert values['helpdesk_http_request_duration_seconds_bucket{endpoint="x",le="0.005"}'] == 1
+    assert values['helpdesk_http_request_duration_seconds_bucket{endpoint="x",le="0.025"}'] == 2
+    assert values['helpdesk_http_request_duration_seconds_bucket{endpoint="x",le="10.0"}'] == 3
+    assert values['helpdesk_http_request_duration_seconds_bucket{endpoint="x",le="+Inf"}'] == 4
+    assert values['helpdesk_http_request_duration_seconds_sum{endpoint="x"}'] == pytest.approx(20.321)
@@ -0,0 +1,80 @@
+import sqlite3
+
+from app import migrations
+from app.query_plans import check
+
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        email TEXT,
+        role TEXT NOT NULL CHECK(role IN ('apprentice', 'admin'))
+    );
+    CREATE TABLE tickets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        priority TEXT CHECK(priority IN ('High', 'Medium', 'Low')),
+        status TEXT CHECK(status IN ('open', 'in_progress', 'closed')),
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    );
+    INSERT INTO users (username, password, email, role) VALUES ('alex', 'x', 'Alex@Example.com', 'apprentice');
+    INSERT INTO tickets (user_id, title, description, priority, status) VALUES (1, 'T', 'D', 'High', 'open');
+'''
+
+
+def test_upgrade_fresh_database(tmp_path):
+    path = str(tmp_path / 'fresh.db')
+    applied = migrations.upgrade(path)
+    assert applied == [v for v, _, _ in migrations.available_migrations()]
+
+    conn = sqlite3.connect(path)
+    assert migrations.current_version(conn) == migrations.latest_version()
+    conn.close()
+
+
+def test_upgrade_keeps_existing_data_and_is_idempotent(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+
+    assert migrations.upgrade(path)
+    assert migrations.upgrade(path) == []
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM tickets').fetchone()[0] == 1
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_tickets_user_status', 'idx_users_lower_email'} <= indexes
+    conn.close()
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    path = str(tmp_path / 'broken.db')
+    broken = tmp_path / '0999_broken.sql'
+    broken.write_text('CREATE TABLE half_done (x INTEGER);\nNOT VALID SQL;\n')
+    monkeypatch.setattr(migrations, 'available_migrations', lambda: [(999, 'broken', str(broken))])
+
+    try:
+        migrations.upgrade(path)
+    except sqlite3.OperationalError:
+        pass
+    else:
+        raise AssertionError('broken migration should raise')
+
+    conn = sqlite3.connect(path)
+    assert migrations.current_version(conn) == 0
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    conn.close()
+
+
+def test_route_queries_use_indexes(tmp_path):
+    path = str(tmp_path / 'plans.db')
+    migrations.upgrade(path)
+    conn = sqlite3.connect(path)
+    assert check(conn) == []
+    conn.close()
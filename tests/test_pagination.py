@@ -0,0 +1,82 @@
+import re
+
+import pytest
+from main import app
+from app import principals
+from conftest import login_as, seed
+
+
+@pytest.fixture
+def client(client, db_path):
+    seed(db_path, users=[('boss', 'admin'), *((f'app{i}', 'apprentice') for i in range(1, 6))],
+         tickets=[(2, f'Ticket {i}', 'D', 'High' if i % 2 else 'Low', 'open') for i in range(1, 8)])
+    principals.cache.clear()
+    login_as(client, 'admin')
+    yield client
+    principals.cache.clear()
+
+
+def ticket_ids(res):
+    return [int(i) for i in re.findall(r'Ticket #(\d+)', res.get_data(as_text=True))]
+
+
+def link(res, rel):
+    match = re.search(rf'href="([^"]+)" class="[^"]*" rel="{rel}"', res.get_data(as_text=True))
+    return match.group(1).replace('&amp;', '&') if match else None
+
+
+def test_tickets_pages_forward_and_back(client):
+    first = client.get('/tickets?per_page=3')
+    assert ticket_ids(first) == [7, 6, 5]
+    assert link(first, 'prev') is None
+    assert link(first, 'next') == '/tickets?per_page=3&after=5'
+
+    second = client.get(link(first, 'next'))
+    assert ticket_ids(second) == [4, 3, 2]
+    third = client.get(link(second, 'next'))
+    assert ticket_ids(third) == [1]
+    assert link(third, 'next') is None
+
+    back = client.get(link(third, 'prev'))
+    assert ticket_ids(back) == [4, 3, 2]
+    newest = client.get(link(back, 'prev'))
+    assert ticket_ids(newest) == [7, 6, 5]
+    assert link(newest, 'prev') is None
+
+
+def test_tickets_links_keep_filters(client):
+    res = client.get('/tickets?priority=High&per_page=2')
+    assert ticket_ids(res) == [7, 5]
+    nxt = link(res, 'next')
+    assert 'priority=High' in nxt
+    assert ticket_ids(client.get(nxt)) == [3, 1]
+
+
+def test_default_page_size_and_bad_cursor(client):
+    app.config['TICKETS_PAGE_SIZE'], old = 4, app.config['TICKETS_PAGE_SIZE']
+    try:
+        assert ticket_ids(client.get('/tickets')) == [7, 6, 5, 4]
+        assert ticket_ids(client.get('/tickets?after=abc')) == [7, 6, 5, 4]
+    finally:
+        app.config['TICKETS_PAGE_SIZE'] = old
+
+
+def test_admin_users_pages(client):
+    res = client.get('/admin_users?per_page=4')
+    assert re.findall(r'<td>(app\d|boss)</td>', res.get_data(as_text=True)) == ['boss', 'app1', 'app2', 'app3']
+    res = client.get(link(res, 'next'))
+    assert re.findall(r'<td>(app\d|boss)</td>', res.get_data(as_text=True)) == ['app4', 'app5']
+
+    res = client.get('/admin_users?role=apprentice&per_page=2&after=3')
+    assert re.findall(r'<td>(app\d|boss)</td>', res.get_data(as_text=True)) == ['app3', 'app4']
+    assert 'role=apprentice' in link(res, 'next')
+
+
+def test_url_for_options_in_the_query_string_are_ignored(client):
+    res = client.get('/tickets?per_page=3&_method=DELETE&_external=1&_anchor=x')
+    assert res.status_code == 200
+    assert link(res, 'next') == '/tickets?per_page=3&after=5'
+
+    res = client.get('/admin_users?per_page=1&_method=DELETE&_scheme=javascript')
+    assert res.status_code == 200
+    assert '_scheme' not in link(res, 'next')
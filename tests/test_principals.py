@@ -0,0 +1,58 @@
+import sqlite3
+
+import pytest
+
+from app.principals import PrincipalCache
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, role TEXT, email TEXT)')
+    conn.executemany('INSERT INTO users VALUES (?, ?, ?, ?)',
+                     [(1, 'alex', 'apprentice', 'a@example.com'), (2, 'boss', 'admin', 'b@example.com'),
+                      (3, 'sam', 'apprentice', 's@example.com')])
+    yield conn
+    conn.close()
+
+
+def test_second_lookup_is_a_hit(conn):
+    cache = PrincipalCache()
+    assert cache.get('boss', conn).role == 'admin'
+    assert cache.get('boss', conn).id == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_unknown_user_is_not_cached(conn):
+    cache = PrincipalCache()
+    assert cache.get('ghost', conn) is None
+    conn.execute("INSERT INTO users VALUES (4, 'ghost', 'apprentice', NULL)")
+    assert cache.get('ghost', conn).id == 4
+
+
+def test_entries_expire(conn):
+    cache = PrincipalCache(ttl=0)
+    cache.get('alex', conn)
+    cache.get('alex', conn)
+    assert cache.misses == 2
+
+
+def test_least_recently_used_is_evicted(conn):
+    cache = PrincipalCache(maxsize=2)
+    cache.get('alex', conn)
+    cache.get('boss', conn)
+    cache.get('alex', conn)
+    cache.get('sam', conn)  # evicts boss
+    assert cache.stats()['size'] == 2
+    cache.get('boss', conn)
+    assert cache.misses == 4
+
+
+def test_invalidate_by_user_id_sees_role_change(conn):
+    cache = PrincipalCache()
+    assert cache.get('alex', conn).role == 'apprentice'
+    conn.execute("UPDATE users SET role = 'admin' WHERE id = 1")
+    assert cache.get('alex', conn).role == 'apprentice'  # still cached
+    cache.invalidate(user_id=1)
+    assert cache.get('alex', conn).role == 'admin'
@@ -0,0 +1,86 @@
+import multiprocessing
+
+import pytest
+
+from create_tables import init_db
+from app import auth, create_app, ratelimit
+from app.config import from_env
+from conftest import seed
+from main import app
+
+
+def test_bucket_refills_over_time(tmp_path):
+    path = str(tmp_path / 'buckets.db')
+    assert [ratelimit.take(path, 'k', 3, 60, now=1000) for _ in range(4)] == [0, 0, 0, 20.0]
+    assert ratelimit.take(path, 'k', 3, 60, now=1020) == 0   # one token back after 20s
+    assert ratelimit.take(path, 'k', 3, 60, now=1020) == 20.0
+    assert ratelimit.take(path, 'other', 3, 60, now=1020) == 0
+
+
+def _take_five(path):
+    return sum(ratelimit.take(path, 'shared', 10, 3600) == 0 for _ in range(5))
+
+
+def test_bucket_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / 'buckets.db')
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        assert sum(pool.map(_take_five, [path] * 4)) == 10
+
+
+def test_parse_limit():
+    assert ratelimit.parse_limit('5/hour') == (5, 3600)
+    with pytest.raises(ValueError):
+        ratelimit.parse_limit('5 per hour')
+
+
+@pytest.fixture
+def limited(client, db_path, monkeypatch):
+    seed(db_path, users=[('boss', 'admin')])
+    monkeypatch.setitem(app.config, 'TESTING', False)
+    monkeypatch.setitem(app.config, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setitem(app.config, 'RATELIMITS', {'auth.login': {'ip': '4/minute', 'username': '2/minute'}})
+    checks = []
+    monkeypatch.setattr(auth, 'check_password', lambda *args: checks.append(args) or False)
+    return client, checks
+
+
+def test_login_is_refused_before_any_work(limited):
+    client, checks = limited
+    login = {'username': 'boss', 'password': 'wrong'}
+    assert [client.post('/login', data=login).status_code for _ in range(2)] == [200, 200]
+    refused = client.post('/login', data=login)
+    assert refused.status_code == 429
+    assert 0 < int(refused.headers['Retry-After']) <= 30
+    assert len(checks) == 2  # the refused attempt never reached bcrypt
+
+    # Another username still has its own bucket, until the IP's runs out too
+    assert client.post('/login', data={'username': 'other', 'password': 'x'}).status_code == 200
+    assert client.post('/login', data={'username': 'third', 'password': 'x'}).status_code == 429
+    assert client.get('/login').status_code == 200  # only submissions are counted
+
+
+def test_clients_behind_a_proxy_get_their_own_buckets(tmp_path):
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    proxied = create_app({'DATABASE': path, 'TESTING': False, 'MAIL_QUEUE_WORKER': False, 'TRUSTED_PROXIES': 1,
+                          'RATELIMITS': {'auth.login': {'ip': '1/hour'}}})
+    with proxied.test_client() as client:
+        def login(address):
+            return client.post('/login', data={'username': 'nobody', 'password': 'x'},
+                               headers={'X-Forwarded-For': address}).status_code
+        assert [login('203.0.113.7'), login('203.0.113.8'), login('203.0.113.7')] == [200, 200, 429]
+
+
+def test_forwarded_for_is_ignored_unless_proxies_are_trusted(tmp_path, monkeypatch):
+    monkeypatch.delenv('TRUSTED_PROXIES', raising=False)
+    assert from_env()['TRUSTED_PROXIES'] == 0
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    direct = create_app({'DATABASE': path, 'TESTING': False, 'MAIL_QUEUE_WORKER': False,
+                         'RATELIMITS': {'auth.login': {'ip': '1/hour'}}})
+    with direct.test_client() as client:
+        def login(address):
+            return client.post('/login', data={'username': 'nobody', 'password': 'x'},
+                               headers={'X-Forwarded-For': address}).status_code
+        # Every request comes from the proxy's address, so the clients share its bucket
+        assert [login('203.0.113.7'), login('203.0.113.8')] == [200, 429]
@@ -0,0 +1,75 @@
+import datetime
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+from app import json_provider
+from conftest import login_as, seed
+from main import app
+
+
+@pytest.fixture
+def client(client, db_path):
+    seed(db_path, users=[('boss', 'admin')],
+         tickets=[(1, f'Ticket {i}', 'printer on fire ' * 10, 'Low', 'open') for i in range(20)])
+    login_as(client, 'admin')
+    return client
+
+
+def test_large_json_is_gzipped(client):
+    plain = client.get('/api/tickets')
+    res = client.get('/api/tickets', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert res.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in res.vary
+    assert int(res.headers['Content-Length']) < len(plain.data) / 5
+    assert json.loads(gzip.decompress(res.data)) == plain.get_json()
+
+    # The ETag turns weak but still revalidates either way
+    assert res.headers['ETag'].startswith('W/')
+    assert client.get('/api/tickets', headers={'If-None-Match': res.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.parametrize('url, accept', [
+    ('/api/tickets', 'gzip;q=0, br'),         # refused
+    ('/api/tickets', ''),
+    ('/api/tickets?limit=1', 'gzip'),         # under COMPRESS_MIN_SIZE
+    ('/api/tickets/export', 'gzip'),          # streamed
+])
+def test_left_uncompressed(client, url, accept):
+    res = client.get(url, headers={'Accept-Encoding': accept})
+    assert res.status_code == 200
+    assert 'Content-Encoding' not in res.headers
+
+
+def test_rows_serialize_like_dicts():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT 2 AS id, 'Zed' AS title, NULL AS status").fetchone()
+    value = {'rows': [row], 'at': datetime.datetime(2024, 5, 1, 12, 0, 0)}
+    expected = {'rows': [dict(row)], 'at': datetime.datetime(2024, 5, 1, 12, 0, 0)}
+
+    provider = json_provider.RowJSONProvider(app)
+    provider.accelerated = False
+    stdlib = provider.dumps(value)
+    assert stdlib == json.dumps(expected, default=provider.default, sort_keys=True)
+    if json_provider.orjson is not None:
+        provider.accelerated = True
+        assert json.loads(provider.dumps(value)) == json.loads(stdlib)
+        assert list(json.loads(provider.dumps(value))) == list(json.loads(stdlib))
+    assert json.loads(provider.dumps(row, sort_keys=False)) == {'id': 2, 'title': 'Zed', 'status': None}
+
+
+def test_sqlite_encoded_rows_match_the_provider():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('CREATE TABLE t (title TEXT, id INTEGER, status TEXT)')
+    conn.execute("INSERT INTO t VALUES ('Zed \"quoted\" ü', 2, NULL)")
+    row = conn.execute('SELECT * FROM t').fetchone()
+    doc = conn.execute(f"SELECT {json_provider.json_object_sql(['title', 'id', 'status'], 't')} FROM t").fetchone()[0]
+
+    with app.app_context():
+        body = app.json.json_rows_response([doc, doc]).get_data(as_text=True)
+        assert json.loads(body) == json.loads(app.json.dumps([row, row]))
+    assert list(json.loads(doc)) == ['id', 'status', 'title']
@@ -0,0 +1,64 @@
+import pytest
+from main import app
+from app.db import connect
+from app.search import fts_query, highlight
+from conftest import login_as, seed
+
+
+@pytest.fixture
+def client(client, db_path):
+    seed(db_path, users=[('alex', 'apprentice'), ('sam', 'apprentice'), ('boss', 'admin')],
+         tickets=[(1, 'Printer jam', 'The printer on floor 2 is jammed with <paper>.', 'Low', 'open'),
+                  (2, 'Printer offline', 'Printer shows offline, printer queue stuck.', 'High', 'open'),
+                  (1, 'VPN drops', 'VPN disconnects every hour.', 'Medium', 'open')])
+    return client
+
+
+def test_fts_query_quotes_terms():
+    assert fts_query('printer "jam') == '"printer" "jam"*'
+    assert fts_query('  ') == ''
+    assert fts_query('OR AND NEAR(') == '"OR" "AND" "NEAR"*'
+
+
+def test_highlight_escapes_ticket_text():
+    assert highlight('a \x02<b>\x03') == 'a <mark>&lt;b&gt;</mark>'
+
+
+def test_tickets_search_respects_apprentice_restriction(client):
+    login_as(client, 'apprentice', 'alex')
+    res = client.get('/tickets?q=printer')
+    assert res.status_code == 200
+    assert b'Printer jam' in res.data
+    assert b'Printer offline' not in res.data
+    assert b'<mark>' in res.data
+
+
+def test_tickets_search_as_admin_ranks_best_match_first(client):
+    login_as(client, 'admin', 'boss')
+    res = client.get('/tickets?q=printer')
+    body = res.data.decode()
+    assert body.index('Printer offline') < body.index('Printer jam')
+    assert 'VPN drops' not in body
+
+
+def test_api_search(client):
+    login_as(client, 'admin', 'boss')
+    data = client.get('/api/tickets?q=print').get_json()
+    assert [t['id'] for t in data] == [2, 1]
+    assert '<mark>' in data[0]['snippet']
+
+    login_as(client, 'apprentice', 'sam')
+    data = client.get('/api/tickets?q=print').get_json()
+    assert [t['id'] for t in data] == [2]
+
+
+def test_search_index_follows_updates_and_deletes(client):
+    conn = connect(app.config['DATABASE'])
+    conn.execute("UPDATE tickets SET title = 'Laptop fan noise' WHERE id = 3")
+    conn.execute('DELETE FROM tickets WHERE id = 2')
+    conn.commit()
+    conn.really_close()
+
+    login_as(client, 'admin', 'boss')
+    assert [t['id'] for t in client.get('/api/tickets?q=laptop').get_json()] == [3]
+    assert [t['id'] for t in client.get('/api/tickets?q=offline').get_json()] == []
@@ -0,0 +1,78 @@
+import pytest
+from main import app
+from app import slow_queries
+from app.db import connect
+from conftest import login_as, seed
+
+
+@pytest.fixture
+def client(client, db_path, monkeypatch):
+    seed(db_path, users=[('boss', 'admin')], tickets=[(1, 'T1', 'D', 'Low', 'open'), (1, 'T2', 'D', 'Low', 'open')])
+    monkeypatch.setitem(app.config, 'SLOW_QUERY_MS', 1e-6)  # everything counts as slow
+    slow_queries._pending.clear()
+    login_as(client, 'admin')
+    yield client
+    slow_queries._pending.clear()
+
+
+def logged(route):
+    conn = connect(app.config['DATABASE'])
+    try:
+        return conn.execute('SELECT * FROM slow_queries WHERE route = ?', (route,)).fetchall()
+    finally:
+        conn.really_close()
+
+
+def test_normalize():
+    assert slow_queries.normalize("SELECT *\n  FROM t WHERE a = 'x''y' AND b = 10 AND c IN (?, ?,?)") == \
+        'SELECT * FROM t WHERE a = ? AND b = ? AND c IN (?, ...)'
+    assert slow_queries.normalize('SELECT idx_2.x FROM t2 LIMIT 5') == 'SELECT idx_2.x FROM t2 LIMIT ?'
+
+
+def test_param_types():
+    assert slow_queries.param_types((1, 'a', None, 1.5)) == 'int, str, null, float'
+    assert slow_queries.param_types({'b': 1, 'a': b'x'}) == 'a: bytes, b: int'
+    assert slow_queries.param_types(None) == 'executemany'
+
+
+def test_slow_statements_are_aggregated_with_their_plan(client, caplog):
+    with caplog.at_level('WARNING', logger='app.slow_queries'):
+        client.get('/view_ticket/1')
+        client.get('/view_ticket/2')  # a different row: repeat lookups are served by app.ticket_cache
+    assert any('Slow query' in message and 'view_ticket' in message for message in caplog.messages)
+
+    rows = {row['sql']: row for row in logged('tickets.view_ticket')}
+    ticket_lookup = rows['SELECT * FROM tickets WHERE id = ?']
+    assert ticket_lookup['count'] == 2
+    assert ticket_lookup['param_types'] == 'int'
+    assert 'SEARCH tickets USING INTEGER PRIMARY KEY' in ticket_lookup['plan']
+    assert ticket_lookup['max_ms'] <= ticket_lookup['total_ms']
+
+
+def test_threshold_off_records_nothing(client):
+    app.config['SLOW_QUERY_MS'] = 0
+    client.get('/view_ticket/1')
+    assert logged('tickets.view_ticket') == []
+
+
+def test_admin_page_and_clear(client):
+    client.get('/view_ticket/1')
+    page = client.get('/admin/slow-queries?sort=max')
+    assert page.status_code == 200
+    assert b'SELECT * FROM tickets WHERE id = ?' in page.data
+
+    app.config['SLOW_QUERY_MS'] = 0
+    res = client.post('/admin/slow-queries/clear', follow_redirects=True)
+    assert b'Slow-query log cleared.' in res.data
+    assert b'No slow queries recorded.' in res.data
+
+
+def test_writer_statements_are_filed_under_the_route_that_queued_them(client, db_path, monkeypatch):
+    monkeypatch.setitem(slow_queries._settings, 'threshold_ms', 1e-6)  # the writer thread has no app context
+    seed(db_path, users=[('alex', 'apprentice')])
+    login_as(client, 'apprentice')
+    client.post('/submit_ticket', data={'title': 'T3', 'description': 'D', 'priority': 'Low'})
+    slow_queries.flush()
+
+    assert any(row['sql'].startswith('INSERT INTO tickets') for row in logged('tickets.submit_ticket'))
+    assert not any(row['sql'].startswith('INSERT INTO tickets') for row in logged('db-writer'))  # only BEGIN etc.
@@ -0,0 +1,72 @@
+import pytest
+from main import app
+from create_tables import init_db
+from app.db import connect
+from app.stats import read_stats, rebuild, verify
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    conn = connect(path)
+    conn.executemany('INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)',
+                     [('alex', 'x', 'a@example.com', 'apprentice'), ('boss', 'x', 'b@example.com', 'admin')])
+    conn.executemany(
+        'INSERT INTO tickets (user_id, title, description, priority, status) VALUES (?, ?, ?, ?, ?)',
+        [(1, 'A', 'D', 'High', 'open'), (1, 'B', 'D', 'Low', 'open'), (1, 'C', 'D', 'Low', 'closed')],
+    )
+    conn.commit()
+    yield conn
+    conn.really_close()
+
+
+def test_counters_follow_inserts_updates_and_deletes(conn):
+    conn.execute("UPDATE tickets SET status = 'in_progress', priority = 'Medium' WHERE title = 'A'")
+    conn.execute("DELETE FROM tickets WHERE title = 'C'")
+    conn.commit()
+
+    stats = read_stats(conn)
+    assert stats['total'] == 2
+    assert stats['by_status'] == {'open': 1, 'in_progress': 1}
+    assert stats['by_priority'] == {'Low': 1, 'Medium': 1}
+    assert stats['by_apprentice'] == [{'user_id': 1, 'username': 'alex', 'count': 2}]
+    assert verify(conn) == []
+
+
+def test_rebuild_repairs_drift(conn):
+    conn.execute("UPDATE ticket_stats SET count = 99 WHERE dimension = 'total'")
+    conn.commit()
+    assert verify(conn) == [('total', '', 99, 3)]
+
+    rebuild(conn)
+    assert verify(conn) == []
+    assert read_stats(conn)['total'] == 3
+
+
+def test_rebuild_stats_command(conn, monkeypatch):
+    conn.execute("UPDATE ticket_stats SET count = 0 WHERE dimension = 'status' AND key = 'open'")
+    conn.commit()
+    monkeypatch.setitem(app.config, 'DATABASE', conn.execute('PRAGMA database_list').fetchone()['file'])
+
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['rebuild-stats', '--check']).exit_code == 1
+    result = runner.invoke(args=['rebuild-stats'])
+    assert result.exit_code == 0, result.output
+    assert '1 counter(s) corrected' in result.output
+    assert verify(conn) == []
+
+
+def test_api_stats_is_admin_only(conn, monkeypatch):
+    monkeypatch.setitem(app.config, 'DATABASE', conn.execute('PRAGMA database_list').fetchone()['file'])
+    with app.test_client() as client:
+        assert client.get('/api/stats').status_code == 403
+        with client.session_transaction() as sess:
+            sess['username'] = 'boss'
+            sess['role'] = 'admin'
+        data = client.get('/api/stats').get_json()
+        assert data['total'] == 3
+        assert data['by_status'] == {'open': 2, 'closed': 1}
+
+        home = client.get('/')
+        assert b'Total Tickets' in home.data
@@ -0,0 +1,84 @@
+import pytest
+
+from create_tables import init_db
+from app import ticket_cache
+from app.db import connect
+from app.ticket_cache import TicketCache
+from main import app
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    conn = connect(path)
+    conn.execute("INSERT INTO users (username, password, email, role) VALUES ('boss', 'x', 'b@example.com', 'admin')")
+    conn.executemany("INSERT INTO tickets (user_id, title, description, priority, status) VALUES (1, ?, 'D', 'Low', 'open')",
+                     [('T1',), ('T2',), ('T3',)])
+    conn.commit()
+    conn.really_close()
+    return path
+
+
+@pytest.fixture
+def conns(db_path):
+    reader, other_worker = connect(db_path, readonly=True), connect(db_path)
+    yield reader, other_worker
+    reader.really_close()
+    other_worker.really_close()
+
+
+def test_repeat_lookups_are_hits(conns):
+    reader, _ = conns
+    cache = TicketCache()
+    assert cache.get(1, reader)['title'] == 'T1'
+    assert cache.get(1, reader)['title'] == 'T1'
+    assert cache.get(99, reader) is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_commit_elsewhere_is_never_served_stale(conns):
+    reader, other_worker = conns
+    cache = TicketCache()
+    cache.get(1, reader)
+    other_worker.execute("UPDATE tickets SET title = 'changed' WHERE id = 1")
+    other_worker.commit()
+    assert cache.get(1, reader)['title'] == 'changed'
+
+
+def test_commit_to_other_tables_keeps_entries(conns):
+    reader, other_worker = conns
+    cache = TicketCache()
+    cache.get(1, reader)
+    other_worker.execute("UPDATE users SET email = 'new@example.com' WHERE id = 1")
+    other_worker.commit()
+    cache.get(1, reader)
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['flushes'] == 1  # only the initial one
+
+
+def test_least_recently_used_is_evicted(conns):
+    reader, _ = conns
+    cache = TicketCache(maxsize=2)
+    cache.get(1, reader)
+    cache.get(2, reader)
+    cache.get(1, reader)
+    cache.get(3, reader)  # evicts 2
+    assert cache.stats()['size'] == 2
+    cache.get(2, reader)
+    assert cache.stats()['misses'] == 4
+
+
+def test_edit_route_shows_the_new_row(db_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'DATABASE', db_path)
+    ticket_cache.cache.clear()
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['username'] = 'boss'
+            sess['role'] = 'admin'
+        assert b'T1' in client.get('/view_ticket/1').data
+        client.post('/edit_ticket/1', data={'title': 'Renamed', 'description': 'D', 'priority': 'Low',
+                                            'status': 'open'})
+        assert b'Renamed' in client.get('/view_ticket/1').data
+    ticket_cache.cache.clear()
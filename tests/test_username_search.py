@@ -0,0 +1,54 @@
+import re
+
+import pytest
+from main import app
+from app.db import connect
+from conftest import login_as, seed
+
+
+@pytest.fixture
+def client(client, db_path):
+    apprentices = [(name, 'apprentice') for name in ('AlexSmith', 'alexandra', 'Sam_Alex', 'bo')]
+    seed(db_path, users=[('boss', 'admin'), *apprentices],
+         tickets=[(user_id, title, 'D', 'Low', 'open') for user_id, title in
+                  [(2, 'Alex one'), (3, 'Alexandra one'), (4, 'Sam one'), (5, 'Bo one'), (2, 'Alex two')]])
+    login_as(client, 'admin')
+    return client
+
+
+def ticket_ids(res):
+    return [int(i) for i in re.findall(r'Ticket #(\d+)', res.get_data(as_text=True))]
+
+
+def test_apprentice_name_filter_is_case_insensitive_substring(client):
+    assert ticket_ids(client.get('/tickets?apprentice_name=ALEX')) == [5, 3, 2, 1]
+    assert ticket_ids(client.get('/tickets?apprentice_name=xand')) == [2]
+    assert ticket_ids(client.get('/tickets?apprentice_name=nobody')) == []
+
+
+def test_short_names_and_like_wildcards(client):
+    # Fewer than three characters can't use trigrams; LIKE wildcards in the input are literal
+    assert ticket_ids(client.get('/tickets?apprentice_name=Bo')) == [4]
+    assert ticket_ids(client.get('/tickets?apprentice_name=_')) == [3]
+    assert ticket_ids(client.get('/tickets?apprentice_name=%25')) == []
+
+
+def test_index_follows_username_changes(client):
+    conn = connect(app.config['DATABASE'])
+    conn.execute("UPDATE users SET username = 'Robert' WHERE username = 'bo'")
+    conn.commit()
+    conn.really_close()
+    assert ticket_ids(client.get('/tickets?apprentice_name=obe')) == [4]
+
+
+def test_autocomplete_puts_prefix_matches_first(client):
+    res = client.get('/api/users/autocomplete?q=alex')
+    assert [user['username'] for user in res.get_json()] == ['alexandra', 'AlexSmith', 'Sam_Alex']
+    assert client.get('/api/users/autocomplete?q=alex&limit=1').get_json()[0]['username'] == 'alexandra'
+    assert client.get('/api/users/autocomplete?q=').get_json() == []
+
+
+def test_autocomplete_requires_admin(client):
+    with client.session_transaction() as sess:
+        sess['role'] = 'apprentice'
+    assert client.get('/api/users/autocomplete?q=alex').status_code == 403
@@ -4,19 +4,33 @@ from flask import url_for
 import pytest
 
 from main import app  # Import the Flask app with all routes from main.py
+from app import principals, users
 
 @pytest.fixture
 def client():
+    principals.cache.clear()  # each test mocks a different role for the same username
     with app.test_client() as client:
         yield client
 
 
+@pytest.fixture(autouse=True)
+def inline_writes(monkeypatch):
+    # Run writes against the mocked connection (the one get_read_connection returns) and commit them, as the
+    # writer thread would
+    def write(fn):
+        conn = users.get_read_connection()
+        result = fn(conn)
+        conn.commit()
+        return result
+    monkeypatch.setattr(users, 'write', write)
+
+
 # Helper to mock a DB row
 def make_user_row(id=1, username='admin', email='admin@example.com', role='admin'):
     return {'id': id, 'username': username, 'email': email, 'role': role}
 
 
-# Mock get_db_connection to return a connection with mocked execute
+# Mock get_read_connection to return a connection with mocked execute
 class MockConnection:
     def __init__(self, users=None):
         self.users = users or []
@@ -24,7 +38,7 @@ class MockConnection:
 
     def execute(self, query, params=()):
         # Handle different queries here based on query string or params
-        if 'SELECT role FROM users' in query:
+        if 'SELECT role FROM users' in query or 'FROM users WHERE username' in query:
             # Return a user row for role check
             mock_cursor = MagicMock()
             mock_cursor.fetchone.return_value = self.users[0] if self.users else None
@@ -61,7 +75,7 @@ def test_admin_users_redirects_if_not_logged_in(client):
     assert '/login' in response.headers['Location']
 
 # Test admin_users page with admin logged in
-@patch('app.users.get_db_connection')
+@patch('app.users.get_read_connection')
 def test_admin_users_page_with_admin(mock_get_conn, client):
     mock_conn = MockConnection(users=[make_user_row()])
     mock_get_conn.return_value = mock_conn
@@ -74,7 +88,7 @@ def test_admin_users_page_with_admin(mock_get_conn, client):
     assert b'admin_users.html' not in response.data  # Template name won't be in response, but we can check content if needed
 
 # Test admin_users filtering by role
-@patch('app.users.get_db_connection')
+@patch('app.users.get_read_connection')
 def test_admin_users_filter_role(mock_get_conn, client):
     # Return an admin user for 'admin' username
     mock_conn = MockConnection(users=[make_user_row(username='admin', role='admin')])
@@ -88,7 +102,7 @@ def test_admin_users_filter_role(mock_get_conn, client):
 
 
 # Test edit_user GET displays form
-@patch('app.users.get_db_connection')
+@patch('app.users.get_read_connection')
 def test_edit_user_get(mock_get_conn, client):
     mock_conn = MockConnection(users=[make_user_row()])
     mock_get_conn.return_value = mock_conn
@@ -100,7 +114,7 @@ def test_edit_user_get(mock_get_conn, client):
     assert response.status_code == 200
 
 # Test edit_user POST updates user and redirects
-@patch('app.users.get_db_connection')
+@patch('app.users.get_read_connection')
 def test_edit_user_post(mock_get_conn, client):
     mock_conn = MockConnection(users=[make_user_row()])
     mock_get_conn.return_value = mock_conn
@@ -115,7 +129,7 @@ def test_edit_user_post(mock_get_conn, client):
     assert mock_conn.committed is True
 
 # Test delete_user POST deletes user and redirects
-@patch('app.users.get_db_connection')
+@patch('app.users.get_read_connection')
 def test_delete_user_post(mock_get_conn, client):
     mock_conn = MockConnection(users=[make_user_row()])
     mock_get_conn.return_value = mock_conn
@@ -129,7 +143,7 @@ def test_delete_user_post(mock_get_conn, client):
     assert mock_conn.committed is True
 
 # Test access forbidden if user is not admin
-@patch('app.users.get_db_connection')
+@patch('app.users.get_read_connection')
 def test_access_forbidden_for_non_admin(mock_get_conn, client):
     # Non-admin role
     mock_conn = MockConnection(users=[make_user_row(role='user')])
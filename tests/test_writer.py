@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from create_tables import init_db
+from app import db, writer
+from app.db import connect
+from main import app
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'helpdesk.db')
+    init_db(path)
+    conn = connect(path)
+    conn.execute("INSERT INTO users (username, password, email, role) VALUES ('app1', 'x', 'a@example.com', 'apprentice')")
+    conn.commit()
+    conn.really_close()
+    return path
+
+
+def insert_ticket(title):
+    def job(conn):
+        return conn.execute("INSERT INTO tickets (user_id, title, description, priority, status) "
+                            "VALUES (1, ?, 'D', 'Low', 'open')", (title,)).lastrowid
+    return job
+
+
+def while_writer_is_busy(path, jobs):
+    """Queue ``jobs`` while the writer is held up by another job, so they land in one group."""
+    started, release = threading.Event(), threading.Event()
+
+    def hold(conn):
+        started.set()
+        release.wait(5)
+
+    blocker = threading.Thread(target=writer.write, args=(hold, path))
+    blocker.start()
+    started.wait(5)
+
+    outcomes = [None] * len(jobs)
+
+    def run(i, job):
+        try:
+            outcomes[i] = writer.write(job, path)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, job)) for i, job in enumerate(jobs)]
+    for thread in threads:
+        thread.start()
+    queued = writer._writers[path].jobs
+    while queued.qsize() < len(jobs):
+        time.sleep(0.001)
+    release.set()
+    for thread in threads + [blocker]:
+        thread.join(5)
+    return outcomes
+
+
+def titles(path):
+    conn = connect(path)
+    rows = [row['title'] for row in conn.execute('SELECT title FROM tickets ORDER BY id')]
+    conn.really_close()
+    return rows
+
+
+def test_concurrent_writes_share_one_commit(db_path):
+    outcomes = while_writer_is_busy(db_path, [insert_ticket(f'T{i}') for i in range(5)])
+
+    assert sorted(outcomes) == [1, 2, 3, 4, 5]
+    assert writer._writers[db_path].groups == 2  # the blocker's group, then all five together
+    assert sorted(titles(db_path)) == ['T0', 'T1', 'T2', 'T3', 'T4']
+
+
+def test_failed_job_is_rolled_back_alone(db_path):
+    def bad(conn):
+        conn.execute("INSERT INTO tickets (user_id, title, description, priority, status) "
+                     "VALUES (1, 'bad', 'D', 'Low', 'open')")
+        raise ValueError('nope')
+
+    outcomes = while_writer_is_busy(db_path, [insert_ticket('good1'), bad, insert_ticket('good2')])
+
+    assert isinstance(outcomes[1], ValueError)
+    assert sorted(titles(db_path)) == ['good1', 'good2']
+
+
+def test_read_connection_refuses_writes(db_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'DATABASE', db_path)
+    with app.app_context():
+        conn = db.get_read_connection()
+        assert conn is not db.get_db_connection()
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM users")
+        assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 1
+
+
+def test_route_writes_go_through_the_writer(db_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'DATABASE', db_path)
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['username'] = 'app1'
+            sess['role'] = 'apprentice'
+        res = client.post('/submit_ticket', data={'title': 'Printer', 'description': 'Jammed', 'priority': 'High'})
+
+    assert res.status_code == 302
+    assert titles(db_path) == ['Printer']
+    assert writer._writers[db_path].groups == 1